@@ -20,7 +20,12 @@ class StaticWordImageService {
     try {
       // 加载图片索引文件
       final String indexData = await rootBundle.loadString('assets/images/words/index.json');
-      _imageIndex = Map<String, String>.from(json.decode(indexData));
+      final Map<String, dynamic> rawIndex = json.decode(indexData);
+      // 索引条目为 {path, width, height, bytes, sha256, category}，兼容旧格式的纯路径字符串
+      _imageIndex = rawIndex.map((word, entry) => MapEntry(
+            word,
+            entry is String ? entry : entry['path'] as String,
+          ));
       _initialized = true;
       
       print('StaticWordImageService: 已加载 ${_imageIndex!.length} 张单词图片');
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单词图片图集打包
+按类别把已生成的单词图片装箱到一张或多张图集中，并输出每个单词在图集中的坐标，
+客户端一次解码即可加载整个课程的图片。相同输入总是得到相同的图集和清单
+"""
+
+import io
+import json
+import os
+import re
+
+from PIL import Image
+
+from image_encoder import FORMATS, write_bytes
+
+# 图块来自已有损编码的1倍图片，图集再次编码时使用高质量，避免叠加明显的失真
+ATLAS_QUALITY = 95
+
+
+def pack_shelves(items, max_size, padding=0):
+    """货架式装箱（按高度降序首次适应）
+
+    items 为 [(名称, 宽, 高), ...]，每个矩形四周保留 padding 像素的间距。
+    返回图集列表，每个图集为 {'width', 'height', 'rects': [(名称, x, y, 宽, 高), ...]}
+    """
+    # 排序键包含名称，保证结果与输入顺序无关
+    order = sorted(items, key=lambda item: (-item[2], -item[1], item[0]))
+    bins = []
+    shelves = []  # 当前图集的货架: [y, 高度, 已用宽度]
+
+    for name, width, height in order:
+        cell_w, cell_h = width + padding * 2, height + padding * 2
+        if cell_w > max_size or cell_h > max_size:
+            raise ValueError(f"图片 '{name}' ({width}x{height}) 超过图集最大尺寸 {max_size}")
+
+        placed = None
+        if bins:
+            for shelf in shelves:
+                if cell_h <= shelf[1] and shelf[2] + cell_w <= max_size:
+                    placed = (shelf[2], shelf[0])
+                    shelf[2] += cell_w
+                    break
+            if placed is None:
+                next_y = shelves[-1][0] + shelves[-1][1] if shelves else 0
+                if next_y + cell_h <= max_size:
+                    shelves.append([next_y, cell_h, cell_w])
+                    placed = (0, next_y)
+
+        if placed is None:
+            # 开始新的图集
+            bins.append({'rects': []})
+            shelves = [[0, cell_h, cell_w]]
+            placed = (0, 0)
+
+        x, y = placed
+        bins[-1]['rects'].append((name, x + padding, y + padding, width, height))
+
+    for atlas in bins:
+        atlas['width'] = max(x + w for _, x, _, w, _ in atlas['rects']) + padding
+        atlas['height'] = max(y + h for _, _, y, _, h in atlas['rects']) + padding
+    return bins
+
+
+def _safe_name(text):
+    return re.sub(r'[^0-9A-Za-z_-]+', '_', text).strip('_') or 'uncategorized'
+
+
+def _remove_stale_atlases(manifest_path, manifest, asset_prefix, atlas_dir):
+    """删除上一次打包留下、本次不再使用的图集文件"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return
+    for asset_path in previous.get('atlases', {}):
+        if asset_path in manifest['atlases'] or not asset_path.startswith(f"{asset_prefix}/"):
+            continue
+        try:
+            os.remove(os.path.join(atlas_dir, asset_path[len(asset_prefix) + 1:]))
+        except OSError:
+            pass
+
+
+def encode_sheet(sheet, fmt, quality=ATLAS_QUALITY):
+    """编码图集；JPEG不做色度抽样（图块的边界与编码块不对齐，抽样会让图块边缘的颜色互相渗透）"""
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        sheet.save(buffer, 'JPEG', quality=quality, subsampling=0, optimize=True)
+    elif fmt == 'webp':
+        sheet.save(buffer, 'WEBP', quality=quality, method=6)
+    else:
+        sheet.save(buffer, FORMATS[fmt][1], quality=quality)
+    return buffer.getvalue()
+
+
+def build_atlases(images_by_category, atlas_dir, asset_prefix, max_size=2048, padding=2,
+                  fmt='jpeg', quality=ATLAS_QUALITY, background=(255, 255, 255)):
+    """按类别打包图集并写出坐标清单
+
+    images_by_category: {类别: {单词: 图片路径}}
+    asset_prefix: 清单中图集路径的前缀（Flutter资源路径）
+    quality: 图集的编码质量，与单张图片的质量无关
+    返回清单字典
+    """
+    os.makedirs(atlas_dir, exist_ok=True)
+    extension = FORMATS[fmt][0]
+    manifest = {'version': 1, 'atlases': {}, 'words': {}}
+
+    for category in sorted(images_by_category):
+        images = images_by_category[category]
+        sizes = {}
+        for word in sorted(images):
+            with Image.open(images[word]) as image:
+                sizes[word] = image.size
+        if not sizes:
+            continue
+
+        bins = pack_shelves([(word, w, h) for word, (w, h) in sizes.items()], max_size, padding)
+        for number, atlas in enumerate(bins):
+            filename = f"{_safe_name(category)}_{number}{extension}"
+            sheet = Image.new('RGB', (atlas['width'], atlas['height']), background)
+            for word, x, y, w, h in atlas['rects']:
+                with Image.open(images[word]) as image:
+                    sheet.paste(image.convert('RGB'), (x, y))
+            write_bytes(encode_sheet(sheet, fmt, quality), os.path.join(atlas_dir, filename))
+
+            asset_path = f"{asset_prefix}/{filename}"
+            manifest['atlases'][asset_path] = {
+                'category': category,
+                'width': atlas['width'],
+                'height': atlas['height'],
+                'words': sorted(word for word, *_ in atlas['rects']),
+            }
+            for word, x, y, w, h in atlas['rects']:
+                manifest['words'][word] = {
+                    'atlas': asset_path,
+                    'x': x, 'y': y, 'w': w, 'h': h,
+                }
+
+    manifest_path = os.path.join(atlas_dir, 'atlas.json')
+    _remove_stale_atlases(manifest_path, manifest, asset_prefix, atlas_dir)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return manifest
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片生成流水线基准测试
+完全离线运行：源图片在本地合成，下载阶段请求本地桩服务（可配置延迟）。
+分别统计 fetch / decode / flatten / resize / encode / write / index 以及备用图标绘制
+各阶段的吞吐量和 p50/p95 延迟，结果保存为JSON，可与之前的结果对比并标出性能回退。
+另在独立进程中对比大尺寸JPEG全分辨率解码与缩放解码（draft）的耗时和峰值常驻内存
+
+用法:
+    python benchmark.py --sizes 40,1000,10000 --output .cache/bench/new.json
+    python benchmark.py --sizes 40,1000 --baseline .cache/bench/old.json
+    python benchmark.py --compare .cache/bench/old.json .cache/bench/new.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import PIL
+from PIL import Image, ImageDraw
+
+from fallback_renderer import FallbackRenderer
+from http_client import BackendClient
+from image_backends import BACKENDS, DEFAULT_BACKEND
+from image_encoder import (FORMATS, build_pyramid, encode_image, flatten_to_rgb, max_output_size,
+                           open_source, write_bytes)
+from image_index import ImageIndex
+from stub_server import start_stub_server
+from telemetry import percentile
+
+RESULTS_VERSION = 2
+STAGES = ('fetch', 'decode', 'flatten', 'resize', 'encode', 'write', 'index', 'fallback')
+CATEGORIES = ('animals', 'transport', 'food', 'colors', 'numbers')
+
+# 对比时忽略两边都低于该值（毫秒）的延迟变化，避免计时噪声被误报为回退
+NOISE_FLOOR_MS = 0.05
+
+
+class StageTimer:
+    """记录单个阶段每次处理的耗时"""
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+        self.wall_seconds = None  # 并发阶段按墙钟时间计算吞吐量
+
+    @contextlib.contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        yield
+        self.samples.append(time.perf_counter() - start)
+
+    def to_dict(self):
+        samples = sorted(self.samples)
+        total = sum(samples)
+        elapsed = self.wall_seconds if self.wall_seconds is not None else total
+        return {
+            'count': len(samples),
+            'total_seconds': round(total, 4),
+            'throughput_per_sec': round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+            'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3) if samples else 0.0,
+        }
+
+
+def read_rss_mb():
+    """返回 (当前常驻内存, 峰值常驻内存)，单位MB；Linux读取 /proc，其他平台只有峰值（ru_maxrss）"""
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            status = f.read()
+        current, peak = (int(re.search(rf'{field}:\s+(\d+)', status).group(1)) / 1024
+                         for field in ('VmRSS', 'VmHWM'))
+        return round(current, 1), round(peak, 1)
+    except (OSError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return None, round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def reset_peak_rss():
+    """把峰值常驻内存重置为当前值（仅Linux支持），返回是否成功"""
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def make_source_images(count, size, mode='rgba', seed=0):
+    """合成 count 张不同的源图片（编码后的字节）
+
+    rgba 模式输出带透明通道的PNG（覆盖 flatten 的合成路径），rgb 模式输出JPEG
+    """
+    rng = random.Random(seed)
+    sources = []
+    for _ in range(count):
+        background = (*(rng.randrange(256) for _ in range(3)), rng.randrange(128, 256))
+        image = Image.new('RGBA' if mode == 'rgba' else 'RGB', size,
+                          background if mode == 'rgba' else background[:3])
+        draw = ImageDraw.Draw(image)
+        for _ in range(6):
+            x, y = rng.randrange(size[0]), rng.randrange(size[1])
+            radius = rng.randrange(10, max(11, min(size) // 3))
+            color = tuple(rng.randrange(256) for _ in range(4))
+            draw.ellipse([x - radius, y - radius, x + radius, y + radius],
+                         fill=color if mode == 'rgba' else color[:3])
+        buffer = io.BytesIO()
+        if mode == 'rgba':
+            image.save(buffer, 'PNG')
+        else:
+            image.save(buffer, 'JPEG', quality=90)
+        sources.append(buffer.getvalue())
+    return sources
+
+
+def synthetic_words(count):
+    return [(f"word{i:05d}", CATEGORIES[i % len(CATEGORIES)]) for i in range(count)]
+
+
+def bench_fetch(words, source_size, latency, concurrency):
+    """通过连接池客户端并发请求本地桩服务"""
+    timer = StageTimer('fetch')
+    server, base_url = start_stub_server(latency=latency)
+    client = BackendClient(pool_size=concurrency, max_retries=0)
+
+    def fetch(word):
+        with timer.measure():
+            client.get(f"{base_url}/prompt/{word}?width={source_size[0]}&height={source_size[1]}"
+                       f"&nologo=true").content
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(fetch, (word for word, _ in words)))
+        timer.wall_seconds = time.perf_counter() - start
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    return timer
+
+
+def bench_process(words, sources, work_dir, target_size, densities, formats, quality):
+    """逐个单词依次执行解码、合成、缩放、编码、写出和索引更新，分别计时"""
+    timers = {name: StageTimer(name) for name in ('decode', 'flatten', 'resize', 'encode',
+                                                   'write', 'index')}
+    output_dir = os.path.join(work_dir, 'process')
+    os.makedirs(output_dir, exist_ok=True)
+    index = ImageIndex(output_dir)
+
+    max_size = max_output_size(target_size, densities)
+    for i, (word, category) in enumerate(words):
+        data = sources[i % len(sources)]
+        with timers['decode'].measure():
+            # 与生成器相同：JPEG只解码到最大输出尺寸
+            image = open_source(data, max_size)
+            image.load()
+        with timers['flatten'].measure():
+            image = flatten_to_rgb(image)
+        with timers['resize'].measure():
+            pyramid = build_pyramid(image, target_size, densities)
+        encoded = []
+        with timers['encode'].measure():
+            for density in densities:
+                for fmt in formats:
+                    encoded.append((density, fmt, encode_image(pyramid[density], fmt, quality)))
+        paths = []
+        with timers['write'].measure():
+            for density, fmt, payload in encoded:
+                # 与生成器相同的目录布局：1倍图在根目录，其他密度在 2.0x/ 等子目录
+                directory = output_dir if density == 1.0 else os.path.join(output_dir, f"{density:.1f}x")
+                paths.append(write_bytes(payload, os.path.join(directory, f"{word}{FORMATS[fmt][0]}")))
+        with timers['index'].measure():
+            index.update(word, paths[0], category)
+
+    flush_start = time.perf_counter()
+    index.flush()
+    return timers, time.perf_counter() - flush_start
+
+
+def bench_fallback(words, work_dir, target_size, quality):
+    """备用图标绘制（--no-ai 路径的单进程开销）"""
+    timer = StageTimer('fallback')
+    renderer = FallbackRenderer()
+    output_dir = os.path.join(work_dir, 'fallback')
+    for word, _ in words:
+        variants = [(1.0, 'jpeg', os.path.join(output_dir, f"{word}.jpg"))]
+        with timer.measure():
+            renderer.render_variants(word, variants, target_size, quality)
+    return timer
+
+
+def _decode_worker(sources, max_size):
+    """在独立进程中依次解码全部源图片，返回 (每张耗时, 解码前常驻内存, 峰值常驻内存)"""
+    baseline, _ = read_rss_mb()
+    reset_peak_rss()
+    samples = []
+    for data in sources:
+        start = time.perf_counter()
+        image = open_source(data, max_size)
+        image.load()
+        samples.append(time.perf_counter() - start)
+        del image
+    return samples, baseline, read_rss_mb()[1]
+
+
+def bench_decode_memory(source_size, target_size, densities, count=8):
+    """对比大尺寸JPEG的全分辨率解码与缩放解码：耗时和峰值常驻内存
+
+    每种方式在新的进程中运行，峰值内存不受其他阶段影响
+    """
+    sources = make_source_images(count, source_size, 'rgb')
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for name, max_size in (('full', None), ('draft', max_output_size(target_size, densities))):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            samples, baseline, peak = pool.submit(_decode_worker, sources, max_size).result()
+        timer = StageTimer(f"decode_{name}")
+        timer.samples = samples
+        result = timer.to_dict()
+        result['peak_rss_mb'] = peak
+        if baseline is not None and peak is not None:
+            result['decode_rss_mb'] = round(peak - baseline, 1)
+        results[name] = result
+    return results
+
+
+def bench_end_to_end(words, work_dir, latency, concurrency, source_size=(400, 400),
+                     backend='pollinations', batch_size=None):
+    """用生成器以指定后端（HTTP后端请求本地桩服务）完整跑一遍并发流水线，返回每秒完成单词数"""
+    from generate_word_images import WordImageGenerator
+
+    server, base_url = start_stub_server(latency=latency)
+    generator = WordImageGenerator()
+    generator.output_dir = os.path.join(work_dir, 'end_to_end')
+    generator.api_base = base_url
+    generator.backend_name = backend
+    generator.batch_size = batch_size
+    if backend == 'stub':
+        generator.backend_options['latency'] = latency
+    generator.pool_size = concurrency
+    generator.load_word_entries = lambda: [{'text': word, 'category': category}
+                                           for word, category in words]
+    generator.source_size = source_size
+    try:
+        reset_peak_rss()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.generate_all_images(use_ai=True, delay=0, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {
+        'count': len(words),
+        'backend_calls': generator.telemetry.counters.get('backend_calls', 0),
+        'total_seconds': round(elapsed, 4),
+        'throughput_per_sec': round(len(words) / elapsed, 2) if elapsed > 0 else 0.0,
+        # 主进程（下载、排队）的峰值常驻内存，不含编码进程
+        'peak_rss_mb': read_rss_mb()[1],
+    }
+
+
+def run_benchmarks(sizes, latency=0.02, concurrency=8, target_size=(200, 200),
+                   source_size=(400, 400), densities=(1.0,), formats=('jpeg',), quality=85,
+                   source_mode='rgba', distinct_sources=16, end_to_end=False,
+                   decode_source_size=(2048, 2048), backend='pollinations', batch_size=None):
+    """对每个词汇量依次运行全部阶段，返回结果字典"""
+    densities = sorted(set(densities) | {1.0})
+    sources = make_source_images(distinct_sources, source_size, source_mode)
+    results = {
+        'version': RESULTS_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'latency': latency,
+            'concurrency': concurrency,
+            'target_size': list(target_size),
+            'source_size': list(source_size),
+            'densities': densities,
+            'formats': list(formats),
+            'quality': quality,
+            'source_mode': source_mode,
+            'distinct_sources': distinct_sources,
+            'decode_source_size': list(decode_source_size) if decode_source_size else None,
+            'backend': backend,
+            'batch_size': batch_size,
+        },
+        'sizes': {},
+    }
+
+    for size in sizes:
+        print(f"词汇量 {size}:")
+        words = synthetic_words(size)
+        work_dir = tempfile.mkdtemp(prefix='word_image_bench_')
+        try:
+            stages = {}
+            stages['fetch'] = bench_fetch(words, source_size, latency, concurrency).to_dict()
+            timers, flush_seconds = bench_process(words, sources, work_dir, target_size,
+                                                  densities, formats, quality)
+            stages.update((name, timer.to_dict()) for name, timer in timers.items())
+            stages['index']['flush_seconds'] = round(flush_seconds, 4)
+            stages['fallback'] = bench_fallback(words, work_dir, target_size, quality).to_dict()
+            entry = {'stages': stages}
+            if end_to_end:
+                entry['end_to_end'] = bench_end_to_end(words, work_dir, latency, concurrency,
+                                                       source_size, backend, batch_size)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        for name in STAGES:
+            stage = stages[name]
+            print(f"  - {name:8s} 吞吐 {stage['throughput_per_sec']:>10.2f}/秒  "
+                  f"p50 {stage['p50_ms']:>8.3f}ms  p95 {stage['p95_ms']:>8.3f}ms")
+        if end_to_end:
+            print(f"  - 端到端   吞吐 {entry['end_to_end']['throughput_per_sec']:>10.2f}/秒  "
+                  f"后端调用 {entry['end_to_end']['backend_calls']} 次  "
+                  f"主进程峰值内存 {entry['end_to_end']['peak_rss_mb']}MB")
+        results['sizes'][str(size)] = entry
+
+    if decode_source_size:
+        print(f"解码 {decode_source_size[0]}x{decode_source_size[1]} JPEG:")
+        results['decode_memory'] = bench_decode_memory(decode_source_size, target_size, densities)
+        for name, stage in results['decode_memory'].items():
+            print(f"  - {name:8s} p50 {stage['p50_ms']:>8.3f}ms  p95 {stage['p95_ms']:>8.3f}ms  "
+                  f"峰值内存 {stage['peak_rss_mb']}MB（解码增加 {stage.get('decode_rss_mb', '?')}MB）")
+    return results
+
+
+def compare_results(baseline, current, threshold=0.10):
+    """对比两次结果，返回回退列表 [(词汇量, 阶段, 指标, 旧值, 新值), ...]
+
+    延迟（p50/p95）增加或吞吐量下降超过 threshold 比例即视为回退
+    """
+    regressions = []
+    for size, entry in current.get('sizes', {}).items():
+        old_entry = baseline.get('sizes', {}).get(size)
+        if old_entry is None:
+            continue
+        pairs = [(name, old_entry['stages'].get(name), stage)
+                 for name, stage in entry['stages'].items()]
+        if 'end_to_end' in entry and 'end_to_end' in old_entry:
+            pairs.append(('end_to_end', old_entry['end_to_end'], entry['end_to_end']))
+        regressions.extend(_compare_stages(size, pairs, threshold))
+    old_decode = baseline.get('decode_memory', {})
+    pairs = [(f"decode_{name}", old_decode.get(name), stage)
+             for name, stage in current.get('decode_memory', {}).items()]
+    regressions.extend(_compare_stages('-', pairs, threshold))
+    return regressions
+
+
+def _compare_stages(size, pairs, threshold):
+    regressions = []
+    for name, old, new in pairs:
+        if not old:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'peak_rss_mb'):
+            if old.get(metric) is None or new.get(metric) is None:
+                continue
+            if metric != 'peak_rss_mb' and max(old[metric], new[metric]) < NOISE_FLOOR_MS:
+                continue
+            if new[metric] > old[metric] * (1 + threshold):
+                regressions.append((size, name, metric, old[metric], new[metric]))
+        if old['throughput_per_sec'] > 0 and \
+                new['throughput_per_sec'] < old['throughput_per_sec'] * (1 - threshold):
+            regressions.append((size, name, 'throughput_per_sec',
+                                old['throughput_per_sec'], new['throughput_per_sec']))
+    return regressions
+
+
+def print_comparison(baseline, current, threshold):
+    """打印对比结果，返回是否存在回退"""
+    if baseline.get('config') != current.get('config'):
+        print("⚠️ 两次结果的配置不同，对比结果仅供参考")
+    regressions = compare_results(baseline, current, threshold)
+    if not regressions:
+        print(f"✓ 未发现超过 {threshold:.0%} 的性能回退")
+        return False
+    print(f"✗ 发现 {len(regressions)} 项性能回退（阈值 {threshold:.0%}）:")
+    for size, name, metric, old, new in regressions:
+        print(f"  - 词汇量 {size} {name} {metric}: {old} → {new}")
+    return True
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_size(text):
+    width, height = map(int, text.split('x'))
+    return (width, height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='图片生成流水线基准测试（离线）')
+    parser.add_argument('--sizes', default='40,1000', help='词汇量列表，逗号分隔（如 40,1000,10000）')
+    parser.add_argument('--latency', type=float, default=0.02, help='桩服务每个请求的模拟延迟（秒）')
+    parser.add_argument('--concurrency', type=int, default=8, help='下载阶段的并发请求数')
+    parser.add_argument('--size', default='200x200', help='输出图片尺寸')
+    parser.add_argument('--source-size', default='400x400', help='合成源图片尺寸')
+    parser.add_argument('--source-mode', choices=['rgba', 'rgb'], default='rgba',
+                        help='合成源图片类型：rgba为带透明通道的PNG，rgb为JPEG')
+    parser.add_argument('--densities', default='1', help='输出密度，逗号分隔')
+    parser.add_argument('--formats', default='jpeg', help='输出格式，逗号分隔')
+    parser.add_argument('--quality', type=int, default=85, help='压缩质量')
+    parser.add_argument('--end-to-end', action='store_true', help='额外用生成器完整跑一遍并发流水线')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help='端到端测试使用的生成后端（HTTP后端请求本地桩服务）')
+    parser.add_argument('--batch-size', type=int, default=None, help='端到端测试中支持批量的后端每次请求的提示词数')
+    parser.add_argument('--decode-source-size', default='2048x2048',
+                        help='解码内存对比使用的JPEG尺寸，0 表示跳过')
+    parser.add_argument('--output', default='.cache/benchmark.json', help='结果JSON输出路径')
+    parser.add_argument('--baseline', help='与该结果文件对比，存在回退时退出码为1')
+    parser.add_argument('--threshold', type=float, default=0.10, help='判定回退的相对变化比例')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='只对比两个已有的结果文件，不运行基准测试')
+    args = parser.parse_args()
+
+    if args.compare:
+        regressed = print_comparison(load_results(args.compare[0]), load_results(args.compare[1]),
+                                     args.threshold)
+        sys.exit(1 if regressed else 0)
+
+    results = run_benchmarks(
+        [int(size) for size in args.sizes.split(',') if size],
+        latency=args.latency,
+        concurrency=args.concurrency,
+        target_size=parse_size(args.size),
+        source_size=parse_size(args.source_size),
+        densities=[float(d.strip().rstrip('x')) for d in args.densities.split(',') if d.strip()],
+        formats=[f.strip().lower() for f in args.formats.split(',') if f.strip()],
+        quality=args.quality,
+        source_mode=args.source_mode,
+        end_to_end=args.end_to_end,
+        backend=args.backend,
+        batch_size=args.batch_size,
+        decode_source_size=None if args.decode_source_size == '0' else parse_size(args.decode_source_size),
+    )
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"结果已保存: {args.output}")
+
+    if args.baseline:
+        sys.exit(1 if print_comparison(load_results(args.baseline), results, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建清单
+记录每张输出图片的输入指纹（提示词、尺寸、质量、原图哈希、生成器版本），
+每次运行只重建指纹发生变化的输出，类似 make / ninja 的增量构建
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def compute_fingerprint(inputs):
+    """计算输入指纹（与字段顺序无关）"""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BuildManifest:
+    """输出图片的构建记录"""
+
+    VERSION = 2
+    SAVE_INTERVAL = 1.0  # 两次自动保存的最小间隔（秒），中途崩溃时保留已完成的记录
+
+    def __init__(self, path):
+        self.path = path
+        self._outputs = {}
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self._outputs = data.get('outputs', {})
+
+    def get(self, word):
+        with self._lock:
+            return self._outputs.get(word)
+
+    def stale_reason(self, word, output_paths, fingerprint, source_hash=None):
+        """判断输出是否需要重建，返回原因；已是最新时返回None
+
+        output_paths 为该单词的全部输出文件（各密度、各格式）；
+        source_hash 为当前可用原图（如缓存中）的哈希，与记录不一致时需要重建
+        """
+        entry = self.get(word)
+        if entry is None:
+            return '无构建记录'
+        recorded = entry['outputs']
+        if sorted(recorded) != sorted(output_paths):
+            return '输出文件列表变化'
+        if entry['fingerprint'] != fingerprint:
+            return '输入参数变化'
+        for path in output_paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return f'输出文件不存在: {path}'
+            if [stat.st_size, stat.st_mtime_ns] != recorded[path]:
+                return f'输出文件被修改: {path}'
+        if source_hash and entry.get('source_sha256') and source_hash != entry['source_sha256']:
+            return '原图变化'
+        return None
+
+    def record(self, word, output_paths, fingerprint, inputs, source, source_hash=None):
+        """记录一次成功的构建"""
+        outputs = {}
+        for path in output_paths:
+            stat = os.stat(path)
+            outputs[path] = [stat.st_size, stat.st_mtime_ns]
+        entry = dict(inputs)
+        entry.update({
+            'fingerprint': fingerprint,
+            'source': source,
+            'source_sha256': source_hash,
+            'outputs': outputs,
+        })
+        with self._lock:
+            self._outputs[word] = entry
+            self._unsaved += 1
+            if time.monotonic() - self._last_save >= self.SAVE_INTERVAL:
+                self._save_locked()
+
+    def remove(self, word):
+        with self._lock:
+            if self._outputs.pop(word, None) is not None:
+                self._unsaved += 1
+
+    def _save_locked(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': self.VERSION, 'outputs': self._outputs}, ensure_ascii=False))
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def save(self):
+        """保存清单；自上次保存以来没有变化时（如全部单词都已是最新）不重写文件"""
+        with self._lock:
+            if self._unsaved:
+                self._save_locked()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+备用图标绘制
+AI生成失败或使用 --no-ai 时绘制简单的图标式插图。
+字体在每个进程中只查找一次并按字号缓存，图形模板按尺寸预先绘制，
+批量绘制时可以交给进程池并行执行
+"""
+
+import os
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from image_encoder import AdaptiveQuality, describe_output, save_image
+
+# 按顺序查找的字体文件，可通过 --font-path 或环境变量 WORD_IMAGE_FONT_PATH（以 os.pathsep 分隔）追加
+DEFAULT_FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Bold.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/Library/Fonts/Arial.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+BACKGROUND = (240, 248, 255)  # 淡蓝色背景
+TEXT_COLOR = (70, 130, 180)
+BASE_SIZE = 200  # 图形坐标按200x200设计，其他尺寸按比例缩放
+
+# 图形模板：相对画面中心的坐标（按 BASE_SIZE 设计）
+ICON_SHAPES = {
+    # 交通工具
+    'car': [
+        ('rectangle', [-60, -20, 60, 10], {'fill': (70, 130, 180)}),
+        ('rectangle', [-40, -35, 20, -20], {'fill': (70, 130, 180)}),
+        # 车轮
+        ('ellipse', [-50, 5, -30, 25], {'fill': (50, 50, 50)}),
+        ('ellipse', [30, 5, 50, 25], {'fill': (50, 50, 50)}),
+    ],
+    'bus': [
+        ('rectangle', [-70, -30, 70, 20], {'fill': (255, 165, 0)}),
+        # 窗户
+    ] + [('rectangle', [i * 25 - 8, -25, i * 25 + 8, -10], {'fill': (200, 200, 255)})
+         for i in range(-2, 3)],
+    'bike': [
+        # 车轮
+        ('ellipse', [-50, -10, -10, 30], {'outline': (70, 130, 180), 'width': 5}),
+        ('ellipse', [10, -10, 50, 30], {'outline': (70, 130, 180), 'width': 5}),
+        # 车架
+        ('line', [-30, 10, 30, 10], {'fill': (70, 130, 180), 'width': 3}),
+    ],
+    # 动物
+    'cat': [
+        ('ellipse', [-30, -20, 30, 20], {'fill': (255, 140, 0)}),
+        # 耳朵
+        ('polygon', [(-25, -15), (-35, -35), (-15, -25)], {'fill': (255, 140, 0)}),
+        ('polygon', [(15, -25), (35, -35), (25, -15)], {'fill': (255, 140, 0)}),
+        # 眼睛
+        ('ellipse', [-15, -10, -5, 0], {'fill': (0, 0, 0)}),
+        ('ellipse', [5, -10, 15, 0], {'fill': (0, 0, 0)}),
+    ],
+    'dog': [
+        ('ellipse', [-35, -15, 35, 25], {'fill': (139, 69, 19)}),
+        # 耳朵
+        ('ellipse', [-45, -25, -25, -5], {'fill': (139, 69, 19)}),
+        ('ellipse', [25, -25, 45, -5], {'fill': (139, 69, 19)}),
+    ],
+    'bird': [
+        ('ellipse', [-25, -10, 35, 20], {'fill': (255, 215, 0)}),
+        # 翅膀
+        ('ellipse', [-15, -5, 5, 15], {'fill': (255, 165, 0)}),
+        # 鸟嘴
+        ('polygon', [(30, 0), (45, -5), (45, 5)], {'fill': (255, 140, 0)}),
+    ],
+    # 食物
+    'apple': [
+        ('ellipse', [-30, -25, 30, 25], {'fill': (255, 0, 0)}),
+        # 叶子
+        ('ellipse', [-5, -35, 15, -25], {'fill': (0, 128, 0)}),
+    ],
+    'banana': [
+        ('polygon', [(-40, 20), (-30, -20), (0, -25), (30, -15), (35, 10), (20, 25), (-20, 25)],
+         {'fill': (255, 255, 0)}),
+    ],
+    # 颜色
+    'red': [('ellipse', [-40, -40, 40, 40], {'fill': (255, 0, 0)})],
+    'blue': [('ellipse', [-40, -40, 40, 40], {'fill': (0, 0, 255)})],
+    'green': [('ellipse', [-40, -40, 40, 40], {'fill': (0, 255, 0)})],
+    'yellow': [('ellipse', [-40, -40, 40, 40], {'fill': (255, 255, 0)})],
+    'orange': [('ellipse', [-40, -40, 40, 40], {'fill': (255, 165, 0)})],
+}
+
+# 有专门图形（或留白）的单词类别
+ICON_WORDS = {
+    'car', 'truck', 'bus', 'bike', 'train', 'plane', 'boat',
+    'cat', 'dog', 'elephant', 'lion', 'monkey', 'bird', 'fish',
+    'apple', 'banana', 'bread', 'milk', 'egg',
+    'red', 'blue', 'green', 'yellow', 'orange',
+}
+NUMBERS = {'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5'}
+
+GENERIC_SHAPES = [
+    ('ellipse', [-50, -50, 50, 50], {'fill': (200, 220, 240), 'outline': (70, 130, 180), 'width': 3}),
+]
+
+
+def font_search_paths(extra_paths=None):
+    """字体查找顺序：命令行参数、环境变量、内置候选"""
+    paths = list(extra_paths or [])
+    env = os.environ.get('WORD_IMAGE_FONT_PATH')
+    if env:
+        paths.extend(p for p in env.split(os.pathsep) if p)
+    return paths + DEFAULT_FONT_PATHS
+
+
+class FontCache:
+    """字体只查找一次，按字号缓存"""
+
+    def __init__(self, search_paths):
+        self.search_paths = list(search_paths)
+        self._font_file = None
+        self._resolved = False
+        self._fonts = {}
+
+    @property
+    def font_file(self):
+        if not self._resolved:
+            self._font_file = next((p for p in self.search_paths if os.path.isfile(p)), None)
+            self._resolved = True
+        return self._font_file
+
+    def get(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            if self.font_file:
+                font = ImageFont.truetype(self.font_file, size)
+            else:
+                # 没有可用的TrueType字体时使用Pillow内置字体（Pillow 10.1起支持指定字号）
+                try:
+                    font = ImageFont.load_default(size)
+                except TypeError:
+                    font = ImageFont.load_default()
+            self._fonts[size] = font
+        return font
+
+
+class FallbackRenderer:
+    """备用图标绘制器，模板按尺寸缓存"""
+
+    def __init__(self, font_paths=None):
+        self.fonts = FontCache(font_search_paths(font_paths))
+        self._templates = {}
+
+    def _draw_shapes(self, image, shapes):
+        draw = ImageDraw.Draw(image)
+        width, height = image.size
+        center_x, center_y = width // 2, height // 2
+        scale = min(width, height) / BASE_SIZE
+
+        def point(x, y):
+            return (center_x + round(x * scale), center_y + round(y * scale))
+
+        for op, coords, options in shapes:
+            options = dict(options)
+            if 'width' in options:
+                options['width'] = max(1, round(options['width'] * scale))
+            if op == 'polygon':
+                draw.polygon([point(x, y) for x, y in coords], **options)
+            else:
+                x0, y0 = point(coords[0], coords[1])
+                x1, y1 = point(coords[2], coords[3])
+                getattr(draw, op)([x0, y0, x1, y1], **options)
+
+    def _template(self, key, size):
+        """按 (模板, 尺寸) 缓存的底图，调用方需复制后再绘制"""
+        template = self._templates.get((key, size))
+        if template is None:
+            template = Image.new('RGB', size, BACKGROUND)
+            if key == 'generic':
+                self._draw_shapes(template, GENERIC_SHAPES)
+            elif key in ICON_SHAPES:
+                self._draw_shapes(template, ICON_SHAPES[key])
+            self._templates[(key, size)] = template
+        return template
+
+    def _draw_centered_text(self, image, text, font_size):
+        draw = ImageDraw.Draw(image)
+        width, height = image.size
+        scale = min(width, height) / BASE_SIZE
+        font = self.fonts.get(max(1, round(font_size * scale)))
+
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        # 减去字形包围盒的偏移，使文字真正居中
+        x = width // 2 - text_width // 2 - bbox[0]
+        y = height // 2 - text_height // 2 - bbox[1]
+        draw.text((x, y), text, fill=TEXT_COLOR, font=font)
+
+    def render(self, word, size):
+        """绘制单词的备用图标"""
+        word_lower = word.lower()
+        if word_lower in ICON_WORDS:
+            # 图形图标不含文字，直接复用模板
+            return self._template(word_lower, size).copy()
+        if word_lower in NUMBERS:
+            image = self._template('number', size).copy()
+            self._draw_centered_text(image, NUMBERS[word_lower], 80)
+            return image
+        image = self._template('generic', size).copy()
+        self._draw_centered_text(image, word.upper(), 16)
+        return image
+
+    def render_variants(self, word, variants, target_size, quality, describe=None):
+        """按每个密度的实际尺寸直接绘制（比缩放更快也更清晰），输出全部格式
+
+        返回 (输出路径列表, 索引条目)，describe 为 None 时不生成索引条目（见 save_variants）
+        """
+        output_paths = []
+        images = {}
+        for density in sorted({density for density, _, _ in variants}):
+            size = (round(target_size[0] * density), round(target_size[1] * density))
+            image = images[density] = self.render(word, size)
+            for variant_density, fmt, path in variants:
+                if variant_density == density:
+                    output_paths.append(save_image(image, path, fmt, quality))
+        # 保持与 variants 相同的顺序
+        order = {path: i for i, (_, _, path) in enumerate(variants)}
+        output_paths.sort(key=order.__getitem__)
+        return output_paths, describe_output(images, variants, describe) if describe else None
+
+
+# 进程池中每个工作进程持有一个绘制器，字体和模板在进程内复用
+_worker_renderer = None
+
+
+def init_worker(font_paths=None):
+    global _worker_renderer
+    _worker_renderer = FallbackRenderer(font_paths)
+
+
+def render_in_worker(task):
+    """进程池任务入口，task 为 (单词, 输出变体, 目标尺寸, 质量, 索引条目参数)
+
+    返回 (单词, 输出路径列表, 索引条目, 错误信息, 耗时秒数, 新确定的自适应质量)，
+    单个单词失败不影响同批次的其他单词
+    """
+    word, variants, target_size, quality, describe = task
+    if _worker_renderer is None:
+        init_worker()
+    start = time.perf_counter()
+    try:
+        paths, entry = _worker_renderer.render_variants(word, variants, target_size, quality, describe)
+        error = None
+    except Exception as e:
+        paths, entry, error = None, None, str(e)
+    learned = quality.drain_learned() if isinstance(quality, AdaptiveQuality) else {}
+    return word, paths, entry, error, time.perf_counter() - start, learned
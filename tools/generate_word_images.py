@@ -7,39 +7,302 @@
 
 import os
 import json
-import requests
 import time
 from PIL import Image
-import io
-from urllib.parse import quote
 import argparse
+import asyncio
+import glob
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from atlas_packer import ATLAS_QUALITY, build_atlases
+from build_manifest import BuildManifest, compute_fingerprint
+from image_cache import RawImageCache
+from fallback_renderer import FallbackRenderer, init_worker, render_in_worker
+from http_client import BackendClient, CircuitBreaker, CircuitOpenError
+from image_backends import BACKENDS, DEFAULT_BACKEND, GenerationRequest, backend_identity, create_backend
+from image_index import ImageIndex, read_index
+from job_journal import JobJournal
+from startup_manifest import compile_manifest, print_problems, write_manifest
+from image_encoder import (FORMATS, AdaptiveQuality, encode_task, estimate_decode_bytes,
+                           format_supported, max_output_size, open_source, parse_byte_size,
+                           save_variants)
+from pipeline import PipelineStats
+from rate_limiter import MemoryBudget, TokenBucket, parse_rate
+from telemetry import Telemetry, profiler
+from word_sources import (FORMATS as WORD_FORMATS, WordSourceError, in_shard, iter_word_entries,
+                          parse_shard, shard_index_filename)
+
+# 图片处理或备用图标绘制逻辑变化时递增，使构建清单中的全部输出失效
+GENERATOR_VERSION = 3
+
+# 单词处理结果对应的任务日志状态（重复单词不记录）
+JOURNAL_STATES = {'skipped': 'encoded', 'generated': 'encoded', 'fallback': 'fallback', 'failed': 'failed'}
 
 class WordImageGenerator:
     def __init__(self):
         self.target_size = (200, 200)  # 目标图片尺寸
         self.quality = 85  # JPEG压缩质量
+        self.adaptive_quality = None  # AdaptiveQuality：按字节预算/质量下限逐张选择质量，覆盖 quality
+        self.densities = (1.0,)  # 输出密度，2.0/3.0 写入Flutter的 2.0x/、3.0x/ 变体目录
+        self.formats = ('jpeg',)  # 输出格式，第一个为主格式（写入index.json）
         self.output_dir = "../assets/images/words"
         self.words_data_path = "../assets/data/words.json"
+        self.words_format = None  # 单词列表格式（json/jsonl/csv/tsv），None 时按扩展名判断
+        self.shard = None  # (i, N)：只生成按单词文本哈希属于第 i 片的单词
+        
+        # AI生成服务参数
+        self.api_base = "https://image.pollinations.ai"
+        self.model = "flux"
+        self.source_size = (400, 400)  # 向生成服务请求的原图尺寸
+        self.enhance = True
+        self.request_timeout = 30
+        
+        # 生成后端（image_backends 中注册的名称）及其特有参数（如 stub 的 latency）；
+        # batch_size 为支持批量的后端每次请求的提示词数，None 时使用后端的默认值
+        self.backend_name = DEFAULT_BACKEND
+        self.backend_options = {}
+        self.batch_size = None
+        self._backend = None
+        
+        # 内存控制：响应体超过 spool_size 时写入磁盘临时文件，超过 max_source_bytes 时视为失败；
+        # 并发模式下在途图片的估计内存总量不超过 memory_budget（None表示不限制）
+        self.spool_size = 1024 * 1024
+        self.max_source_bytes = 32 * 1024 * 1024
+        self.memory_budget = 512 * 1024 * 1024
+        
+        # HTTP连接池、重试与熔断参数（客户端首次请求时创建）
+        self.pool_size = 10
+        self.max_retries = 4
+        self.backoff_base = 1.0
+        self.breaker_threshold = 5
+        self.breaker_reset = 30.0
+        self._http_client = None
+        
+        # 原始图片缓存（None表示不使用缓存）
+        self.cache = None
+        
+        # 构建清单（None表示只按文件是否存在决定是否跳过）
+        self.manifest = None
+        
+        # 图片索引（在生成过程中增量更新），shard_index 为 True 时额外按类别分片
+        self.index = None
+        self.shard_index = False
+        self._categories = {}  # 单词 -> 类别
+        
+        # 占位图（placeholders.PlaceholderCache，None表示不计算）：索引条目附带 BlurHash、主色和内联缩略图
+        self.placeholders = None
+        
+        # 备用图标绘制（字体查找路径可追加，绘制器首次使用时创建）
+        self.font_paths = []
+        self._fallback_renderer = None
+        
+        # 最近一次分阶段流水线的统计
+        self.pipeline_stats = None
+        
+        # 运行遥测：逐个单词的进度、阶段耗时、计数器和字节数
+        self.telemetry = Telemetry()
+        
+        # 单词 -> 生成服务的随机种子（质量分析标记的单词重新生成时递增）
+        self.seeds = {}
+        self.seeds_path = None
+        
+        # 任务日志（None表示不记录）：逐个单词的处理状态和失败原因，用于中断后继续
+        self.journal = None
+        self._errors = {}  # 单词 -> 最近一次错误，记录到任务日志
+        self._force = set()  # 无论构建清单如何都要重建的单词（重试备用图标）
+        self._resumed = set()  # 继续运行时上次已完成的单词
         
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
         
+    def _output_path(self, word, density=1.0, fmt=None):
+        """单词图片的输出路径，默认为1倍密度的主格式"""
+        extension = FORMATS[fmt or self.formats[0]][0]
+        filename = f"{word.replace(' ', '_')}{extension}"  # 资源文件名不含空格，如 teddy_bear.jpg
+        if density == 1.0:
+            return os.path.join(self.output_dir, filename)
+        return os.path.join(self.output_dir, f"{density:.1f}x", filename)
+    
+    def _variants(self, word):
+        """单词图片的全部输出: [(密度, 格式, 路径), ...]"""
+        return [(density, fmt, self._output_path(word, density, fmt))
+                for density in self.densities for fmt in self.formats]
+    
+    def _output_paths(self, word):
+        return [path for _, _, path in self._variants(word)]
+        
+    def _build_inputs(self, word, meaning=""):
+        """输出图片的全部输入参数，用于计算构建指纹"""
+        inputs = {
+            'prompt': self._build_image_prompt(word, meaning),
+            'model': backend_identity(self.backend_name, self.model),
+            'source_size': list(self.source_size),
+            'enhance': self.enhance,
+            'target_size': list(self.target_size),
+            'quality': self.adaptive_quality.spec() if self.adaptive_quality else self.quality,
+            'densities': list(self.densities),
+            'formats': list(self.formats),
+            'generator_version': GENERATOR_VERSION,
+        }
+        if word in self.seeds:
+            inputs['seed'] = self.seeds[word]
+        return inputs
+    
+    @property
+    def encode_quality(self):
+        """传给编码函数的质量参数：固定值或自适应质量"""
+        return self.adaptive_quality or self.quality
+    
+    def stale_reason(self, word, meaning=""):
+        """返回单词图片需要重建的原因，已是最新时返回None"""
+        if word in self._force:
+            return '重试备用图标'
+        output_paths = self._output_paths(word)
+        if self.manifest is None:
+            missing = [path for path in output_paths if not os.path.exists(path)]
+            return f'输出文件不存在: {missing[0]}' if missing else None
+        
+        inputs = self._build_inputs(word, meaning)
+        source_hash = None
+        if self.cache is not None:
+            source_hash = self.cache.source_hash(self._cache_key(inputs['prompt'], inputs.get('seed')))
+        return self.manifest.stale_reason(
+            word, output_paths, compute_fingerprint(inputs), source_hash)
+    
+    def _record_build(self, word, source, source_hash=None, meaning="", described=None):
+        """记录一次成功的输出：写入构建清单并增量更新图片索引
+
+        described 为编码时随输出生成的索引条目（见 _describe_spec），索引只需保存
+        """
+        if self.manifest is not None:
+            inputs = self._build_inputs(word, meaning)
+            self.manifest.record(word, self._output_paths(word), compute_fingerprint(inputs), inputs,
+                                 source, source_hash)
+        if self.index is not None:
+            self.index.update(word, self._output_path(word), self._categories.get(word), described)
+        self.telemetry.count('bytes_out', sum(
+            os.path.getsize(path) for path in self._output_paths(word) if os.path.exists(path)))
+    
+    def _describe_spec(self, word):
+        """随编码一并生成索引条目的参数: (索引图片路径, 占位图参数)，不写索引时为None
+
+        元数据和占位图在编码进程中从内存里的图片计算，主进程和事件循环线程不再读取、解码输出文件
+        """
+        if self.index is None:
+            return None
+        placeholder = None
+        if self.placeholders is not None:
+            placeholder = (self.placeholders.components, self.placeholders.thumb_size)
+        return self._output_path(word), placeholder
+    
+    def _record_status(self, word, status):
+        """记录单词的处理结果: skipped / duplicate / generated / fallback / failed"""
+        self.telemetry.count(status)
+        self.telemetry.event('word', word=word, status=status)
+        state = JOURNAL_STATES.get(status)
+        if self.journal is not None and state is not None:
+            if status == 'skipped' and self.manifest is not None:
+                entry = self.manifest.get(word)
+                if entry is not None and entry.get('source') == 'fallback':
+                    state = 'fallback'
+            self.journal.update(word, state, self._errors.pop(word, None))
+    
+    def _journal_state(self, word, state):
+        if self.journal is not None:
+            self.journal.update(word, state)
+    
+    def _note_error(self, word, error):
+        """记下单词最近一次的错误，随处理结果写入任务日志"""
+        self._errors[word] = f"{type(error).__name__}: {error}"
+    
+    def _open_index(self):
+        if self.index is None:
+            if self.shard is None:
+                self.index = ImageIndex(self.output_dir, sharded=self.shard_index,
+                                        placeholders=self.placeholders)
+            else:
+                # 分片生成只写本片的索引文件，类别分片索引在合并时生成
+                self.index = ImageIndex(self.output_dir, filename=shard_index_filename(self.shard),
+                                        placeholders=self.placeholders)
+        return self.index
+    
+    def _ensure_indexed(self, word):
+        """跳过的单词如果索引条目缺失或过期（如旧格式索引），补写条目"""
+        if self.index is None:
+            return
+        entry = self.index.get(word)
+        output_path = self._output_path(word)
+        if (entry is None or 'sha256' not in entry
+                or entry.get('category') != self._categories.get(word)
+                or entry['bytes'] != os.path.getsize(output_path)
+                or (self.placeholders is not None and 'placeholder' not in entry)):
+            self.index.update(word, output_path, self._categories.get(word))
+    
+    def save_progress(self):
+        """运行中断时保存已完成的工作：构建清单、原图缓存和图片索引，以及占位图和质量选择缓存
+        
+        与任务日志一致，--resume 继续时已完成的单词不会因清单缺失而被重建；单项保存失败不影响其余各项
+        """
+        savers = []
+        if self.manifest is not None:
+            savers.append(('构建清单', self.manifest.save))
+        if self.cache is not None:
+            savers.append(('原图缓存', self.cache.save))
+        if self.index is not None:
+            savers.append(('图片索引', self.index.flush))
+        if self.placeholders is not None:
+            savers.append(('占位图缓存', self.placeholders.save))
+        if self.adaptive_quality is not None:
+            savers.append(('质量选择缓存', self.adaptive_quality.save))
+        for name, save in savers:
+            try:
+                save()
+            except Exception as e:
+                print(f"保存{name}失败: {e}")
+    
+    def _save_placeholders(self):
+        if self.placeholders is not None:
+            self.placeholders.save()
+            print(f"占位图: 新计算 {self.placeholders.computed} 张，按内容哈希复用 {self.placeholders.reused} 张")
+    
+    def plan_rebuild(self, words):
+        """列出需要重建的单词及原因"""
+        plan = []
+        seen = set()
+        for word in words:
+            if word in seen:
+                continue
+            seen.add(word)
+            reason = self.stale_reason(word)
+            if reason is not None:
+                plan.append((word, reason))
+        return plan
+    
+    def load_word_entries(self):
+        """逐条读取单词列表（JSON数组、JSONL 或 CSV），只保留当前分片的单词
+        
+        每项包含 id、text 和 category。图片按文本命名，同一文本出现多次时只保留第一条（及其类别）。
+        单词列表不存在时使用默认单词，格式错误时抛出 WordSourceError
+        """
+        if os.path.exists(self.words_data_path):
+            entries = iter_word_entries(self.words_data_path, self.words_format)
+        else:
+            print(f"单词列表不存在: {self.words_data_path}，使用默认单词")
+            entries = ({'id': w, 'text': w, 'category': 'uncategorized'} for w in self.get_default_words())
+        kept = {}
+        for entry in entries:
+            if not in_shard(entry, self.shard):
+                continue
+            first = kept.setdefault(entry['text'], entry)
+            if first is not entry:
+                print(f"警告: 单词 {entry['text']} 重复出现（id {first['id']} 与 {entry['id']}），"
+                      f"使用第一条，类别为 {first['category']}")
+        return list(kept.values())
+    
     def load_words_from_json(self):
         """从words.json加载单词数据"""
-        try:
-            with open(self.words_data_path, 'r', encoding='utf-8') as f:
-                words_data = json.load(f)
-                words = []
-                for word_obj in words_data:
-                    if isinstance(word_obj, dict):
-                        words.append(word_obj.get('text', ''))
-                    else:
-                        words.append(str(word_obj))
-                return [w for w in words if w.strip()]
-        except Exception as e:
-            print(f"加载单词数据失败: {e}")
-            # 返回默认单词列表
-            return self.get_default_words()
+        return [entry['text'] for entry in self.load_word_entries()]
     
     def get_default_words(self):
         """获取默认单词列表"""
@@ -92,30 +355,138 @@ class WordImageGenerator:
             'bad', 'new', 'old', 'fast', 'slow', 'clean', 'dirty'
         ]
     
-    def generate_with_pollinations(self, word, meaning=""):
-        """使用Pollinations AI生成图片"""
-        try:
+    @property
+    def http_client(self):
+        if self._http_client is None:
+            self._http_client = BackendClient(
+                pool_size=self.pool_size,
+                max_retries=self.max_retries,
+                backoff_base=self.backoff_base,
+                breaker=CircuitBreaker(self.breaker_threshold, self.breaker_reset))
+        return self._http_client
+    
+    @property
+    def backend(self):
+        """生成后端（首次使用时创建）"""
+        if self._backend is None:
+            options = dict(size=self.source_size, model=self.model, enhance=self.enhance,
+                           timeout=self.request_timeout, spool_size=self.spool_size,
+                           max_bytes=self.max_source_bytes, batch_size=self.batch_size)
+            if BACKENDS[self.backend_name].network:
+                options.update(client=self.http_client, api_base=self.api_base)
+            options.update(self.backend_options)
+            self._backend = create_backend(self.backend_name, **options)
+        return self._backend
+    
+    def _cache_key(self, prompt, seed=None):
+        """原始图片缓存键"""
+        width, height = self.source_size
+        return RawImageCache.make_key(prompt, backend_identity(self.backend_name, self.model),
+                                      width, height, self.enhance, seed)
+    
+    def is_cached(self, word, meaning=""):
+        """原始图片是否已在缓存中（命中时无需请求生成服务）"""
+        if self.cache is None:
+            return False
+        return self.cache.contains(
+            self._cache_key(self._build_image_prompt(word, meaning), self.seeds.get(word)))
+    
+    def fetch_image_sources(self, words, meaning=""):
+        """获取一批单词的原始图片，优先读取缓存，未命中的按后端的批量大小分批请求
+        
+        返回 {单词: (文件对象, sha256) 或异常实例}：缓存对象文件，或后端生成的临时文件
+        （小于 spool_size 时在内存中）。调用方负责关闭文件
+        """
+        results = {}
+        misses = []
+        for word in dict.fromkeys(words):
             # 构建优化的提示词 - 生成实际物体图片，不是文字
             prompt = self._build_image_prompt(word, meaning)
+            seed = self.seeds.get(word)  # 被标记重新生成的单词使用新的随机种子
+            key = self._cache_key(prompt, seed)
+            self._journal_state(word, 'fetching')
             
-            # URL编码
-            encoded_prompt = quote(prompt)
-            url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?width=400&height=400&model=flux&enhance=true"
-            
-            print(f"正在生成 '{word}' 的图片...")
-            print(f"提示词: {prompt}")
-            
-            # 发送请求
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
+            if self.cache is not None:
+                source = self.cache.open(key)
+                if source is not None:
+                    self.telemetry.log(f"'{word}' 命中原图缓存")
+                    self.telemetry.count('cache_hits')
+                    self.telemetry.count('bytes_in', os.fstat(source.fileno()).st_size)
+                    self._journal_state(word, 'fetched')
+                    results[word] = (source, self.cache.source_hash(key))
+                    continue
+            misses.append((word, key, GenerationRequest(prompt, seed)))
+        
+        batch_size = self.backend.max_batch
+        for start in range(0, len(misses), batch_size):
+            batch = misses[start:start + batch_size]
+            for word, _, request in batch:
+                self.telemetry.log(f"正在生成 '{word}' 的图片...")
+                self.telemetry.log(f"提示词: {request.prompt}")
             
-            # 处理图片
-            image = Image.open(io.BytesIO(response.content))
-            return self.process_image(image, word)
+            # 一次后端调用生成整批（HTTP后端复用连接，可重试错误自动退避重试，熔断时抛出 CircuitOpenError）
+            with self.telemetry.span('fetch', word=batch[0][0], batch=len(batch)) as span:
+                try:
+                    generated = self.backend.generate([request for _, _, request in batch])
+                except Exception as e:
+                    generated = [e] * len(batch)
+                    span['ok'] = False
+                span['bytes'] = sum(result[1] for result in generated if not isinstance(result, Exception))
             
-        except Exception as e:
-            print(f"生成 '{word}' 图片失败: {e}")
-            return None
+            for (word, key, _), result in zip(batch, generated):
+                if isinstance(result, Exception):
+                    results[word] = result
+                    continue
+                source, size, source_hash = result
+                self.telemetry.count('bytes_in', size)
+                if self.cache is not None:
+                    # 缓存只是优化：写入失败（如磁盘已满）时照常使用已下载的原图
+                    try:
+                        self.cache.put_file(key, source, source_hash)
+                    except OSError as e:
+                        self.telemetry.log(f"写入原图缓存失败: {e}")
+                        self.telemetry.count('cache_errors')
+                        source.seek(0)
+                self._journal_state(word, 'fetched')
+                results[word] = (source, source_hash)
+        return results
+    
+    def fetch_image_source(self, word, meaning=""):
+        """获取单个单词的原始图片，返回 (文件对象, sha256)，失败时抛出异常"""
+        result = self.fetch_image_sources([word], meaning)[word]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    def generate_with_backend(self, word, meaning="", prefetched=None):
+        """使用生成后端生成图片；prefetched 为批量预取的 (文件对象, sha256) 或异常"""
+        with self.telemetry.span('generate', word=word) as span:
+            try:
+                if prefetched is None:
+                    prefetched = self.fetch_image_source(word, meaning)
+                elif isinstance(prefetched, Exception):
+                    raise prefetched
+                source, source_hash = prefetched
+                
+                # 处理图片（JPEG只解码到最大输出尺寸）
+                with source, open_source(source, max_output_size(self.target_size, self.densities)) as image:
+                    output_path, described = self.process_image(image, word)
+                if output_path:
+                    self._record_build(word, 'ai', source_hash, meaning, described)
+                span['ok'] = output_path is not None
+                return output_path
+                
+            except CircuitOpenError as e:
+                self.telemetry.log(f"  - 生成服务熔断中，跳过请求")
+                self.telemetry.count('breaker_rejected')
+                self._note_error(word, e)
+                span['ok'] = False
+                return None
+            except Exception as e:
+                self.telemetry.log(f"生成 '{word}' 图片失败: {e}")
+                self._note_error(word, e)
+                span['ok'] = False
+                return None
     
     def _build_image_prompt(self, word, meaning=""):
         """构建专门的图像提示词，确保生成实际物体而非文字"""
@@ -197,276 +568,653 @@ class WordImageGenerator:
         return f"{base_description}, {quality_terms}, {no_text}"
     
     def process_image(self, image, word):
-        """处理图片：调整大小、压缩、保存"""
-        try:
-            # 转换为RGB（如果是RGBA）
-            if image.mode == 'RGBA':
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                background.paste(image, mask=image.split()[-1])
-                image = background
-            
-            # 调整大小
-            image = image.resize(self.target_size, Image.Resampling.LANCZOS)
-            
-            # 保存为优化的JPEG
-            output_path = os.path.join(self.output_dir, f"{word}.jpg")
-            image.save(output_path, 'JPEG', quality=self.quality, optimize=True)
-            
-            print(f"✓ 已保存: {output_path}")
-            return output_path
-            
-        except Exception as e:
-            print(f"处理图片失败: {e}")
-            return None
+        """处理图片：转换为RGB，按各密度逐级缩放，编码为各输出格式并保存
+        
+        返回 (1倍密度主格式的路径, 索引条目)，失败时路径为None
+        """
+        with self.telemetry.span('process', word=word) as span:
+            try:
+                output_paths, described = save_variants(image, self._variants(word), self.target_size,
+                                                         self.encode_quality, self._describe_spec(word))
+                
+                for output_path in output_paths:
+                    self.telemetry.log(f"✓ 已保存: {output_path}")
+                return output_paths[0], described
+                
+            except Exception as e:
+                self.telemetry.log(f"处理图片失败: {e}")
+                self._note_error(word, e)
+                span['ok'] = False
+                return None, None
+    
+    @property
+    def fallback_renderer(self):
+        if self._fallback_renderer is None:
+            self._fallback_renderer = FallbackRenderer(self.font_paths)
+        return self._fallback_renderer
     
     def generate_fallback_image(self, word):
         """生成备用图片（简单的图标式插图）"""
-        try:
-            from PIL import ImageDraw, ImageFont
-            
-            # 创建图片
-            image = Image.new('RGB', self.target_size, (240, 248, 255))  # 淡蓝色背景
-            draw = ImageDraw.Draw(image)
-            
-            # 根据单词类型选择颜色和简单图形
-            word_lower = word.lower()
-            
-            if word_lower in ['car', 'truck', 'bus', 'bike', 'train', 'plane', 'boat']:
-                # 交通工具 - 绘制简单车辆形状
-                self._draw_vehicle_icon(draw, word_lower)
-            elif word_lower in ['cat', 'dog', 'elephant', 'lion', 'monkey', 'bird', 'fish']:
-                # 动物 - 绘制简单动物形状  
-                self._draw_animal_icon(draw, word_lower)
-            elif word_lower in ['apple', 'banana', 'bread', 'milk', 'egg']:
-                # 食物 - 绘制简单食物形状
-                self._draw_food_icon(draw, word_lower)
-            elif word_lower in ['red', 'blue', 'green', 'yellow', 'orange']:
-                # 颜色 - 绘制彩色圆形
-                self._draw_color_icon(draw, word_lower)
-            elif word_lower in ['one', 'two', 'three', 'four', 'five']:
-                # 数字 - 绘制数字符号
-                self._draw_number_icon(draw, word_lower)
-            else:
-                # 其他 - 绘制通用图标
-                self._draw_generic_icon(draw, word)
-            
-            # 保存
-            output_path = os.path.join(self.output_dir, f"{word}.jpg")
-            image.save(output_path, 'JPEG', quality=self.quality, optimize=True)
-            
-            print(f"✓ 已生成备用图标: {output_path}")
-            return output_path
-            
-        except Exception as e:
-            print(f"生成备用图片失败: {e}")
-            return None
+        with self.telemetry.span('fallback', word=word) as span:
+            try:
+                # 每个密度按实际尺寸绘制
+                output_paths, described = self.fallback_renderer.render_variants(
+                    word, self._variants(word), self.target_size, self.encode_quality,
+                    self._describe_spec(word))
+                
+                for output_path in output_paths:
+                    self.telemetry.log(f"✓ 已生成备用图标: {output_path}")
+                self._record_build(word, 'fallback', described=described)
+                return output_paths[0]
+                
+            except Exception as e:
+                self.telemetry.log(f"生成备用图片失败: {e}")
+                self._note_error(word, e)
+                span['ok'] = False
+                return None
     
-    def _draw_vehicle_icon(self, draw, word):
-        """绘制交通工具图标"""
-        center_x, center_y = self.target_size[0] // 2, self.target_size[1] // 2
-        
-        if word == 'car':
-            # 简单的汽车形状
-            draw.rectangle([center_x-60, center_y-20, center_x+60, center_y+10], fill=(70, 130, 180))
-            draw.rectangle([center_x-40, center_y-35, center_x+20, center_y-20], fill=(70, 130, 180))
-            # 车轮
-            draw.ellipse([center_x-50, center_y+5, center_x-30, center_y+25], fill=(50, 50, 50))
-            draw.ellipse([center_x+30, center_y+5, center_x+50, center_y+25], fill=(50, 50, 50))
-        elif word == 'bus':
-            # 公交车
-            draw.rectangle([center_x-70, center_y-30, center_x+70, center_y+20], fill=(255, 165, 0))
-            # 窗户
-            for i in range(-2, 3):
-                draw.rectangle([center_x+i*25-8, center_y-25, center_x+i*25+8, center_y-10], fill=(200, 200, 255))
-        elif word == 'bike':
-            # 自行车轮子
-            draw.ellipse([center_x-50, center_y-10, center_x-10, center_y+30], outline=(70, 130, 180), width=5)
-            draw.ellipse([center_x+10, center_y-10, center_x+50, center_y+30], outline=(70, 130, 180), width=5)
-            # 车架
-            draw.line([center_x-30, center_y+10, center_x+30, center_y+10], fill=(70, 130, 180), width=3)
-    
-    def _draw_animal_icon(self, draw, word):
-        """绘制动物图标"""
-        center_x, center_y = self.target_size[0] // 2, self.target_size[1] // 2
-        
-        if word == 'cat':
-            # 猫头
-            draw.ellipse([center_x-30, center_y-20, center_x+30, center_y+20], fill=(255, 140, 0))
-            # 猫耳朵
-            draw.polygon([(center_x-25, center_y-15), (center_x-35, center_y-35), (center_x-15, center_y-25)], fill=(255, 140, 0))
-            draw.polygon([(center_x+15, center_y-25), (center_x+35, center_y-35), (center_x+25, center_y-15)], fill=(255, 140, 0))
-            # 眼睛
-            draw.ellipse([center_x-15, center_y-10, center_x-5, center_y], fill=(0, 0, 0))
-            draw.ellipse([center_x+5, center_y-10, center_x+15, center_y], fill=(0, 0, 0))
-        elif word == 'dog':
-            # 狗头
-            draw.ellipse([center_x-35, center_y-15, center_x+35, center_y+25], fill=(139, 69, 19))
-            # 狗耳朵
-            draw.ellipse([center_x-45, center_y-25, center_x-25, center_y-5], fill=(139, 69, 19))
-            draw.ellipse([center_x+25, center_y-25, center_x+45, center_y-5], fill=(139, 69, 19))
-        elif word == 'bird':
-            # 鸟身体
-            draw.ellipse([center_x-25, center_y-10, center_x+35, center_y+20], fill=(255, 215, 0))
-            # 翅膀
-            draw.ellipse([center_x-15, center_y-5, center_x+5, center_y+15], fill=(255, 165, 0))
-            # 鸟嘴
-            draw.polygon([(center_x+30, center_y), (center_x+45, center_y-5), (center_x+45, center_y+5)], fill=(255, 140, 0))
-    
-    def _draw_food_icon(self, draw, word):
-        """绘制食物图标"""
-        center_x, center_y = self.target_size[0] // 2, self.target_size[1] // 2
-        
-        if word == 'apple':
-            # 苹果
-            draw.ellipse([center_x-30, center_y-25, center_x+30, center_y+25], fill=(255, 0, 0))
-            # 叶子
-            draw.ellipse([center_x-5, center_y-35, center_x+15, center_y-25], fill=(0, 128, 0))
-        elif word == 'banana':
-            # 香蕉
-            points = [(center_x-40, center_y+20), (center_x-30, center_y-20), (center_x, center_y-25), 
-                     (center_x+30, center_y-15), (center_x+35, center_y+10), (center_x+20, center_y+25),
-                     (center_x-20, center_y+25)]
-            draw.polygon(points, fill=(255, 255, 0))
-    
-    def _draw_color_icon(self, draw, word):
-        """绘制颜色图标"""
-        center_x, center_y = self.target_size[0] // 2, self.target_size[1] // 2
-        
-        colors = {
-            'red': (255, 0, 0),
-            'blue': (0, 0, 255), 
-            'green': (0, 255, 0),
-            'yellow': (255, 255, 0),
-            'orange': (255, 165, 0)
-        }
+    def _generate_fallback_batch(self, words, workers):
+        """--no-ai 模式：在进程池中并行绘制所有需要重建的备用图标，返回成功数量"""
+        success_count = 0
+        pending = []
+        seen = set()
+        for word in words:
+            if word in seen:
+                self._record_status(word, 'duplicate')
+                success_count += 1
+                continue
+            seen.add(word)
+            if self.stale_reason(word) is None:
+                self._ensure_indexed(word)
+                self._record_status(word, 'skipped')
+                success_count += 1
+            else:
+                pending.append(word)
+        
+        print(f"需要绘制 {len(pending)} 个备用图标，跳过 {len(words) - len(pending)} 个")
+        if workers <= 1 or len(pending) < 2:
+            for word in pending:
+                if self.generate_fallback_image(word):
+                    self._record_status(word, 'fallback')
+                    success_count += 1
+                else:
+                    self._record_status(word, 'failed')
+            return success_count
         
-        color = colors.get(word, (128, 128, 128))
-        draw.ellipse([center_x-40, center_y-40, center_x+40, center_y+40], fill=color)
+        tasks = [(word, self._variants(word), self.target_size, self.encode_quality,
+                  self._describe_spec(word))
+                 for word in pending]
+        chunksize = max(1, len(tasks) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(self.font_paths,)) as pool:
+            for word, output_paths, described, error, seconds, learned in pool.map(
+                    render_in_worker, tasks, chunksize=chunksize):
+                # 绘制耗时在工作进程中测得
+                self.telemetry.record_span('fallback', seconds, ok=not error, word=word)
+                if learned:
+                    self.adaptive_quality.merge(learned)
+                if error:
+                    self.telemetry.log(f"生成备用图片失败: {error}")
+                    self._errors[word] = error
+                    self.telemetry.log(f"  - ✗ {word} 生成失败")
+                    self._record_status(word, 'failed')
+                    continue
+                for output_path in output_paths:
+                    self.telemetry.log(f"✓ 已生成备用图标: {output_path}")
+                self._record_build(word, 'fallback', described=described)
+                self._record_status(word, 'fallback')
+                success_count += 1
+        return success_count
     
-    def _draw_number_icon(self, draw, word):
-        """绘制数字图标"""
-        center_x, center_y = self.target_size[0] // 2, self.target_size[1] // 2
+    def generate_all_images(self, use_ai=True, delay=1.0, concurrency=1, rate=None,
+                            encoders=None, queue_size=None, dry_run=False,
+                            resume=False, retry_fallbacks=False):
+        """批量生成所有单词的图片
         
-        numbers = {'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5'}
-        number_text = numbers.get(word, '?')
+        concurrency > 1 或指定 encoders 时使用分阶段并发模式：最多 concurrency 个请求同时进行，
+        所有请求共享每秒 rate 个的令牌桶限流（未指定时按 1/delay 计算）；
+        下载到的原始字节经容量为 queue_size 的队列交给 encoders 个进程解码、缩放和保存。
+        不使用AI时，备用图标由 encoders 个进程（默认为CPU核数）并行绘制。
+        dry_run 为 True 时只列出需要重建的单词，不做任何生成。
+        使用任务日志时，resume 为 True 时跳过上次运行已完成的单词；
+        retry_fallbacks 为 True 时只重新请求上次使用了备用图标的单词
+        """
+        entries = self.load_word_entries()
+        words = [entry['text'] for entry in entries]
         
-        # 绘制数字
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 80)
-        except:
-            font = ImageFont.load_default()
+        self._categories = {entry['text']: entry['category'] for entry in entries}
+        if self.journal is not None and not dry_run:
+            words = self._start_journal_run(words, use_ai, resume, retry_fallbacks)
+        total_words = len(words)
+        
+        if dry_run:
+            plan = self.plan_rebuild(words)
+            for word, reason in plan:
+                print(f"  - {word}: {reason}")
+            print(f"需要重建: {len(plan)}/{len(set(words))}")
+            return plan
+        
+        self._open_index()
+        if resume and self.journal is not None:
+            # 已完成且仍是最新的单词不再处理，只补全中断前可能未落盘的索引条目
+            for word in self._resumed:
+                if os.path.exists(self._output_path(word)):
+                    self._ensure_indexed(word)
+        concurrent = use_ai and (concurrency > 1 or bool(encoders))
         
-        bbox = draw.textbbox((0, 0), number_text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
+        if self.shard is not None:
+            print(f"分片: {self.shard[0]}/{self.shard[1]}")
+        print(f"开始生成 {total_words} 个单词的图片...")
+        print(f"目标尺寸: {self.target_size}")
+        print(f"输出目录: {self.output_dir}")
+        if self.adaptive_quality:
+            spec = self.adaptive_quality
+            print(f"自适应质量: 预算 {spec.max_bytes or '不限'} 字节，PSNR下限 {spec.min_psnr or '不限'}，"
+                  f"质量范围 {spec.min_quality}-{spec.max_quality}")
+        else:
+            print(f"压缩质量: {self.quality}%")
+        print(f"使用AI生成: {'是' if use_ai else '否'}")
+        if use_ai:
+            print(f"生成后端: {self.backend_name}（每次请求最多 {self.backend.max_batch} 个提示词）")
+        if concurrent:
+            if rate is None and delay > 0:
+                rate = 1.0 / delay
+            concurrency = max(1, concurrency)
+            encoders = encoders or os.cpu_count() or 1
+            queue_size = queue_size or encoders * 2
+            print(f"并发模式: 最多 {concurrency} 个请求同时进行，限速 {rate or '不限'} 次/秒")
+            print(f"编码进程: {encoders}，队列容量: {queue_size}")
+        print("-" * 50)
         
-        x = center_x - text_width // 2
-        y = center_y - text_height // 2
+        if concurrent:
+            success_count = asyncio.run(self._generate_all_concurrent(
+                words, concurrency, rate, encoders, queue_size))
+        elif not use_ai:
+            success_count = self._generate_fallback_batch(words, encoders or os.cpu_count() or 1)
+        else:
+            success_count = 0
+            seen = set()
+            batch_size = self.backend.max_batch
+            for start in range(0, total_words, batch_size):
+                chunk = words[start:start + batch_size]
+                stale = [word for word in dict.fromkeys(chunk)
+                         if word not in seen and self.stale_reason(word) is not None]
+                requested = any(not self.is_cached(word) for word in stale)
+                # 支持批量的后端一次请求预取本批需要重建的单词；
+                # 预取出错时本批逐个单词获取，仍然失败的使用备用图标
+                prefetched = {}
+                if batch_size > 1 and stale:
+                    try:
+                        prefetched = self.fetch_image_sources(stale)
+                    except Exception as e:
+                        self.telemetry.log(f"批量获取原图失败，改为逐个获取: {e}")
+                for i, word in enumerate(chunk, start + 1):
+                    self.telemetry.log(f"[{i}/{total_words}] 处理单词: {word}")
+                    if word in seen:
+                        self.telemetry.log(f"  - 重复单词，跳过")
+                        self._record_status(word, 'duplicate')
+                        success_count += 1
+                        continue
+                    seen.add(word)
+                    status = self._generate_word(word, use_ai, prefetched.pop(word, None))
+                    self._record_status(word, status)
+                    if status != 'failed':
+                        success_count += 1
+                
+                for result in prefetched.values():
+                    if not isinstance(result, Exception):
+                        result[0].close()
+                # 添加延迟避免请求过快（命中缓存或离线后端时没有发出请求）
+                if requested and self.backend.network and start + batch_size < total_words:
+                    time.sleep(delay)
+        
+        print("-" * 50)
+        print(f"生成完成！成功: {success_count}/{total_words}")
+        if self.cache is not None:
+            self.cache.save()
+            self.cache.print_summary()
+        if self._backend is not None:
+            stats = self._backend.stats()
+            if stats['calls']:
+                print(f"生成后端 {stats['backend']}: 调用 {stats['calls']} 次，共 {stats['images']} 张，"
+                      f"平均每次 {stats['images'] / stats['calls']:.1f} 张")
+            self.telemetry.count('backend_calls', stats['calls'])
+            if 'requests' in stats:
+                print(f"生成服务: 请求 {stats['requests']} 次，重试 {stats['retries']} 次，"
+                      f"熔断 {stats['breaker_opened']} 次，当前状态 {stats['breaker_state']}")
+                self.telemetry.count('http_requests', stats['requests'])
+                self.telemetry.count('retries', stats['retries'])
+                self.telemetry.count('breaker_opened', stats['breaker_opened'])
+            self._backend.close()
+            self._backend = None
+        if self.manifest is not None:
+            self.manifest.save()
+        if self.adaptive_quality is not None:
+            self.adaptive_quality.save()
+        if self.journal is not None:
+            self._print_journal_summary(words)
         
-        draw.text((x, y), number_text, fill=(70, 130, 180), font=font)
+        # 写入图片索引（生成过程中已增量更新）；分片索引只保留本片的单词
+        if self.shard is not None:
+            for word in self.index.words():
+                if word not in self._categories:
+                    self.index.remove(word)
+        with self.telemetry.span('index_flush'):
+            self.index.flush()
+        self._save_placeholders()
+        print(f"✓ 已更新图片索引: {self.index.index_path}")
+        print(f"  - 共索引 {len(self.index)} 张图片")
+        self.telemetry.print_summary()
     
-    def _draw_generic_icon(self, draw, word):
-        """绘制通用图标（小字体单词）"""
-        center_x, center_y = self.target_size[0] // 2, self.target_size[1] // 2
+    def _start_journal_run(self, words, use_ai, resume, retry_fallbacks):
+        """在任务日志中开始本次运行，返回需要处理的单词"""
+        config = {
+            'words': os.path.abspath(self.words_data_path),
+            'shard': list(self.shard) if self.shard else None,
+            'use_ai': use_ai,
+            'backend': self.backend_name,
+            'retry_fallbacks': retry_fallbacks,
+        }
+        if retry_fallbacks:
+            fallbacks = set(self.journal.words_in_state('fallback'))
+            words = [word for word in words if word in fallbacks]
+            self._force = set(words)
+            print(f"重试备用图标: {len(self._force)} 个单词")
         
-        # 绘制背景圆形
-        draw.ellipse([center_x-50, center_y-50, center_x+50, center_y+50], 
-                    fill=(200, 220, 240), outline=(70, 130, 180), width=3)
+        self._resumed = set()
+        resume_from = None
+        if resume:
+            last = self.journal.last_run()
+            if last is None:
+                print("任务日志中没有可继续的运行，从头开始")
+            elif last['status'] == 'finished':
+                print(f"上次运行（#{last['id']}）已正常结束，没有可继续的运行，从头开始")
+            else:
+                previous = last['config']
+                if (previous.get('words'), previous.get('shard')) != (config['words'], config['shard']):
+                    print(f"警告: 上次运行的单词列表或分片与本次不同（{previous.get('words')}，分片 {previous.get('shard')}）")
+                print(f"上次运行（#{last['id']}）未正常结束（{last['status']}），从中断处继续")
+                resume_from = last['id']
+        done = self.journal.start_run(words, config, resume_from=resume_from)
+        if resume_from is not None:
+            # 上次完成后配置（如尺寸、质量）可能已改变，已过期的单词仍需重建
+            stale = {word for word in done if self.stale_reason(word) is not None}
+            self._resumed = done - stale
+            words = [word for word in words if word not in self._resumed]
+            expired = f"（其中 {len(stale)} 个已过期，重新生成）" if stale else ""
+            print(f"已完成 {len(done)} 个单词{expired}，剩余 {len(words)} 个")
+        return words
+    
+    def _print_journal_summary(self, words):
+        counts = self.journal.counts(words)
+        if not counts:
+            return
+        print("任务日志: " + "，".join(f"{state} {count}" for state, count in sorted(counts.items())))
+        for word, error, attempts in self.journal.errors('failed', limit=10):
+            print(f"  - ✗ {word}（尝试 {attempts} 次）: {error}")
+    
+    def _generate_word(self, word, use_ai, prefetched=None):
+        """生成单个单词的图片，prefetched 为批量预取的原图（见 generate_with_backend）
         
-        # 绘制小字体单词
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 16)
-        except:
-            font = ImageFont.load_default()
+        返回状态: 'skipped'（已存在）、'generated'（AI生成）、'fallback'（备用图标）、'failed'
+        """
+        # 检查是否需要重建
+        reason = self.stale_reason(word)
+        if reason is None:
+            self.telemetry.log(f"  - 图片已是最新，跳过")
+            self._ensure_indexed(word)
+            return 'skipped'
+        self.telemetry.log(f"  - 需要生成: {reason}")
         
-        bbox = draw.textbbox((0, 0), word.upper(), font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
+        if use_ai:
+            # 尝试AI生成
+            if self.generate_with_backend(word, prefetched=prefetched):
+                return 'generated'
+            # AI失败，生成备用图片
+            self.telemetry.log(f"  - AI生成失败，使用备用方案")
         
-        x = center_x - text_width // 2
-        y = center_y - text_height // 2
+        # 直接生成备用图片
+        if self.generate_fallback_image(word):
+            return 'fallback'
         
-        draw.text((x, y), word.upper(), fill=(70, 130, 180), font=font)
+        self.telemetry.log(f"  - ✗ 生成失败")
+        return 'failed'
+    
+    def _fetch_and_probe(self, words, max_size):
+        """获取一批原图并读取文件头，返回 {单词: (文件对象, sha256, 估计的处理内存) 或异常实例}"""
+        results = self.fetch_image_sources(words)
+        for word, result in results.items():
+            if isinstance(result, Exception):
+                continue
+            source, source_hash = result
+            try:
+                compressed = source.seek(0, os.SEEK_END)
+                source.seek(0)
+                with Image.open(source) as probe:
+                    size, fmt = probe.size, probe.format
+                source.seek(0)
+            except Exception as e:
+                source.close()
+                results[word] = e
+                continue
+            results[word] = (source, source_hash, estimate_decode_bytes(size, fmt, max_size, compressed))
+        return results
     
-    def generate_all_images(self, use_ai=True, delay=1.0):
-        """批量生成所有单词的图片"""
-        words = self.load_words_from_json()
+    async def _generate_all_concurrent(self, words, concurrency, rate, encoders, queue_size):
+        """分阶段并发生成
+        
+        下载阶段：concurrency 个协程（即在途请求窗口）按令牌桶限速把原图下载到临时文件，放入有界队列，
+        支持批量的后端每个协程一次请求最多 max_batch 个单词；
+        编码阶段：encoders 个协程读出队列中的原图交给进程池解码、缩放并保存。
+        队列满时下载阶段自动等待，网络等待与CPU编码互相重叠。
+        每张图片从开始下载到编码完成按估计内存占用预留 memory_budget 额度，额度用尽时暂停下载
+        """
+        loop = asyncio.get_running_loop()
+        bucket = TokenBucket(rate) if rate else None
+        budget = MemoryBudget(self.memory_budget) if self.memory_budget else None
+        max_size = max_output_size(self.target_size, self.densities)
+        backend = self.backend
+        # 下载前按请求的原图尺寸（不考虑缩放解码）预留，下载后按实际尺寸和格式修正
+        initial_cost = estimate_decode_bytes(self.source_size, None, max_size)
+        queue = asyncio.Queue(maxsize=queue_size)
         total_words = len(words)
+        pending = iter(enumerate(words, 1))
+        claimed = set()  # 防止重复单词被两个协程同时生成
         success_count = 0
         
-        print(f"开始生成 {total_words} 个单词的图片...")
-        print(f"目标尺寸: {self.target_size}")
-        print(f"输出目录: {self.output_dir}")
-        print(f"压缩质量: {self.quality}%")
-        print(f"使用AI生成: {'是' if use_ai else '否'}")
-        print("-" * 50)
+        stats = PipelineStats()
+        fetch_stats = stats.add_stage('fetch', concurrency)
+        encode_stats = stats.add_stage('encode', encoders)
+        queue_stats = stats.add_queue('raw_bytes', queue_size)
+        stats.memory_budget = budget
+        self.pipeline_stats = stats
         
-        for i, word in enumerate(words, 1):
-            print(f"[{i}/{total_words}] 处理单词: {word}")
-            
-            # 检查是否已存在
-            existing_path = os.path.join(self.output_dir, f"{word}.jpg")
-            if os.path.exists(existing_path):
-                print(f"  - 图片已存在，跳过")
+        log = self.telemetry.log
+        
+        async def fallback(word):
+            nonlocal success_count
+            log(f"  - AI生成失败，使用备用方案")
+            if await loop.run_in_executor(io_executor, self.generate_fallback_image, word):
+                self._record_status(word, 'fallback')
                 success_count += 1
-                continue
-            
-            success = False
-            
-            if use_ai:
-                # 尝试AI生成
-                result = self.generate_with_pollinations(word)
-                if result:
-                    success = True
-                    success_count += 1
-                else:
-                    # AI失败，生成备用图片
-                    print(f"  - AI生成失败，使用备用方案")
-                    result = self.generate_fallback_image(word)
-                    if result:
-                        success = True
-                        success_count += 1
             else:
-                # 直接生成备用图片
-                result = self.generate_fallback_image(word)
-                if result:
-                    success = True
-                    success_count += 1
-            
-            if not success:
-                print(f"  - ✗ 生成失败")
-            
-            # 添加延迟避免请求过快
-            if use_ai and i < total_words:
-                time.sleep(delay)
+                log(f"  - ✗ 生成失败")
+                self._record_status(word, 'failed')
         
-        print("-" * 50)
-        print(f"生成完成！成功: {success_count}/{total_words}")
+        async def fetcher():
+            nonlocal success_count
+            while True:
+                # 从共享的单词序列中取出最多 max_batch 个需要重建的单词
+                batch = []
+                for i, word in pending:
+                    log(f"[{i}/{total_words}] 处理单词: {word}")
+                    if word in claimed:
+                        log(f"  - 重复单词，跳过")
+                        self._record_status(word, 'duplicate')
+                        success_count += 1
+                        continue
+                    claimed.add(word)
+                    reason = self.stale_reason(word)
+                    if reason is None:
+                        log(f"  - 图片已是最新，跳过")
+                        self._ensure_indexed(word)
+                        self._record_status(word, 'skipped')
+                        success_count += 1
+                        continue
+                    log(f"  - 需要生成: {reason}")
+                    batch.append(word)
+                    if len(batch) >= backend.max_batch:
+                        break
+                if not batch:
+                    break
+                
+                # 整批一次预留，避免多个协程各持有部分额度时互相等待
+                if budget:
+                    await budget.acquire(initial_cost * len(batch))
+                # 每次后端请求占用一个配额；全部命中缓存、离线后端或熔断期间不占用
+                if (bucket and backend.network and not backend.breaker.is_open
+                        and not all(self.is_cached(word) for word in batch)):
+                    await bucket.acquire()
+                start = time.monotonic()
+                try:
+                    results = await loop.run_in_executor(io_executor, self._fetch_and_probe, batch, max_size)
+                except Exception as e:
+                    results = {word: e for word in batch}
+                elapsed = time.monotonic() - start
+                failed = sum(isinstance(results[word], Exception) for word in batch)
+                fetch_stats.record(elapsed, count=len(batch) - failed)
+                if failed:
+                    fetch_stats.record(0.0, ok=False, count=failed)
+                
+                for word in batch:
+                    result = results[word]
+                    if isinstance(result, Exception):
+                        if isinstance(result, CircuitOpenError):
+                            log(f"  - 生成服务熔断中，跳过请求")
+                            self.telemetry.count('breaker_rejected')
+                        else:
+                            log(f"生成 '{word}' 图片失败: {result}")
+                        self._note_error(word, result)
+                        if budget:
+                            await budget.release(initial_cost)
+                        await fallback(word)
+                        continue
+                    source, source_hash, actual_cost = result
+                    cost = 0
+                    if budget:
+                        cost = await budget.adjust(initial_cost, actual_cost)
+                    await queue.put((word, source, source_hash, cost))
+                    queue_stats.sample(queue.qsize())
         
-        # 生成图片索引文件
-        self.generate_image_index()
+        async def encoder():
+            nonlocal success_count
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                queue_stats.sample(queue.qsize())
+                word, source, source_hash, cost = item
+                start = time.monotonic()
+                try:
+                    # 只有正在编码的图片才整体读入内存
+                    with source:
+                        data = source.read()
+                    output_paths, described, learned = await loop.run_in_executor(
+                        process_pool, encode_task, data, self._variants(word), self.target_size,
+                        self.encode_quality, self._describe_spec(word))
+                except Exception as e:
+                    encode_stats.record(time.monotonic() - start, ok=False)
+                    self.telemetry.record_span('process', time.monotonic() - start, ok=False, word=word)
+                    log(f"处理图片失败: {e}")
+                    self._note_error(word, e)
+                    await fallback(word)
+                    continue
+                finally:
+                    data = None
+                    if budget:
+                        await budget.release(cost)
+                encode_stats.record(time.monotonic() - start)
+                self.telemetry.record_span('process', time.monotonic() - start, word=word)
+                if learned:
+                    self.adaptive_quality.merge(learned)
+                for output_path in output_paths:
+                    log(f"✓ 已保存: {output_path}")
+                self._record_build(word, 'ai', source_hash, described=described)
+                self._record_status(word, 'generated')
+                success_count += 1
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as io_executor, \
+                ProcessPoolExecutor(max_workers=encoders) as process_pool:
+            encode_tasks = [asyncio.create_task(encoder()) for _ in range(encoders)]
+            await asyncio.gather(*(fetcher() for _ in range(concurrency)))
+            for _ in range(encoders):
+                await queue.put(None)
+            await asyncio.gather(*encode_tasks)
+        
+        stats.print_summary()
+        return success_count
     
     def generate_image_index(self):
-        """生成图片索引文件"""
+        """按单词列表完整重建图片索引（用于修复损坏的索引或迁移旧格式）"""
+        with self.telemetry.span('index') as span:
+            try:
+                entries = self.load_word_entries()
+                self._categories = {entry['text']: entry['category'] for entry in entries}
+                index = self._open_index()
+                
+                for word in index.words():
+                    if word not in self._categories:
+                        index.remove(word)
+                for word, category in self._categories.items():
+                    output_path = self._output_path(word)
+                    if os.path.exists(output_path):
+                        index.update(word, output_path, category)
+                    else:
+                        index.remove(word)
+                
+                index.flush()
+                self._save_placeholders()
+                print(f"✓ 已生成图片索引: {index.index_path}")
+                print(f"  - 共索引 {len(index)} 张图片")
+                span['words'] = len(index)
+                
+            except Exception as e:
+                print(f"生成索引文件失败: {e}")
+                span['ok'] = False
+    
+    def merge_shard_indexes(self, paths=None):
+        """把各分片生成的索引合并为 index.json（及按类别的分片索引）
+        
+        paths 为空时合并输出目录下全部 index.shard-*-of-*.json；同一单词出现在多个分片时保留先出现的
+        """
+        if not paths:
+            paths = sorted(glob.glob(os.path.join(self.output_dir, "index.shard-*-of-*.json")))
+        if not paths:
+            print(f"没有找到分片索引: {self.output_dir}")
+            return None
+        
+        found = {}
+        for path in paths:
+            match = re.search(r'index\.shard-(\d+)-of-(\d+)\.json$', path)
+            if match:
+                found.setdefault(int(match.group(2)), set()).add(int(match.group(1)))
+        for count, shards in sorted(found.items()):
+            missing = sorted(set(range(1, count + 1)) - shards)
+            if missing:
+                print(f"警告: 共 {count} 片，缺少第 {', '.join(map(str, missing))} 片的索引")
+        
+        with self.telemetry.span('index_merge', shards=len(paths)) as span:
+            index = ImageIndex(self.output_dir, sharded=self.shard_index)
+            index.clear()
+            for path in paths:
+                conflicts = index.merge(read_index(path))
+                for word in conflicts:
+                    print(f"警告: {word} 在多个分片中的条目不一致，保留先合并的条目（{path}）")
+                print(f"  - {path}")
+            index.flush()
+            span['words'] = len(index)
+        self.index = index
+        print(f"✓ 已合并 {len(paths)} 个分片索引: {index.index_path}")
+        print(f"  - 共索引 {len(index)} 张图片")
+        return index
+    
+    def load_seeds(self, path):
+        self.seeds_path = path
         try:
-            index_data = {}
-            
-            # 扫描图片目录
-            for filename in os.listdir(self.output_dir):
-                if filename.endswith('.jpg'):
-                    word = filename[:-4]  # 去掉.jpg扩展名
-                    index_data[word] = f"assets/images/words/{filename}"
-            
-            # 保存索引文件
-            index_path = os.path.join(self.output_dir, "index.json")
-            with open(index_path, 'w', encoding='utf-8') as f:
-                json.dump(index_data, f, indent=2, ensure_ascii=False)
-            
-            print(f"✓ 已生成图片索引: {index_path}")
-            print(f"  - 共索引 {len(index_data)} 张图片")
-            
+            with open(path, 'r', encoding='utf-8') as f:
+                self.seeds = json.load(f)
+        except (OSError, ValueError):
+            self.seeds = {}
+    
+    def save_seeds(self):
+        if not self.seeds_path:
+            return
+        directory = os.path.dirname(self.seeds_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.seeds_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.seeds, indent=2, ensure_ascii=False, sort_keys=True))
+    
+    def analyze_images(self, report_path, max_distance=6, max_color_distance=24.0):
+        """对已生成的1倍主格式图片查找近似重复和空白图片，写出JSON报告"""
+        try:
+            from image_analysis import analyze_images, print_report, write_report
+        except ImportError:
+            print("图片分析需要安装 numpy: pip install numpy")
+            return None
+        
+        images = {}
+        for entry in self.load_word_entries():
+            path = self._output_path(entry['text'])
+            if entry['text'] not in images and os.path.exists(path):
+                images[entry['text']] = path
+        
+        with self.telemetry.span('analyze', images=len(images)):
+            report = analyze_images(images, max_distance, max_color_distance)
+        write_report(report, report_path)
+        print_report(report)
+        print(f"✓ 分析报告已保存: {report_path}")
+        return report
+    
+    def mark_for_regeneration(self, report_path):
+        """读取分析报告，删除被标记单词的输出并更换随机种子，接下来的生成会重新请求这些单词"""
+        with open(report_path, 'r', encoding='utf-8') as f:
+            words = json.load(f).get('regenerate', [])
+        for word in words:
+            self.seeds[word] = self.seeds.get(word, 0) + 1
+            for path in self._output_paths(word):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if self.manifest is not None:
+                self.manifest.remove(word)
+        self.save_seeds()
+        print(f"已标记 {len(words)} 个单词重新生成")
+        return words
+    
+    def compile_startup_manifest(self, output_path, allow_missing=()):
+        """把单词列表和图片索引编译为应用启动清单，返回引用问题列表（有问题时不写出清单）"""
+        index = self.index
+        if index is None:
+            index = ImageIndex(self.output_dir)
+        # 资源路径相对于Flutter工程根目录，即输出目录去掉 assets/images/words
+        project_root = os.path.normpath(os.path.join(
+            self.output_dir, *[os.pardir] * len(index.asset_prefix.split('/'))))
+        entries = {word: index.get(word) for word in index.words()}
+        
+        with self.telemetry.span('compile_manifest') as span:
+            manifest, problems = compile_manifest(
+                self.load_word_entries(), entries, project_root, allow_missing)
+            span['ok'] = not problems
+        if problems:
+            print_problems(problems)
+            return problems
+        write_manifest(manifest, output_path)
+        print(f"✓ 已编译启动清单: {output_path}")
+        print(f"  - {manifest['count']} 个单词，{len(manifest['categories'])} 个类别")
+        return problems
+    
+    def build_atlases(self, max_size=2048, padding=2, quality=ATLAS_QUALITY):
+        """按words.json中的类别把1倍密度主格式图片打包为图集，quality 为图集的编码质量"""
+        images_by_category = {}
+        for entry in self.load_word_entries():
+            path = self._output_path(entry['text'])
+            if os.path.exists(path):
+                images_by_category.setdefault(entry['category'], {})[entry['text']] = path
+        
+        atlas_dir = os.path.join(self.output_dir, "atlas")
+        try:
+            manifest = build_atlases(
+                images_by_category, atlas_dir, "assets/images/words/atlas",
+                max_size=max_size, padding=padding, fmt=self.formats[0], quality=quality)
         except Exception as e:
-            print(f"生成索引文件失败: {e}")
+            print(f"生成图集失败: {e}")
+            return None
+        
+        print(f"✓ 已生成图集: {atlas_dir}")
+        print(f"  - {len(manifest['atlases'])} 张图集，共 {len(manifest['words'])} 个单词")
+        return manifest
 
 def main():
     parser = argparse.ArgumentParser(description='批量生成单词图片')
@@ -474,9 +1222,80 @@ def main():
     parser.add_argument('--delay', type=float, default=1.0, help='AI请求间隔（秒）')
     parser.add_argument('--size', type=str, default='200x200', help='图片尺寸，格式: 宽x高')
     parser.add_argument('--quality', type=int, default=85, help='JPEG压缩质量 (1-100)')
+    parser.add_argument('--concurrency', type=int, default=1, help='并发请求数，大于1时启用并发模式')
+    parser.add_argument('--rate', type=str, default=None, help='并发模式的全局限速，如 5/s、120/m（默认按 1/delay）')
+    parser.add_argument('--api-base', type=str, default=None, help='生成服务地址，可指向本地桩服务')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help='生成后端: pollinations、batch-http（自建服务的批量接口）、stub（本地桩服务）、procedural（离线绘制）')
+    parser.add_argument('--batch-size', type=int, default=None, help='支持批量的后端每次请求的提示词数（默认 batch-http/stub 16，procedural 32）')
+    parser.add_argument('--stub-latency', type=float, default=0.0, help='stub 后端每个请求的模拟延迟（秒）')
+    parser.add_argument('--pool-size', type=int, default=None, help='HTTP连接池大小（默认不小于并发数）')
+    parser.add_argument('--max-retries', type=int, default=4, help='可重试错误（超时、429、5xx）的最大重试次数')
+    parser.add_argument('--backoff', type=float, default=1.0, help='指数退避的基础等待时间（秒）')
+    parser.add_argument('--breaker-threshold', type=int, default=5, help='连续失败多少次后熔断')
+    parser.add_argument('--breaker-reset', type=float, default=30.0, help='熔断后多久放行试探请求（秒）')
+    parser.add_argument('--memory-budget', type=str, default='512m', help='并发模式下在途图片的内存预算，如 256m；0 表示不限制')
+    parser.add_argument('--spool-size', type=str, default='1m', help='响应体超过该大小时写入磁盘临时文件')
+    parser.add_argument('--max-source-size', type=str, default='32m', help='原图大小上限，超过时视为生成失败')
+    parser.add_argument('--encoders', type=int, default=None, help='并发模式下的编码进程数，--no-ai 时为绘制进程数（默认为CPU核数）')
+    parser.add_argument('--font-path', action='append', default=[], help='备用图标使用的字体文件，可重复指定，优先于内置候选')
+    parser.add_argument('--queue-size', type=int, default=None, help='下载与编码阶段之间的队列容量（默认为编码进程数的2倍）')
+    parser.add_argument('--pipeline-stats', type=str, default=None, help='将流水线各阶段统计写入指定JSON文件')
+    parser.add_argument('--cache-dir', type=str, default='.cache/raw_images', help='原始图片缓存目录')
+    parser.add_argument('--cache-max-mb', type=int, default=1024, help='原始图片缓存容量上限（MB），超出时按LRU淘汰')
+    parser.add_argument('--no-cache', action='store_true', help='不使用原始图片缓存')
+    parser.add_argument('--manifest', type=str, default='.cache/build_manifest.json', help='构建清单路径')
+    parser.add_argument('--no-manifest', action='store_true', help='不使用构建清单，只要图片存在就跳过')
+    parser.add_argument('--dry-run', action='store_true', help='只列出需要重建的单词及原因，不生成')
+    parser.add_argument('--densities', type=str, default='1', help='输出密度，逗号分隔，如 1,2,3')
+    parser.add_argument('--index-shards', action='store_true', help='额外按类别输出分片索引 index/<类别>.json')
+    parser.add_argument('--reindex', action='store_true', help='只按单词列表重建图片索引，不生成图片')
+    parser.add_argument('--words', type=str, default=None, help='单词列表文件，支持 .json（数组）、.jsonl、.csv、.tsv（默认 ../assets/data/words.json）')
+    parser.add_argument('--words-format', choices=WORD_FORMATS, default=None, help='单词列表格式（默认按扩展名判断）')
+    parser.add_argument('--shard', type=str, default=None, metavar='I/N', help='只生成第 I 片（共 N 片，按单词文本哈希划分），索引写入 index.shard-I-of-N.json')
+    parser.add_argument('--merge-index', nargs='*', default=None, metavar='FILE', help='把各分片索引合并为 index.json 后退出（默认合并输出目录下全部分片索引）')
+    parser.add_argument('--compile-manifest', nargs='?', const='../assets/data/words.compiled.json', default=None, metavar='PATH',
+                        help='生成（或 --reindex）完成后编译应用启动清单，默认写入 ../assets/data/words.compiled.json')
+    parser.add_argument('--allow-missing', action='append', default=[], choices=['image', 'audio'],
+                        help='编译启动清单时允许缺失的资源类型，可重复指定')
+    parser.add_argument('--no-placeholders', action='store_true', help='索引条目不附带占位图（BlurHash、主色、内联缩略图）')
+    parser.add_argument('--placeholder-cache', type=str, default='.cache/placeholders.json', help='按图片内容哈希缓存的占位图')
+    parser.add_argument('--blurhash-components', type=str, default='4x3', help='BlurHash 的分量数，格式: x方向x y方向（1-9）')
+    parser.add_argument('--thumb-size', type=int, default=16, help='内联缩略图的最大边长（像素）')
+    parser.add_argument('--atlas', action='store_true', help='生成完成后按类别打包图集')
+    parser.add_argument('--atlas-max-size', type=int, default=2048, help='图集最大边长（像素）')
+    parser.add_argument('--atlas-padding', type=int, default=2, help='图集中图片之间的间距（像素）')
+    parser.add_argument('--atlas-quality', type=int, default=ATLAS_QUALITY, help='图集的编码质量 (1-100)，图块已是有损图片，应高于 --quality')
+    parser.add_argument('--formats', type=str, default='jpeg', help='输出格式，逗号分隔，可选 jpeg,webp,avif；第一个为主格式')
+    parser.add_argument('--max-bytes', type=str, default=None, help='每张1倍图片的字节预算，如 12k；高密度变体按像素数等比放大')
+    parser.add_argument('--min-psnr', type=float, default=None, help='感知质量下限（亮度PSNR，dB），如 38')
+    parser.add_argument('--quality-range', type=str, default='40-95', help='自适应质量的搜索范围')
+    parser.add_argument('--quality-cache', type=str, default='.cache/quality_choices.json', help='自适应质量选择结果的缓存文件')
+    parser.add_argument('--analyze', action='store_true', help='生成完成后查找近似重复和空白图片（需要numpy）')
+    parser.add_argument('--analysis-report', type=str, default='.cache/image_analysis.json', help='图片分析报告路径')
+    parser.add_argument('--dup-distance', type=int, default=6, help='判为近似重复的最大感知哈希距离')
+    parser.add_argument('--regenerate-flagged', type=str, default=None, metavar='REPORT', help='按分析报告重新生成被标记的单词')
+    parser.add_argument('--seeds-file', type=str, default='.cache/word_seeds.json', help='重新生成的单词使用的随机种子记录')
+    parser.add_argument('--journal', type=str, default='.cache/job_journal.sqlite', help='任务日志（SQLite）路径，记录每个单词的处理状态')
+    parser.add_argument('--no-journal', action='store_true', help='不使用任务日志')
+    parser.add_argument('--resume', action='store_true', help='从上次中断处继续，跳过中断的运行中已完成且仍是最新的单词')
+    parser.add_argument('--retry-fallbacks', action='store_true', help='只重新请求上次使用了备用图标的单词')
+    parser.add_argument('--quiet', action='store_true', help='不打印逐个单词的进度，只输出汇总')
+    parser.add_argument('--telemetry-dir', type=str, default='.cache/telemetry', help='事件日志 events.jsonl 和运行汇总 summaries.jsonl 的目录')
+    parser.add_argument('--no-telemetry', action='store_true', help='不写事件日志和运行汇总文件')
+    parser.add_argument('--profile', choices=['cpu', 'memory'], default=None, help='用 cProfile（cpu）或 tracemalloc（memory）剖析本次运行')
+    parser.add_argument('--profile-output', type=str, default=None, help='剖析结果输出文件')
     
     args = parser.parse_args()
     
+    # 解析限速参数
+    rate = None
+    if args.rate:
+        try:
+            rate = parse_rate(args.rate)
+        except ValueError as e:
+            parser.error(f"错误的限速格式: {e}")
+    
     # 解析尺寸参数
     try:
         width, height = map(int, args.size.split('x'))
@@ -485,16 +1304,181 @@ def main():
         print("错误的尺寸格式，使用默认值 200x200")
         target_size = (200, 200)
     
+    if args.backend == 'batch-http' and not args.api_base:
+        parser.error("batch-http 后端需要用 --api-base 指定服务地址")
+    if args.batch_size is not None and args.batch_size < 1:
+        parser.error("--batch-size 至少为1")
+    if args.batch_size and args.batch_size > 1 and not BACKENDS[args.backend].supports_batch:
+        print(f"{args.backend} 后端不支持批量请求，忽略 --batch-size")
+    
+    if (args.resume or args.retry_fallbacks) and args.no_journal:
+        parser.error("--resume 和 --retry-fallbacks 需要任务日志，不能与 --no-journal 同时使用")
+    if args.retry_fallbacks and args.no_ai:
+        parser.error("--retry-fallbacks 需要使用AI生成，不能与 --no-ai 同时使用")
+    
+    # 解析分片参数
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    # 解析密度和格式参数
+    try:
+        densities = sorted({float(d) for d in args.densities.split(',') if d.strip()} | {1.0})
+    except ValueError:
+        parser.error(f"错误的密度格式: {args.densities}")
+    formats = []
+    for fmt in (f.strip().lower() for f in args.formats.split(',')):
+        if fmt not in FORMATS:
+            parser.error(f"不支持的格式: {fmt}")
+        if not format_supported(fmt):
+            print(f"当前Pillow不支持 {fmt} 编码，已跳过")
+            continue
+        if fmt not in formats:
+            formats.append(fmt)
+    if not formats:
+        parser.error("没有可用的输出格式")
+    
+    # 解析自适应质量参数
+    max_bytes = None
+    if args.max_bytes:
+        try:
+            max_bytes = parse_byte_size(args.max_bytes)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        memory_budget = None if args.memory_budget.strip() == '0' else parse_byte_size(args.memory_budget)
+        spool_size = parse_byte_size(args.spool_size)
+        max_source_bytes = parse_byte_size(args.max_source_size)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        min_quality, max_quality = sorted(int(q) for q in args.quality_range.split('-'))
+    except ValueError:
+        parser.error(f"错误的质量范围: {args.quality_range}")
+    try:
+        components = tuple(int(c) for c in args.blurhash_components.lower().split('x'))
+    except ValueError:
+        components = ()
+    if len(components) != 2 or not all(1 <= c <= 9 for c in components):
+        parser.error(f"错误的BlurHash分量数: {args.blurhash_components}（如 4x3，每个方向1-9）")
+    
     # 创建生成器
     generator = WordImageGenerator()
     generator.target_size = target_size
     generator.quality = args.quality
+    generator.densities = tuple(densities)
+    generator.formats = tuple(formats)
+    if max_bytes or args.min_psnr is not None:
+        generator.adaptive_quality = AdaptiveQuality(
+            max_bytes=max_bytes, min_psnr=args.min_psnr,
+            min_quality=max(1, min_quality), max_quality=min(100, max_quality),
+            reference_size=target_size, cache_path=args.quality_cache)
+    if args.api_base:
+        generator.api_base = args.api_base.rstrip('/')
+    generator.backend_name = args.backend
+    generator.batch_size = args.batch_size
+    if args.backend == 'stub':
+        generator.backend_options['latency'] = args.stub_latency
+    generator.pool_size = args.pool_size or max(10, args.concurrency)
+    generator.max_retries = args.max_retries
+    generator.backoff_base = args.backoff
+    generator.breaker_threshold = args.breaker_threshold
+    generator.breaker_reset = args.breaker_reset
+    generator.memory_budget = memory_budget
+    generator.spool_size = spool_size
+    generator.max_source_bytes = max_source_bytes
+    if not args.no_cache:
+        generator.cache = RawImageCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    if not args.no_manifest:
+        generator.manifest = BuildManifest(args.manifest)
+    
+    generator.shard_index = args.index_shards
+    if not args.no_placeholders and not args.dry_run:
+        try:
+            from placeholders import PlaceholderCache
+        except ImportError:
+            print("占位图需要安装 numpy: pip install numpy（本次索引不附带占位图）")
+        else:
+            generator.placeholders = PlaceholderCache(args.placeholder_cache, components, args.thumb_size)
+    if args.words:
+        generator.words_data_path = args.words
+    generator.words_format = args.words_format
+    generator.shard = shard
+    generator.font_paths = args.font_path
+    generator.load_seeds(args.seeds_file)
+    if not args.no_journal and not args.dry_run and not args.reindex and args.merge_index is None:
+        generator.journal = JobJournal(args.journal)
+    if args.regenerate_flagged and not args.dry_run:
+        generator.mark_for_regeneration(args.regenerate_flagged)
+    
+    events_path = summary_path = None
+    if not args.no_telemetry and not args.dry_run:
+        events_path = os.path.join(args.telemetry_dir, 'events.jsonl')
+        summary_path = os.path.join(args.telemetry_dir, 'summaries.jsonl')
+    generator.telemetry = Telemetry(events_path, quiet=args.quiet)
+    
+    if args.merge_index is not None:
+        generator.merge_shard_indexes(args.merge_index)
+        generator.telemetry.close(summary_path)
+        return
+    
+    problems = []
+    try:
+        with profiler(args.profile, args.profile_output):
+            if args.reindex:
+                generator.generate_image_index()
+            else:
+                # 开始生成
+                generator.generate_all_images(
+                    use_ai=not args.no_ai,
+                    delay=args.delay,
+                    concurrency=args.concurrency,
+                    rate=rate,
+                    encoders=args.encoders,
+                    queue_size=args.queue_size,
+                    dry_run=args.dry_run,
+                    resume=args.resume,
+                    retry_fallbacks=args.retry_fallbacks
+                )
+            
+                if args.atlas and not args.dry_run:
+                    if shard is None:
+                        generator.build_atlases(max_size=args.atlas_max_size, padding=args.atlas_padding,
+                                                quality=args.atlas_quality)
+                    else:
+                        print("分片模式下不打包图集，请在合并索引后统一打包")
+                if args.analyze and not args.dry_run:
+                    generator.analyze_images(args.analysis_report, max_distance=args.dup_distance)
+            if args.compile_manifest and not args.dry_run:
+                if shard is None:
+                    problems = generator.compile_startup_manifest(args.compile_manifest, args.allow_missing)
+                else:
+                    print("分片模式下不编译启动清单，请在合并索引后编译")
+    except WordSourceError as e:
+        generator.telemetry.close(summary_path)
+        if generator.journal is not None:
+            generator.journal.close('failed')
+        parser.exit(1, f"单词列表格式错误: {e}\n")
+    except BaseException:
+        # 中断（Ctrl-C、异常）时保存已完成的状态，之后可用 --resume 继续
+        generator.save_progress()
+        if generator.journal is not None:
+            generator.journal.close('interrupted')
+        raise
+    if generator.journal is not None:
+        generator.journal.close()
+    generator.telemetry.close(summary_path)
+    if problems:
+        parser.exit(1, "启动清单存在无效引用，未写出\n")
+    if args.reindex:
+        return
     
-    # 开始生成
-    generator.generate_all_images(
-        use_ai=not args.no_ai,
-        delay=args.delay
-    )
+    if args.pipeline_stats and generator.pipeline_stats:
+        with open(args.pipeline_stats, 'w', encoding='utf-8') as f:
+            json.dump(generator.pipeline_stats.to_dict(), f, indent=2, ensure_ascii=False)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成服务的HTTP客户端
+复用连接池（keep-alive）避免每个请求重新握手；可重试的错误按指数退避加随机抖动重试，
+并遵守 Retry-After；连续失败过多时熔断，熔断期间请求直接失败，由调用方改用备用图标。
+响应体可以流式写入临时文件，不在内存中缓冲整个响应
+"""
+
+import hashlib
+import random
+import tempfile
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求未发出"""
+
+
+class CircuitBreaker:
+    """熔断器：closed（正常）→ 连续失败达到阈值 → open（拒绝请求）
+    → 经过 reset_timeout → half_open（放行一个试探请求，成功则关闭，失败则重新打开）
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_count = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opened_count += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.state == 'open' and time.monotonic() - self._opened_at < self.reset_timeout
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（秒数或HTTP日期），返回等待秒数；无法解析时返回None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class BackendClient:
+    """带连接池、重试和熔断的HTTP客户端，可在多个线程间共享"""
+
+    def __init__(self, pool_size=10, max_retries=4, backoff_base=1.0, backoff_max=30.0,
+                 breaker=None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _backoff(self, attempt, retry_after):
+        if retry_after is not None:
+            # 服务端明确要求的等待时间，上限放宽到退避上限的4倍
+            return min(retry_after, self.backoff_max * 4)
+        # 指数退避 + 完全随机抖动，避免并发请求同时重试
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, timeout=30, **kwargs):
+        """发送请求；可重试错误自动重试，不可重试的HTTP错误直接抛出
+
+        熔断器打开时抛出 CircuitOpenError
+        """
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow_request():
+                raise CircuitOpenError("生成服务熔断中，暂停请求")
+
+            with self._lock:
+                self.requests += 1
+                if attempt:
+                    self.retries += 1
+            retry_after = None
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    # 服务可达（包括4xx等不可重试的错误），不计入熔断
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                error = requests.HTTPError(
+                    f"{response.status_code} Server Error for url: {url}", response=response)
+                response.close()
+
+            self.breaker.record_failure()
+            if attempt == self.max_retries:
+                raise error
+            time.sleep(self._backoff(attempt, retry_after))
+
+    def get(self, url, timeout=30, **kwargs):
+        return self.request('GET', url, timeout, **kwargs)
+
+    def post(self, url, timeout=30, **kwargs):
+        return self.request('POST', url, timeout, **kwargs)
+
+    def download(self, url, timeout=30, spool_size=1024 * 1024, max_bytes=None, chunk_size=64 * 1024):
+        """流式下载响应体，返回 (临时文件, 字节数, sha256)，文件已定位到开头
+
+        不超过 spool_size 的响应体留在内存中，更大的写入磁盘临时文件；
+        超过 max_bytes 时抛出 ValueError。调用方负责关闭返回的文件
+        """
+        response = self.get(url, timeout=timeout, stream=True)
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with response:
+                length = response.headers.get('Content-Length')
+                if max_bytes and length and length.isdigit() and int(length) > max_bytes:
+                    raise ValueError(f"响应体过大: {length} 字节，上限 {max_bytes}")
+                for chunk in response.iter_content(chunk_size):
+                    size += len(chunk)
+                    if max_bytes and size > max_bytes:
+                        raise ValueError(f"响应体超过上限 {max_bytes} 字节")
+                    digest.update(chunk)
+                    spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool, size, digest.hexdigest()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'breaker_state': self.breaker.state,
+            'breaker_opened': self.breaker.opened_count,
+        }
+
+    def close(self):
+        self.session.close()
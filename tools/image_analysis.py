@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成图片的质量分析
+对全部图片计算感知哈希（DCT pHash），查找近似重复的图片簇，并标出空白或低方差（几乎没有内容）的图片。
+哈希和统计量都用NumPy批量计算。查重先把哈希相同、平均颜色落在同一颜色格的图片合并为一个节点，
+只在节点之间做多索引哈希查找，大量图片彼此相似（如同一模板的备用图标）时也不会逐对比较，
+数万张图片在数秒内完成。结果输出为JSON报告，可交给生成脚本重新生成被标记的单词
+
+用法:
+    python image_analysis.py ../assets/images/words --report .cache/image_analysis.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+REPORT_VERSION = 2
+THUMB_SIZE = 32   # 计算哈希和统计量的缩略图边长
+HASH_SIZE = 8     # 取DCT左上角 8x8 低频系数，得到64位哈希
+HISTOGRAM_BINS = 32
+CHUNK_SIZE = 4096  # 分块计算特征，限制浮点中间结果的内存占用
+MAX_PAIRS_PER_CLUSTER = 20  # 报告中每个重复簇最多列出的图片对（簇首与其他成员）
+
+
+def _load_chunk(paths, size):
+    thumbs = np.empty((len(paths), size, size, 3), dtype=np.uint8)
+    loaded = []
+    errors = []
+    for i, path in enumerate(paths):
+        try:
+            with Image.open(path) as image:
+                # JPEG在解码时直接按 1/2、1/4、1/8 缩小，只解码到不小于缩略图的尺寸
+                image.draft('RGB', (size, size))
+                thumb = image.convert('RGB').resize((size, size), Image.Resampling.BILINEAR)
+            thumbs[len(loaded)] = np.asarray(thumb)
+            loaded.append(i)
+        except Exception as e:
+            errors.append((i, str(e)))
+    return thumbs[:len(loaded)], loaded, errors
+
+
+def load_thumbnails(paths, size=THUMB_SIZE, workers=None):
+    """解码为 size x size 的RGB缩略图，返回 (数组[N, size, size, 3], 成功的下标, 失败列表)
+
+    workers > 1 且图片较多时分块交给进程池并行解码
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) < 2000:
+        return _load_chunk(paths, size)
+
+    step = max(500, -(-len(paths) // (workers * 4)))
+    starts = range(0, len(paths), step)
+    parts, loaded, errors = [], [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_load_chunk, [paths[i:i + step] for i in starts], [size] * len(starts))
+        for start, (thumbs, chunk_loaded, chunk_errors) in zip(starts, results):
+            parts.append(thumbs)
+            loaded.extend(start + i for i in chunk_loaded)
+            errors.extend((start + i, error) for i, error in chunk_errors)
+    return np.concatenate(parts), loaded, errors
+
+
+def to_luma(thumbs):
+    """RGB缩略图（浮点）批量转换为亮度 (ITU-R BT.601)"""
+    return thumbs @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+def perceptual_hashes(luma, hash_size=HASH_SIZE):
+    """批量计算DCT感知哈希，返回 uint64 数组
+
+    对每张缩略图做二维DCT，取左上角低频系数，与除直流分量外的中位数比较得到各位
+    """
+    dct = _dct_matrix(luma.shape[1])
+    coefficients = dct @ luma @ dct.T
+    low = coefficients[:, :hash_size, :hash_size].reshape(len(luma), -1)
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = np.packbits(low > median, axis=1)
+    return bits.view('>u8').ravel().astype(np.uint64)
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount64(values):
+    """uint64 数组每个元素中1的个数"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):  # NumPy 2.0+
+        return np.bitwise_count(values).astype(np.int64)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+SEGMENT_BITS = 16  # 多索引哈希每段的位数，64位哈希分为4段
+
+
+def _flip_masks(bits, radius):
+    """段内最多翻转 radius 位的全部掩码"""
+    masks = [0]
+    for count in range(1, radius + 1):
+        for positions in itertools.combinations(range(bits), count):
+            masks.append(sum(1 << p for p in positions))
+    return np.array(masks, dtype=np.uint64)
+
+
+def candidate_pairs(hashes, max_distance):
+    """多索引哈希：64位哈希切成4段16位，两个哈希距离不超过 max_distance 时，
+    至少有一段的距离不超过 max_distance // 4（抽屉原理）。
+    每段按值排序后，对每个哈希在段内半径内的全部取值做二分查找，只比较落在同一桶的候选对。
+    返回 (i, j) 数组，i < j
+    """
+    n = len(hashes)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    segment_count = 64 // SEGMENT_BITS
+    flips = _flip_masks(SEGMENT_BITS, max_distance // segment_count)
+    mask = np.uint64((1 << SEGMENT_BITS) - 1)
+    items = np.arange(n, dtype=np.int64)
+    codes = []
+    for segment in range(segment_count):
+        values = (hashes >> np.uint64(segment * SEGMENT_BITS)) & mask
+        order = np.argsort(values, kind='stable')
+        ordered = values[order]
+        for flip in flips:
+            probes = values ^ flip
+            left = np.searchsorted(ordered, probes, side='left')
+            counts = np.searchsorted(ordered, probes, side='right') - left
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # 把每个哈希命中的桶区间展开为候选对
+            first = np.repeat(items, counts)
+            starts = np.repeat(left - (np.cumsum(counts) - counts), counts)
+            second = order[starts + np.arange(total)]
+            keep = first < second
+            codes.append(first[keep] * n + second[keep])
+    codes = np.unique(np.concatenate(codes)) if codes else np.empty(0, dtype=np.int64)
+    return np.stack([codes // n, codes % n], axis=1)
+
+
+def _entropy(luma, bins=HISTOGRAM_BINS):
+    """每张图片亮度直方图的熵（比特）"""
+    n = len(luma)
+    levels = np.clip(luma.reshape(n, -1) * (bins / 256.0), 0, bins - 1).astype(np.int64)
+    offsets = (np.arange(n, dtype=np.int64) * bins)[:, None]
+    counts = np.bincount((levels + offsets).ravel(), minlength=n * bins).reshape(n, bins)
+    probabilities = counts / counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.where(probabilities > 0, probabilities * np.log2(probabilities), 0.0).sum(axis=1)
+
+
+def thumbnail_features(thumbs, chunk_size=CHUNK_SIZE):
+    """批量计算每张缩略图的特征，分块处理以限制内存
+
+    返回 (感知哈希, 平均颜色[N, 3], 各颜色通道标准差的最大值, 亮度直方图熵)。
+    按通道计算标准差，亮度接近但颜色不同的图形（如淡蓝底上的黄色香蕉）不会被误判为空白
+    """
+    n = len(thumbs)
+    hashes = np.empty(n, dtype=np.uint64)
+    mean_colors = np.empty((n, 3), dtype=np.float32)
+    std = np.empty(n, dtype=np.float32)
+    entropy = np.empty(n, dtype=np.float64)
+    for start in range(0, n, chunk_size):
+        chunk = thumbs[start:start + chunk_size].astype(np.float32)
+        end = start + len(chunk)
+        pixels = chunk.reshape(len(chunk), -1, 3)
+        luma = to_luma(chunk)
+        hashes[start:end] = perceptual_hashes(luma)
+        # 用一阶、二阶矩计算均值和方差，避免沿非连续轴计算 std 的额外开销
+        mean = np.einsum('npc->nc', pixels) / pixels.shape[1]
+        square_mean = np.einsum('npc,npc->nc', pixels, pixels) / pixels.shape[1]
+        mean_colors[start:end] = mean
+        std[start:end] = np.sqrt(np.maximum(square_mean - mean * mean, 0)).max(axis=1)
+        entropy[start:end] = _entropy(luma)
+    return hashes, mean_colors, std, entropy
+
+
+def _neighbour_nodes(unique_hashes, node_keys, reach, max_distance):
+    """候选节点对 (a, b) 数组（a < b）：两节点的哈希距离不超过 max_distance（含哈希相同），
+    且颜色格在每个通道上相差不超过 reach 格。先按哈希查找哈希对，再在颜色格上做查表连接，
+    大量节点哈希相同时也不会展开为两两组合
+    """
+    node_count = len(node_keys)
+    hash_pairs = candidate_pairs(unique_hashes, max_distance)
+    if len(hash_pairs):
+        distances = popcount64(unique_hashes[hash_pairs[:, 0]] ^ unique_hashes[hash_pairs[:, 1]])
+        hash_pairs = hash_pairs[distances <= max_distance]
+    same = np.arange(len(unique_hashes), dtype=np.int64)
+    hash_pairs = np.concatenate([np.column_stack([same, same]), hash_pairs])
+
+    # 节点按 (哈希编号, 颜色格) 排序，编码为单个整数后用二分查找定位
+    cells = node_keys[:, 1:]
+    low = cells.min(axis=0) - reach
+    base = cells.max(axis=0) + reach - low + 1
+
+    def encode(hash_ids, cell):
+        shifted = cell - low
+        return ((hash_ids * base[0] + shifted[:, 0]) * base[1] + shifted[:, 1]) * base[2] + shifted[:, 2]
+
+    codes = encode(node_keys[:, 0], cells)
+    hash_starts = np.searchsorted(node_keys[:, 0], np.arange(len(unique_hashes) + 1))
+    counts = hash_starts[hash_pairs[:, 0] + 1] - hash_starts[hash_pairs[:, 0]]
+    total = int(counts.sum())
+    # 展开为 (哈希为 u 的节点, 对方哈希 v)
+    sources = np.repeat(hash_starts[hash_pairs[:, 0]] - (np.cumsum(counts) - counts), counts) + np.arange(total)
+    targets = np.repeat(hash_pairs[:, 1], counts)
+
+    found = []
+    steps = np.arange(-reach, reach + 1)
+    for offset in np.stack(np.meshgrid(steps, steps, steps, indexing='ij'), axis=-1).reshape(-1, 3):
+        probes = encode(targets, cells[sources] + offset)
+        positions = np.minimum(np.searchsorted(codes, probes), node_count - 1)
+        hit = codes[positions] == probes
+        a, b = sources[hit], positions[hit]
+        keep = a != b
+        found.append(np.minimum(a, b)[keep] * node_count + np.maximum(a, b)[keep])
+    found = np.unique(np.concatenate(found))
+    return np.stack([found // node_count, found % node_count], axis=1)
+
+
+def duplicate_clusters(hashes, mean_colors, max_distance=6, max_color_distance=24.0):
+    """把近似重复的图片分簇，返回下标数组的列表（每簇至少2张，第一个为簇首）
+
+    按下标顺序，尚未分簇的第一张图片作为簇首，与它直接构成近似重复（哈希距离和平均颜色距离都不超过阈值）
+    的其余未分簇图片并入该簇；不经由中间图片传递，颜色逐渐变化的一串图片（如红、橙、黄）不会连成一簇。
+    哈希相同且平均颜色落在同一颜色格的图片合并为一个节点，候选只在节点之间查找，
+    比较次数只取决于不同节点的数量，与彼此相同的图片数量无关；最终逐张按真实颜色判断
+    """
+    n = len(hashes)
+    if n < 2:
+        return []
+    mean_colors = np.asarray(mean_colors, dtype=np.float64)
+    cell = max(max_color_distance / math.sqrt(3), 1e-6)
+    cells = np.floor(mean_colors / cell).astype(np.int64)
+    unique_hashes, hash_ids = np.unique(hashes, return_inverse=True)
+    node_keys, node_of = np.unique(np.column_stack([hash_ids.ravel(), cells]), axis=0,
+                                   return_inverse=True)
+    node_of = node_of.ravel()
+    node_count = len(node_keys)
+    lows = np.full((node_count, 3), np.inf)
+    highs = np.full((node_count, 3), -np.inf)
+    np.minimum.at(lows, node_of, mean_colors)
+    np.maximum.at(highs, node_of, mean_colors)
+
+    # 颜色相差不超过阈值的两张图片，所在颜色格在每个通道上最多相差 reach 格；
+    # 再用两个节点颜色包围盒之间的最短距离（任意两张图片颜色距离的下界）排除不可能重复的节点对
+    reach = int(math.ceil(max_color_distance / cell))
+    pairs = _neighbour_nodes(unique_hashes, node_keys, reach, max_distance)
+    a, b = pairs[:, 0], pairs[:, 1]
+    gaps = np.maximum(0.0, np.maximum(lows[a] - highs[b], lows[b] - highs[a]))
+    pairs = pairs[np.linalg.norm(gaps, axis=1) <= max_color_distance]
+    pairs = np.concatenate([pairs, pairs[:, ::-1]])
+    pairs = pairs[np.argsort(pairs[:, 0], kind='stable')]
+    neighbour_starts = np.searchsorted(pairs[:, 0], np.arange(node_count + 1))
+
+    order = np.argsort(node_of, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(np.bincount(node_of, minlength=node_count))])
+    remaining = [order[starts[node]:starts[node + 1]] for node in range(node_count)]  # 各节点未分簇的图片
+    assigned = np.zeros(n, dtype=bool)
+    clusters = []
+    for head in range(n):
+        if assigned[head]:
+            continue
+        assigned[head] = True
+        node = node_of[head]
+        nearby = [node] + pairs[neighbour_starts[node]:neighbour_starts[node + 1], 1].tolist()
+        for other in nearby:
+            remaining[other] = remaining[other][~assigned[remaining[other]]]
+        candidates = np.concatenate([remaining[other] for other in nearby])
+        if not len(candidates):
+            continue
+        close = np.linalg.norm(mean_colors[candidates] - mean_colors[head], axis=1) <= max_color_distance
+        members = np.sort(candidates[close])
+        if len(members):
+            assigned[members] = True
+            clusters.append(np.concatenate([[head], members]))
+    return clusters
+
+
+def analyze_images(images, max_distance=6, max_color_distance=24.0, blank_std=4.0,
+                   low_std=12.0, min_entropy=0.3):
+    """分析 {单词: 图片路径}（按词表顺序），返回报告字典
+
+    regenerate 列出建议重新生成的单词：空白/低方差的图片，以及每个重复簇中除第一个单词外的其他单词。
+    duplicates 只列出每簇的簇首与其他成员的前 MAX_PAIRS_PER_CLUSTER 对，完整成员见 clusters
+    """
+    start = time.perf_counter()
+    words = list(images)
+    thumbs, loaded, errors = load_thumbnails([images[word] for word in words])
+    words_loaded = [words[i] for i in loaded]
+    hashes, mean_colors, std, entropy = thumbnail_features(thumbs)
+
+    degenerate = []
+    for word, value, bits in zip(words_loaded, std.tolist(), entropy.tolist()):
+        if value < blank_std:
+            reason = 'blank'
+        elif value < low_std or bits < min_entropy:
+            reason = 'low_variance'
+        else:
+            continue
+        degenerate.append({'word': word, 'reason': reason,
+                           'std': round(value, 2), 'entropy': round(bits, 2)})
+
+    # 空白图片的哈希没有意义，不参与查重
+    blank = {entry['word'] for entry in degenerate if entry['reason'] == 'blank'}
+    candidates = np.array([i for i, word in enumerate(words_loaded) if word not in blank],
+                          dtype=np.int64)
+    clusters = []
+    duplicates = []
+    if len(candidates):
+        # 下标按词表顺序递增，簇首即簇内词表中最靠前的单词，簇按簇首的顺序排列
+        groups = [candidates[group] for group in duplicate_clusters(
+            hashes[candidates], mean_colors[candidates], max_distance, max_color_distance)]
+        for group in groups:
+            clusters.append([words_loaded[i] for i in group])
+            head, members = group[0], group[1:MAX_PAIRS_PER_CLUSTER + 1]
+            distances = popcount64(hashes[members] ^ hashes[head])
+            color_distances = np.linalg.norm(mean_colors[members] - mean_colors[head], axis=1)
+            for i, distance, color_distance in zip(members, distances.tolist(), color_distances.tolist()):
+                duplicates.append({
+                    'words': [words_loaded[head], words_loaded[i]],
+                    'distance': distance,
+                    'color_distance': round(color_distance, 2),
+                })
+
+    order = {word: i for i, word in enumerate(words)}
+    regenerate = {entry['word'] for entry in degenerate}
+    for cluster in clusters:
+        regenerate.update(cluster[1:])
+
+    return {
+        'version': REPORT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {
+            'max_distance': max_distance,
+            'max_color_distance': max_color_distance,
+            'blank_std': blank_std,
+            'low_std': low_std,
+            'min_entropy': min_entropy,
+            'max_pairs_per_cluster': MAX_PAIRS_PER_CLUSTER,
+        },
+        'images': len(words_loaded),
+        'elapsed_seconds': round(time.perf_counter() - start, 3),
+        'duplicates': duplicates,
+        'clusters': clusters,
+        'degenerate': degenerate,
+        'unreadable': [{'word': words[i], 'path': images[words[i]], 'error': error}
+                       for i, error in errors],
+        'regenerate': sorted(regenerate, key=order.__getitem__),
+    }
+
+
+def write_report(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(report, indent=2, ensure_ascii=False))
+    os.replace(tmp_path, path)
+
+
+def print_report(report):
+    print(f"图片分析: {report['images']} 张，耗时 {report['elapsed_seconds']:.2f} 秒")
+    clusters = report['clusters']
+    print(f"  - 近似重复: {len(clusters)} 簇，共 {sum(len(cluster) for cluster in clusters)} 张")
+    for cluster in clusters[:10]:
+        shown = ' / '.join(cluster[:8])
+        print(f"      {shown}" + (f" ... 共 {len(cluster)} 张" if len(cluster) > 8 else ""))
+    print(f"  - 空白或低方差: {len(report['degenerate'])} 张")
+    for entry in report['degenerate'][:10]:
+        print(f"      {entry['word']}: {entry['reason']} (std {entry['std']}, 熵 {entry['entropy']})")
+    if report['unreadable']:
+        print(f"  - 无法读取: {len(report['unreadable'])} 张")
+    print(f"  - 建议重新生成: {len(report['regenerate'])} 个单词")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='单词图片查重与空白图片检测')
+    parser.add_argument('directory', help='图片目录（读取其中的 index.json）')
+    parser.add_argument('--report', default='.cache/image_analysis.json', help='JSON报告输出路径')
+    parser.add_argument('--max-distance', type=int, default=6, help='判为近似重复的最大哈希距离（0-63）')
+    parser.add_argument('--max-color-distance', type=float, default=24.0, help='判为近似重复的最大平均颜色距离')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.directory, 'index.json'), 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    images = {}
+    for word, entry in index.items():
+        path = entry if isinstance(entry, str) else entry['path']
+        images[word] = os.path.join(args.directory, os.path.basename(path))
+
+    report = analyze_images(images, args.max_distance, args.max_color_distance)
+    write_report(report, args.report)
+    print_report(report)
+    print(f"报告已保存: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
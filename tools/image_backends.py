@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片生成后端
+把“提示词 → 原始图片”抽象为可替换的后端，按名称注册，命令行用 --backend 选择：
+
+    pollinations  Pollinations 的 GET /prompt/<提示词> 接口（默认），每次请求一张
+    batch-http    自建模型服务的批量接口 POST <api-base>/batch，一次请求多个提示词（协议见 stub_server.py）
+    stub          在后台线程启动本地桩服务并使用批量接口，不依赖外部网络
+    procedural    在本进程内按提示词确定性地绘制，不发出任何请求，用于CI和离线开发
+
+支持批量的后端一次收到最多 max_batch 个提示词，往返延迟、排队和模型调度等每次请求的固定开销由整批分摊。
+后端返回的原图写入 SpooledTemporaryFile（小于 spool_size 时在内存中），与单张下载的结果形式相同
+"""
+
+import base64
+import hashlib
+import tempfile
+import threading
+from collections import namedtuple
+from urllib.parse import quote
+
+from stub_server import render_stub_image, start_stub_server
+
+DEFAULT_BACKEND = 'pollinations'
+
+# 一个生成请求；seed 为 None 时使用服务端默认
+GenerationRequest = namedtuple('GenerationRequest', 'prompt seed')
+
+BACKENDS = {}
+
+
+def register_backend(cls):
+    """类装饰器：按 cls.name 注册后端"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def create_backend(name, **options):
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的生成后端: {name}（可选 {', '.join(sorted(BACKENDS))}）")
+    return cls(**options)
+
+
+def backend_identity(name, model):
+    """参与缓存键和构建指纹的模型标识：默认后端与旧版本相同，其他后端生成的原图互不复用"""
+    return model if name == DEFAULT_BACKEND else f"{name}:{model}"
+
+
+def spool_bytes(data, spool_size, max_bytes=None):
+    """把图片字节写入临时文件，返回 (文件, 字节数, sha256)，文件已定位到开头"""
+    if max_bytes and len(data) > max_bytes:
+        raise ValueError(f"原图超过上限 {max_bytes} 字节")
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    spool.write(data)
+    spool.seek(0)
+    return spool, len(data), hashlib.sha256(data).hexdigest()
+
+
+class ImageBackend:
+    """生成后端的基类
+
+    子类实现 _generate(requests)，按顺序返回每个请求的 (文件, 字节数, sha256) 或异常实例；
+    整批失败（如连接错误、熔断）时直接抛出异常
+    """
+
+    name = None
+    supports_batch = False
+    default_batch = 1
+    network = False  # 是否请求网络服务：决定是否占用限速配额、是否需要请求间隔
+
+    def __init__(self, size=(400, 400), model='flux', enhance=True, timeout=30,
+                 spool_size=1024 * 1024, max_bytes=None, batch_size=None):
+        self.size = tuple(size)
+        self.model = model
+        self.enhance = enhance
+        self.timeout = timeout
+        self.spool_size = spool_size
+        self.max_bytes = max_bytes
+        self.max_batch = max(1, batch_size or self.default_batch) if self.supports_batch else 1
+        self.calls = 0
+        self.images = 0
+        self._lock = threading.Lock()
+
+    @property
+    def breaker(self):
+        """熔断器（没有时为None）"""
+        return None
+
+    def generate(self, requests):
+        """生成一批图片，requests 不超过 max_batch 个"""
+        if len(requests) > self.max_batch:
+            raise ValueError(f"{self.name} 每批最多 {self.max_batch} 个提示词，收到 {len(requests)} 个")
+        with self._lock:
+            self.calls += 1
+            self.images += len(requests)
+        return self._generate(requests)
+
+    def _generate(self, requests):
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': self.name, 'calls': self.calls, 'images': self.images}
+
+    def close(self):
+        pass
+
+
+class HTTPBackend(ImageBackend):
+    """通过 BackendClient（连接池、重试、熔断）访问生成服务的后端"""
+
+    network = True
+
+    def __init__(self, client, api_base, **options):
+        super().__init__(**options)
+        self.client = client
+        self.api_base = api_base.rstrip('/')
+
+    @property
+    def breaker(self):
+        return self.client.breaker
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(self.client.stats())
+        return stats
+
+
+@register_backend
+class PollinationsBackend(HTTPBackend):
+    """GET /prompt/<提示词>，响应体即图片，流式写入临时文件"""
+
+    name = 'pollinations'
+
+    def request_url(self, prompt, seed=None):
+        width, height = self.size
+        enhance = 'true' if self.enhance else 'false'
+        url = (f"{self.api_base}/prompt/{quote(prompt)}"
+               f"?width={width}&height={height}&model={self.model}&enhance={enhance}")
+        if seed is not None:
+            url += f"&seed={seed}"
+        return url
+
+    def _generate(self, requests):
+        return [self.client.download(self.request_url(request.prompt, request.seed), timeout=self.timeout,
+                                     spool_size=self.spool_size, max_bytes=self.max_bytes)
+                for request in requests]
+
+
+@register_backend
+class BatchHTTPBackend(HTTPBackend):
+    """POST /batch，一次请求多个提示词，图片以base64返回"""
+
+    name = 'batch-http'
+    supports_batch = True
+    default_batch = 16
+
+    def _generate(self, requests):
+        payload = {
+            'model': self.model,
+            'width': self.size[0],
+            'height': self.size[1],
+            'enhance': self.enhance,
+            'prompts': [{'prompt': request.prompt, 'seed': request.seed} for request in requests],
+        }
+        # 服务端整批生成后才开始响应，超时按提示词数放大
+        response = self.client.post(f"{self.api_base}/batch", json=payload,
+                                    timeout=self.timeout * len(requests))
+        images = response.json().get('images')
+        if not isinstance(images, list) or len(images) != len(requests):
+            raise ValueError(f"批量响应应包含 {len(requests)} 张图片")
+
+        results = []
+        for image in images:
+            image = image if isinstance(image, dict) else {}
+            if 'data' not in image:
+                # 单张失败不影响同批的其他图片
+                results.append(ValueError(f"服务端未返回图片: {image.get('error') or '缺少图片数据'}"))
+                continue
+            try:
+                data = base64.b64decode(image['data'], validate=True)
+                results.append(spool_bytes(data, self.spool_size, self.max_bytes))
+            except ValueError as e:
+                results.append(e)
+        return results
+
+
+@register_backend
+class StubBackend(BatchHTTPBackend):
+    """在后台线程启动本地桩服务（stub_server.py）并通过批量接口请求，latency 为每个请求的模拟延迟"""
+
+    name = 'stub'
+
+    def __init__(self, client, api_base=None, latency=0.0, **options):
+        # 桩服务监听随机端口，忽略 api_base
+        self.server, base_url = start_stub_server(latency=latency)
+        super().__init__(client, base_url, **options)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@register_backend
+class ProceduralBackend(ImageBackend):
+    """离线后端：按提示词和种子确定性地绘制图片（与桩服务的图片相同），不发出任何请求"""
+
+    name = 'procedural'
+    supports_batch = True
+    default_batch = 32
+
+    def _generate(self, requests):
+        return [spool_bytes(render_stub_image(request.prompt, self.size, request.seed),
+                            self.spool_size, self.max_bytes)
+                for request in requests]
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成服务原始图片的本地缓存
+以 (提示词, 模型, 宽, 高, enhance) 的哈希为键保存原始字节，
+修改输出尺寸或压缩质量时可以直接从缓存重新处理，无需再次请求生成服务
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+class RawImageCache:
+    """按请求参数寻址的原始图片缓存，超过容量上限时按LRU淘汰"""
+
+    INDEX_FILE = "index.json"
+    SAVE_INTERVAL = 1.0  # 两次自动保存索引的最小间隔（秒）
+
+    def __init__(self, cache_dir, max_bytes=1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> {'size', 'sha256', 'last_access'}，按最近访问排序
+        self._total_bytes = 0
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(prompt, model, width, height, enhance, seed=None):
+        """计算缓存键（未指定 seed 时与旧版本的键相同）"""
+        fields = [prompt, model, width, height, bool(enhance)]
+        if seed is not None:
+            fields.append(seed)
+        payload = json.dumps(fields, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _object_path(self, key):
+        return os.path.join(self.cache_dir, "objects", key[:2], f"{key}.bin")
+
+    def _load_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]['last_access']):
+            if os.path.exists(self._object_path(key)):
+                self._entries[key] = entry
+                self._total_bytes += entry['size']
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def source_hash(self, key):
+        """返回缓存中原始字节的sha256（不读取文件），不存在时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['sha256'] if entry else None
+
+    def open(self, key):
+        """打开缓存对象（二进制只读），未命中返回None；调用方负责关闭"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                f = open(self._object_path(key), 'rb')
+            except OSError:
+                self._remove(key)
+                self.misses += 1
+                return None
+            entry['last_access'] = time.time()
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return f
+
+    def put_file(self, key, source, sha256):
+        """从文件对象流式写入缓存（不整体读入内存），写完后把 source 定位回开头"""
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        source.seek(0)
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(source, f)
+            size = f.tell()
+        source.seek(0)
+        os.replace(tmp_path, path)
+        self._add(key, size, sha256)
+
+    def _add(self, key, size, sha256):
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)['size']
+            self._entries[key] = {
+                'size': size,
+                'sha256': sha256,
+                'last_access': time.time(),
+            }
+            self._total_bytes += size
+            self._evict(keep=key)
+            self._unsaved += 1
+            if time.monotonic() - self._last_save >= self.SAVE_INTERVAL:
+                self._save_locked()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry['size']
+        try:
+            os.remove(self._object_path(key))
+        except OSError:
+            pass
+
+    def _evict(self, keep=None):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove(key)
+            self.evictions += 1
+
+    def _save_locked(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self._entries))
+        os.replace(tmp_path, index_path)
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def save(self):
+        """保存索引"""
+        with self._lock:
+            self._save_locked()
+
+    def stats(self):
+        """命中/未命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def print_summary(self):
+        stats = self.stats()
+        print(f"原图缓存: 命中 {stats['hits']}，未命中 {stats['misses']}，"
+              f"命中率 {stats['hit_rate']:.0%}，淘汰 {stats['evictions']}，"
+              f"共 {stats['entries']} 条 / {stats['bytes'] / 1024 / 1024:.1f}MB")
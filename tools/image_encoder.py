@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片解码、缩放与编码
+这里的函数都是模块级的，可以直接提交给进程池执行。
+JPEG原图按最大输出尺寸缩放解码（draft），不必先解码出全分辨率的像素。
+质量参数可以是固定值，也可以是 AdaptiveQuality（按字节预算和感知质量下限逐张搜索）
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+import re
+
+from PIL import Image, ImageChops, ImageStat, features
+
+from image_index import describe_image
+
+# 输出格式: 名称 -> (扩展名, Pillow格式名)
+FORMATS = {
+    'jpeg': ('.jpg', 'JPEG'),
+    'webp': ('.webp', 'WEBP'),
+    'avif': ('.avif', 'AVIF'),
+}
+
+# 已加载的质量选择: 缓存文件路径 -> {缓存键: 质量}，每个进程只读取一次
+_LOADED_CHOICES = {}
+
+# 大幅缩小时先按整数倍盒式缩小（Image.reduce），剩余部分再用LANCZOS，见 Pillow 的 reducing_gap
+REDUCING_GAP = 3.0
+
+
+def format_supported(fmt):
+    """当前Pillow是否能编码该格式"""
+    if fmt == 'jpeg':
+        return True
+    if fmt == 'avif' and not features.check('avif'):
+        # 旧版Pillow需要 pillow-avif-plugin 插件
+        try:
+            import pillow_avif  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    return bool(features.check(fmt))
+
+
+def flatten_to_rgb(image, background=(255, 255, 255)):
+    """将带透明通道的图片合成到纯色背景上，并转换为RGB"""
+    if image.mode == 'RGBA':
+        flattened = Image.new('RGB', image.size, background)
+        flattened.paste(image, mask=image.split()[-1])
+        return flattened
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def resize_image(image, target_size, reducing_gap=None):
+    """使用LANCZOS缩放到目标尺寸"""
+    return image.resize(target_size, Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+
+
+def max_output_size(target_size, densities):
+    """全部密度中最大的输出尺寸"""
+    density = max(densities)
+    return (round(target_size[0] * density), round(target_size[1] * density))
+
+
+def draft_size(size, requested):
+    """JPEG按 1/2、1/4、1/8 缩放解码后的尺寸：不小于 requested 的最小一档（与 Image.draft 一致）"""
+    scale = min(size[0] // requested[0], size[1] // requested[1])
+    scale = next((s for s in (8, 4, 2) if scale >= s), 1)
+    return (-(-size[0] // scale), -(-size[1] // scale))
+
+
+def open_source(source, max_size=None):
+    """打开原始图片（字节或文件对象）；JPEG只解码到不小于 max_size 的尺寸"""
+    image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    if max_size and image.format == 'JPEG':
+        image.draft('RGB', max_size)
+    return image
+
+
+def estimate_decode_bytes(size, fmt, max_size, compressed_bytes=0):
+    """估计处理一张原图的峰值内存：压缩字节（主进程和编码进程各一份）加解码后的像素
+    （Pillow每像素4字节，合成背景和缩放时最多同时存在两份）"""
+    if fmt == 'JPEG' and max_size:
+        size = draft_size(size, max_size)
+    return 2 * compressed_bytes + 2 * 4 * size[0] * size[1]
+
+
+def encode_image(image, fmt, quality):
+    """按格式编码图片，返回字节"""
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        image.save(buffer, 'JPEG', quality=quality, optimize=True)
+    elif fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=quality, method=6)
+    else:
+        image.save(buffer, FORMATS[fmt][1], quality=quality)
+    return buffer.getvalue()
+
+
+def write_bytes(data, output_path):
+    """写出编码后的字节，必要时创建目录"""
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    return output_path
+
+
+def save_image(image, output_path, fmt, quality):
+    """按格式保存图片，quality 为固定值或 AdaptiveQuality"""
+    if isinstance(quality, AdaptiveQuality):
+        return write_bytes(quality.encode(image, fmt), output_path)
+    return write_bytes(encode_image(image, fmt, quality), output_path)
+
+
+def parse_byte_size(text):
+    """解析字节数，支持 12000、12k、1.5m"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kKmM]?)[bB]?\s*', text)
+    if not match:
+        raise ValueError(f"无法解析字节数: {text}")
+    value = float(match.group(1)) * {'': 1, 'k': 1024, 'm': 1024 * 1024}[match.group(2).lower()]
+    if value <= 0:
+        raise ValueError(f"字节数必须大于0: {text}")
+    return int(value)
+
+
+def luma_psnr(reference, data):
+    """编码结果与参考图片（L模式）亮度通道的PSNR（dB），完全相同时返回inf"""
+    with Image.open(io.BytesIO(data)) as decoded:
+        decoded = decoded.convert('L')
+    rms = ImageStat.Stat(ImageChops.difference(reference, decoded)).rms[0]
+    return math.inf if rms == 0 else 20 * math.log10(255 / rms)
+
+
+class AdaptiveQuality:
+    """逐张图片选择编码质量：不超过字节预算，且亮度PSNR不低于下限
+
+    只设预算时取预算内的最高质量；只设下限时取满足下限的最低质量（字节最少）；
+    两者都设时取两者中较低的质量，即预算是硬上限。
+    预算按 reference_size 的像素数给出，高密度变体按像素数等比放大。
+    搜索完全在内存中编码；选定的质量按像素内容缓存到 cache_path，重建时不再搜索
+    """
+
+    def __init__(self, max_bytes=None, min_psnr=None, min_quality=40, max_quality=95,
+                 reference_size=(200, 200), cache_path=None):
+        self.max_bytes = max_bytes
+        self.min_psnr = min_psnr
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.reference_size = reference_size
+        self.cache_path = cache_path
+        self.choices = None  # 缓存键 -> 质量，首次使用时加载
+        self.learned = {}    # 本进程新确定的质量
+        self.searched = 0
+        self.reused = 0
+        self.over_budget = 0
+
+    def __getstate__(self):
+        # 提交给进程池时只携带参数，工作进程首次使用时从文件加载一次，之后的任务共用（见 _load）
+        state = self.__dict__.copy()
+        state['choices'] = None
+        state['learned'] = {}
+        return state
+
+    def spec(self):
+        """影响输出的参数，用于构建指纹和缓存键"""
+        return {
+            'max_bytes': self.max_bytes,
+            'min_psnr': self.min_psnr,
+            'min_quality': self.min_quality,
+            'max_quality': self.max_quality,
+            'reference_size': list(self.reference_size),
+        }
+
+    def _load(self):
+        if self.choices is not None:
+            return
+        choices = _LOADED_CHOICES.get(self.cache_path)
+        if choices is None:
+            choices = {}
+            if self.cache_path:
+                try:
+                    with open(self.cache_path, 'r', encoding='utf-8') as f:
+                        choices = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            _LOADED_CHOICES[self.cache_path] = choices
+        # 同一进程内共用同一个字典，工作进程中先前任务学到的质量也能被后续任务复用
+        self.choices = choices
+
+    def _key(self, image, fmt):
+        digest = hashlib.sha1(image.tobytes())
+        digest.update(f"{image.mode}{image.size}{fmt}".encode('utf-8'))
+        digest.update(json.dumps(self.spec(), sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def budget_for(self, image):
+        if self.max_bytes is None:
+            return None
+        reference_pixels = self.reference_size[0] * self.reference_size[1]
+        return int(self.max_bytes * image.size[0] * image.size[1] / reference_pixels)
+
+    def _search(self, image, fmt):
+        """二分搜索质量，返回 (质量, 编码字节)"""
+        encoded = {}
+        reference = image.convert('L') if self.min_psnr is not None else None
+
+        def encode(quality):
+            if quality not in encoded:
+                encoded[quality] = encode_image(image, fmt, quality)
+            return encoded[quality]
+
+        def highest(ok):
+            """ok(质量) 随质量增大由真变假时，返回满足 ok 的最高质量；都不满足时返回None"""
+            lo, hi = self.min_quality, self.max_quality
+            if ok(hi):
+                return hi
+            if not ok(lo):
+                return None
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if ok(mid):
+                    lo = mid
+                else:
+                    hi = mid
+            return lo
+
+        def lowest(ok):
+            """ok(质量) 随质量增大由假变真时，返回满足 ok 的最低质量；都不满足时返回None"""
+            lo, hi = self.min_quality, self.max_quality
+            if ok(lo):
+                return lo
+            if not ok(hi):
+                return None
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if ok(mid):
+                    hi = mid
+                else:
+                    lo = mid
+            return hi
+
+        quality = self.max_quality
+        budget = self.budget_for(image)
+        if budget is not None:
+            within = highest(lambda q: len(encode(q)) <= budget)
+            if within is None:
+                self.over_budget += 1
+                within = self.min_quality
+            quality = within
+        if reference is not None:
+            floor = lowest(lambda q: luma_psnr(reference, encode(q)) >= self.min_psnr)
+            quality = min(quality, floor if floor is not None else self.max_quality)
+        return quality, encode(quality)
+
+    def encode(self, image, fmt):
+        """按缓存或搜索得到的质量编码，返回字节"""
+        self._load()
+        key = self._key(image, fmt)
+        quality = self.choices.get(key)
+        if quality is not None:
+            self.reused += 1
+            return encode_image(image, fmt, quality)
+        quality, data = self._search(image, fmt)
+        self.choices[key] = quality
+        self.learned[key] = quality
+        self.searched += 1
+        return data
+
+    def drain_learned(self):
+        """取出本进程新确定的质量（工作进程把它返回给主进程合并）"""
+        learned, self.learned = self.learned, {}
+        return learned
+
+    def merge(self, learned):
+        self._load()
+        self.choices.update(learned)
+
+    def save(self):
+        if not self.cache_path or self.choices is None:
+            return
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.choices, sort_keys=True))
+        os.replace(tmp_path, self.cache_path)
+
+
+def build_pyramid(image, target_size, densities):
+    """按密度从大到小逐级缩放，返回 {密度: 图片}
+
+    最大密度从原图缩放，其余每一级从上一级缩放，避免每个密度都从原图重新缩放
+    """
+    pyramid = {}
+    current = image
+    for density in sorted(set(densities), reverse=True):
+        size = (round(target_size[0] * density), round(target_size[1] * density))
+        # 只有从原图缩放的第一级可能缩小很多倍
+        current = resize_image(current, size, REDUCING_GAP if current is image else None)
+        pyramid[density] = current
+    return pyramid
+
+
+def describe_output(images, variants, describe):
+    """为编码进程刚写出的一个输出生成索引条目，images 为 {密度: 编码前的图片}
+
+    describe 为 (输出路径, 占位图参数)，见 image_index.describe_image
+    """
+    path, placeholder = describe
+    density = next(density for density, _, variant_path in variants if variant_path == path)
+    return describe_image(path, images[density], placeholder)
+
+
+def save_variants(image, variants, target_size, quality, describe=None):
+    """将一张已解码的图片输出为多个密度和格式
+
+    variants 为 [(密度, 格式, 输出路径), ...]，返回 (输出路径列表, 索引条目)；
+    describe 为 None 时不生成索引条目
+    """
+    image = flatten_to_rgb(image)
+    pyramid = build_pyramid(image, target_size, [density for density, _, _ in variants])
+    paths = [save_image(pyramid[density], path, fmt, quality) for density, fmt, path in variants]
+    return paths, describe_output(pyramid, variants, describe) if describe else None
+
+
+def encode_image_bytes(data, variants, target_size, quality, describe=None):
+    """解码原始图片字节（只解码一次，JPEG只解码到最大输出尺寸），输出全部密度和格式，
+    返回 (输出路径列表, 索引条目)
+
+    作为进程池任务使用，只接收可序列化的参数
+    """
+    max_size = max_output_size(target_size, [density for density, _, _ in variants])
+    with open_source(data, max_size) as image:
+        return save_variants(image, variants, target_size, quality, describe)
+
+
+def encode_task(data, variants, target_size, quality, describe=None):
+    """进程池任务：同 encode_image_bytes，额外返回工作进程新确定的自适应质量
+
+    返回 (输出路径列表, 索引条目, {缓存键: 质量})
+    """
+    paths, entry = encode_image_bytes(data, variants, target_size, quality, describe)
+    learned = quality.drain_learned() if isinstance(quality, AdaptiveQuality) else {}
+    return paths, entry, learned
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单词图片索引
+每张图片完成后增量更新条目（路径、宽高、字节数、内容哈希，可选的占位图），
+通过“写临时文件再重命名”原子地落盘，中途崩溃也不会留下不一致的索引。
+可选按类别分片，客户端只需加载当前类别的索引
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from PIL import Image
+
+
+def _atomic_write_json(path, data, indent=None):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, indent=indent, ensure_ascii=False, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def _shard_name(category):
+    return re.sub(r'[^0-9A-Za-z_-]+', '_', category).strip('_') or 'uncategorized'
+
+
+def describe_image(path, image=None, placeholder=None):
+    """读取图片元数据：宽高、字节数、sha256
+
+    编码进程写出图片后直接调用，image 为内存中编码前的该图片时不再解码文件来读取宽高；
+    placeholder 为 (BlurHash分量数, 缩略图边长) 时附带占位图。占位图总是从写出的文件内容计算，
+    与补写索引或重建索引时从文件计算的结果相同，按 sha256 缓存的占位图才与图片内容一一对应
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if image is None:
+        with Image.open(path) as opened:
+            width, height = opened.size
+    else:
+        width, height = image.size
+    entry = {
+        'width': width,
+        'height': height,
+        'bytes': len(data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+    }
+    if placeholder is not None:
+        from placeholders import compute_placeholder
+        components, thumb_size = placeholder
+        entry['placeholder'] = compute_placeholder(data, components, thumb_size)
+    return entry
+
+
+def read_index(path):
+    """读取索引文件，返回 {单词: 条目}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    entries = {}
+    for word, entry in data.items():
+        # 兼容旧格式: {单词: 路径}
+        if isinstance(entry, str):
+            entry = {'path': entry}
+        entries[word] = entry
+    return entries
+
+
+class ImageIndex:
+    """index.json 及可选的按类别分片索引"""
+
+    def __init__(self, output_dir, asset_prefix="assets/images/words", sharded=False,
+                 flush_interval=1.0, filename="index.json", placeholders=None):
+        self.output_dir = output_dir
+        self.asset_prefix = asset_prefix
+        self.sharded = sharded
+        self.flush_interval = flush_interval  # 两次落盘的最小间隔（秒），避免每张图片都重写整个索引
+        self.index_path = os.path.join(output_dir, filename)
+        self.shard_dir = os.path.join(output_dir, "index")
+        self.placeholders = placeholders  # PlaceholderCache：为每个条目附加 BlurHash、主色和内联缩略图
+        self._entries = {}
+        self._dirty = False
+        self._dirty_categories = set()
+        self._last_flush = time.monotonic()
+        self._next_flush_delay = flush_interval
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            self._entries = read_index(self.index_path)
+        except (OSError, ValueError):
+            return
+
+    def __contains__(self, word):
+        with self._lock:
+            return word in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def words(self):
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, word):
+        with self._lock:
+            return self._entries.get(word)
+
+    def update(self, word, output_path, category=None, described=None):
+        """记录单词图片的最新元数据，到达落盘间隔时自动写入
+
+        described 为编码进程随输出返回的元数据（见 describe_image）时直接保存，不再读取图片
+        """
+        entry = {'path': f"{self.asset_prefix}/{os.path.basename(output_path)}"}
+        entry.update(described if described is not None else describe_image(output_path))
+        if category:
+            entry['category'] = category
+        if self.placeholders is not None:
+            # 图片内容未变时沿用原条目的占位图
+            previous = self.get(word)
+            if previous is not None and previous.get('sha256') == entry['sha256'] and previous.get('placeholder'):
+                entry['placeholder'] = previous['placeholder']
+            elif 'placeholder' in entry:
+                self.placeholders.put(entry['sha256'], entry['placeholder'])
+            else:
+                entry['placeholder'] = self.placeholders.get(entry['sha256'], output_path)
+        with self._lock:
+            previous = self._entries.get(word)
+            if previous is not None and previous.get('category'):
+                self._dirty_categories.add(previous['category'])
+            self._entries[word] = entry
+            self._dirty = True
+            if category:
+                self._dirty_categories.add(category)
+            if time.monotonic() - self._last_flush >= self._next_flush_delay:
+                self._flush_locked()
+        return entry
+
+    def merge(self, entries):
+        """并入其他索引的条目（如各台机器生成的分片索引），已有的单词保留原条目，返回冲突的单词"""
+        conflicts = []
+        with self._lock:
+            for word, entry in entries.items():
+                existing = self._entries.get(word)
+                if existing is not None:
+                    if existing != entry:
+                        conflicts.append(word)
+                    continue
+                self._entries[word] = entry
+                self._dirty = True
+                if entry.get('category'):
+                    self._dirty_categories.add(entry['category'])
+        return conflicts
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.get('category'):
+                    self._dirty_categories.add(entry['category'])
+            self._entries.clear()
+            self._dirty = True
+
+    def remove(self, word):
+        with self._lock:
+            entry = self._entries.pop(word, None)
+            if entry is not None:
+                self._dirty = True
+                if entry.get('category'):
+                    self._dirty_categories.add(entry['category'])
+
+    def _flush_locked(self):
+        start = time.monotonic()
+        # 索引文件不存在时即使为空也写出，空的分片也要留下索引，合并时才不会误报缺片
+        if self._dirty or not os.path.exists(self.index_path):
+            _atomic_write_json(self.index_path, self._entries, indent=2)
+        if self.sharded and (self._dirty_categories or not os.path.exists(self.shard_dir)):
+            self._write_shards_locked()
+        self._dirty = False
+        self._dirty_categories.clear()
+        self._last_flush = time.monotonic()
+        # 索引很大时拉长落盘间隔，使重写索引的开销不超过总时间的约10%
+        self._next_flush_delay = max(self.flush_interval, (self._last_flush - start) * 10)
+
+    def _write_shards_locked(self):
+        """只重写内容发生变化的类别分片，并更新分片目录"""
+        os.makedirs(self.shard_dir, exist_ok=True)
+        by_category = {}
+        for word, entry in self._entries.items():
+            by_category.setdefault(entry.get('category') or 'uncategorized', {})[word] = entry
+
+        catalog = {}
+        for category, entries in by_category.items():
+            shard_path = f"{self.asset_prefix}/index/{_shard_name(category)}.json"
+            catalog[category] = {'path': shard_path, 'count': len(entries)}
+            target = os.path.join(self.shard_dir, f"{_shard_name(category)}.json")
+            if category in self._dirty_categories or not os.path.exists(target):
+                _atomic_write_json(target, entries)
+        for category in self._dirty_categories - set(by_category):
+            try:
+                os.remove(os.path.join(self.shard_dir, f"{_shard_name(category)}.json"))
+            except OSError:
+                pass
+        _atomic_write_json(os.path.join(self.shard_dir, "categories.json"), catalog, indent=2)
+
+    def flush(self):
+        """立即落盘"""
+        with self._lock:
+            self._flush_locked()
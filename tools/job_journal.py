@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务日志
+用SQLite记录每个单词的处理状态，长时间运行中途被终止后可以从中断处继续：
+
+    pending → fetching → fetched → encoded
+                  ↘ fallback（AI失败后使用了备用图标） / failed
+
+状态更新先缓存在内存中，按条数或时间间隔批量写入一个事务，崩溃时最多丢失最后一个批次，
+丢失的单词在恢复时会重新处理（已是最新的输出由构建清单跳过）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+STATES = ('pending', 'fetching', 'fetched', 'encoded', 'fallback', 'failed')
+DONE_STATES = ('encoded', 'fallback')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    config TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    word TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    run_id INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+# 成功编码时清除上次的错误；其余状态在没有新错误时保留旧错误（如回退为备用图标的原因）
+_UPSERT = """
+INSERT INTO jobs (word, state, attempts, error, run_id, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (word) DO UPDATE SET
+    state = excluded.state,
+    attempts = jobs.attempts + excluded.attempts,
+    error = CASE WHEN excluded.state = 'encoded' THEN NULL
+                 ELSE COALESCE(excluded.error, jobs.error) END,
+    run_id = excluded.run_id,
+    updated_at = excluded.updated_at
+"""
+
+
+class JobJournal:
+    """单词处理状态的SQLite日志，可在多个线程间共享"""
+
+    def __init__(self, path, batch_size=200, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.run_id = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._pending = {}  # 单词 -> [状态, 新增尝试次数, 错误, 时间]
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def last_run(self):
+        """最近一次运行: {'id', 'status', 'config'}，没有记录时返回None"""
+        row = self._conn.execute(
+            'SELECT id, status, config FROM runs ORDER BY id DESC LIMIT 1').fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'status': row[1], 'config': json.loads(row[2])}
+
+    def start_run(self, words, config, resume_from=None):
+        """开始一次运行，返回已完成（无需再处理）的单词集合
+
+        resume_from 为None时把本次的全部单词重置为 pending；为上次未正常结束的运行id时，
+        只沿用该运行已完成的单词（它们随之归入本次运行，可以再次继续），其余单词重置为 pending。
+        更早的、已正常结束的运行中完成的单词不算在内
+        """
+        now = time.time()
+        with self._lock:
+            self._flush_locked()
+            cursor = self._conn.execute(
+                'INSERT INTO runs (started_at, status, config) VALUES (?, ?, ?)',
+                (now, 'running', json.dumps(config, ensure_ascii=False, sort_keys=True)))
+            self.run_id = cursor.lastrowid
+            words = list(dict.fromkeys(words))
+            done = set()
+            if resume_from is not None:
+                done = {row[0] for row in self._conn.execute(
+                    'SELECT word FROM jobs WHERE run_id = ? AND state IN (%s)' % ','.join('?' * len(DONE_STATES)),
+                    (resume_from, *DONE_STATES))} & set(words)
+            self._conn.execute('BEGIN')
+            self._conn.executemany(_UPSERT, [(word, 'pending', 0, None, self.run_id, now)
+                                             for word in words if word not in done])
+            self._conn.executemany('UPDATE jobs SET run_id = ? WHERE word = ?',
+                                   [(self.run_id, word) for word in done])
+            self._conn.execute('COMMIT')
+            return done
+
+    def words_in_state(self, state):
+        with self._lock:
+            self._flush_locked()
+            return [row[0] for row in self._conn.execute(
+                'SELECT word FROM jobs WHERE state = ? ORDER BY word', (state,))]
+
+    def update(self, word, state, error=None):
+        """记录状态变化（批量写入）；进入 fetching 计为一次尝试"""
+        if state not in STATES:
+            raise ValueError(f"未知的任务状态: {state}")
+        with self._lock:
+            entry = self._pending.get(word)
+            if entry is None:
+                entry = self._pending[word] = [state, 0, None, 0.0]
+            entry[0] = state
+            if state == 'fetching':
+                entry[1] += 1
+            if state == 'encoded':
+                entry[2] = None
+            elif error is not None:
+                entry[2] = str(error)[:500]
+            entry[3] = time.time()
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending:
+            rows = [(word, state, attempts, error, self.run_id, updated_at)
+                    for word, (state, attempts, error, updated_at) in self._pending.items()]
+            self._conn.execute('BEGIN')
+            self._conn.executemany(_UPSERT, rows)
+            self._conn.execute('COMMIT')
+            self._pending.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def counts(self, words=None):
+        """{状态: 单词数}，words 不为None时只统计其中的单词"""
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute('SELECT word, state FROM jobs').fetchall()
+        selected = None if words is None else set(words)
+        counts = {}
+        for word, state in rows:
+            if selected is None or word in selected:
+                counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def errors(self, state, limit=10):
+        """处于 state 的单词及最近的错误原因"""
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(
+                'SELECT word, error, attempts FROM jobs WHERE state = ? ORDER BY updated_at DESC LIMIT ?',
+                (state, limit)).fetchall()
+
+    def close(self, status='finished'):
+        """写入剩余的状态更新并结束本次运行（status: finished / interrupted）"""
+        with self._lock:
+            self._flush_locked()
+            if self.run_id is not None:
+                self._conn.execute('UPDATE runs SET finished_at = ?, status = ? WHERE id = ?',
+                                   (time.time(), status, self.run_id))
+            self._conn.close()
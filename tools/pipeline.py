@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载/编码分阶段流水线的统计
+记录每个阶段的处理数量、忙碌时间、吞吐量以及阶段间队列深度，用于调整各阶段的并发数
+"""
+
+import time
+
+
+class StageStats:
+    """单个阶段的统计信息"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.count = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    def record(self, seconds, ok=True, count=1):
+        """记录一次处理耗时；批量处理时 count 为本次处理的数量"""
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now - seconds
+        self.finished_at = now
+        self.busy_seconds += seconds
+        if ok:
+            self.count += count
+        else:
+            self.errors += count
+
+    @property
+    def wall_seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def throughput(self):
+        """每秒完成数量"""
+        wall = self.wall_seconds
+        return self.count / wall if wall > 0 else 0.0
+
+    @property
+    def utilization(self):
+        """工作者平均忙碌比例"""
+        wall = self.wall_seconds
+        if wall <= 0 or self.workers <= 0:
+            return 0.0
+        return min(1.0, self.busy_seconds / (wall * self.workers))
+
+    def to_dict(self):
+        return {
+            'workers': self.workers,
+            'count': self.count,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'throughput_per_sec': round(self.throughput, 2),
+            'utilization': round(self.utilization, 3),
+        }
+
+
+class QueueStats:
+    """阶段间队列深度采样"""
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+
+    def sample(self, depth):
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    @property
+    def average_depth(self):
+        return self.total_depth / self.samples if self.samples else 0.0
+
+    def to_dict(self):
+        return {
+            'maxsize': self.maxsize,
+            'avg_depth': round(self.average_depth, 2),
+            'max_depth': self.max_depth,
+        }
+
+
+class PipelineStats:
+    """整条流水线的统计汇总"""
+
+    def __init__(self):
+        self.stages = {}
+        self.queues = {}
+        self.memory_budget = None  # MemoryBudget，未限制内存时为None
+
+    def add_stage(self, name, workers):
+        self.stages[name] = StageStats(name, workers)
+        return self.stages[name]
+
+    def add_queue(self, name, maxsize):
+        self.queues[name] = QueueStats(name, maxsize)
+        return self.queues[name]
+
+    def to_dict(self):
+        result = {
+            'stages': {name: stage.to_dict() for name, stage in self.stages.items()},
+            'queues': {name: queue.to_dict() for name, queue in self.queues.items()},
+        }
+        if self.memory_budget is not None:
+            result['memory_budget'] = self.memory_budget.to_dict()
+        return result
+
+    def print_summary(self):
+        """打印各阶段吞吐量和队列深度"""
+        print("流水线统计:")
+        for stage in self.stages.values():
+            print(f"  - {stage.name}: {stage.workers} 个工作者，完成 {stage.count}，失败 {stage.errors}，"
+                  f"吞吐 {stage.throughput:.2f}/秒，利用率 {stage.utilization:.0%}")
+        for queue in self.queues.values():
+            print(f"  - 队列 {queue.name}: 容量 {queue.maxsize}，"
+                  f"平均深度 {queue.average_depth:.1f}，最大深度 {queue.max_depth}")
+        budget = self.memory_budget
+        if budget is not None:
+            print(f"  - 内存预算: 峰值 {budget.peak / 1024 / 1024:.1f}MB / 上限 {budget.max_bytes / 1024 / 1024:.0f}MB，"
+                  f"等待 {budget.waits} 次（{budget.wait_seconds:.1f} 秒）")
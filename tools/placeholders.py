@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+低质量占位图（LQIP）
+为每张单词图片计算 BlurHash 字符串、主色和一张内联的小缩略图（base64 data URI），
+客户端在完整图片解码之前即可在第一帧显示占位。
+计算在缩小到 SAMPLE_SIZE 的图片上用numpy向量化完成；结果按图片内容哈希缓存，增量构建时不会重复计算
+"""
+
+import base64
+import io
+import json
+import math
+import os
+import threading
+
+import numpy as np
+from PIL import Image, features
+
+from image_encoder import open_source
+
+SAMPLE_SIZE = 32  # 计算 BlurHash 和主色时使用的边长
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _encode83(value, length):
+    return ''.join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(values):
+    v = values / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    v = min(1.0, max(0.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(pixels, components=(4, 3)):
+    """按 BlurHash 规范编码，pixels 为 (高, 宽, 3) 的 uint8 数组，components 为 (x方向, y方向) 分量数"""
+    nx, ny = components
+    height, width = pixels.shape[:2]
+    linear = _srgb_to_linear(pixels.astype(np.float64))
+    basis_x = np.cos(np.pi * np.outer(np.arange(nx), np.arange(width)) / width)
+    basis_y = np.cos(np.pi * np.outer(np.arange(ny), np.arange(height)) / height)
+    # factors[j, i] = Σ 基函数 × 线性颜色，一次 einsum 算出全部分量
+    factors = np.einsum('jy,ix,yxc->jic', basis_y, basis_x, linear) / (width * height)
+    factors[1:] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _encode83((nx - 1) + (ny - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, math.floor(float(np.abs(ac).max()) * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        maximum = 1.0
+        result += _encode83(0, 1)
+    r, g, b = (_linear_to_srgb(float(c)) for c in dc)
+    result += _encode83((r << 16) + (g << 8) + b, 4)
+    scaled = np.sign(ac) * np.abs(ac / maximum) ** 0.5
+    quantised = np.clip(np.floor(scaled * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quantised:
+        result += _encode83(int(qr) * 19 * 19 + int(qg) * 19 + int(qb), 2)
+    return result
+
+
+def dominant_color(pixels, bits=4):
+    """主色：按每通道高 bits 位分桶，取像素最多的桶的平均颜色，返回 '#rrggbb'"""
+    flat = pixels.reshape(-1, 3).astype(np.int64)
+    shift = 8 - bits
+    buckets = ((flat[:, 0] >> shift) << (2 * bits)) | ((flat[:, 1] >> shift) << bits) | (flat[:, 2] >> shift)
+    mask = buckets == np.bincount(buckets).argmax()
+    r, g, b = (int(round(c)) for c in flat[mask].mean(axis=0))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def tiny_thumbnail(image, max_side):
+    """内联缩略图的 data URI：支持WebP时为WebP，否则为边长减半的PNG"""
+    webp = features.check('webp')
+    side = max_side if webp else max(1, max_side // 2)
+    scale = side / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    thumb = image.resize(size, Image.Resampling.BOX)
+    buffer = io.BytesIO()
+    if webp:
+        thumb.save(buffer, 'WEBP', quality=50, method=6)
+        mime = 'image/webp'
+    else:
+        thumb.save(buffer, 'PNG', optimize=True)
+        mime = 'image/png'
+    return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def compute_placeholder(source, components=(4, 3), thumb_size=16):
+    """为一张图片（已解码的图片、路径、字节或文件对象）计算 {'blurhash', 'color', 'thumb'}"""
+    if isinstance(source, Image.Image):
+        image = source.convert('RGB')
+    else:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                source = f.read()
+        # JPEG直接按 1/8 等缩放解码到接近采样尺寸
+        with open_source(source, (SAMPLE_SIZE, SAMPLE_SIZE)) as image:
+            image = image.convert('RGB')
+    image.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(image)
+    return {
+        'blurhash': blurhash(pixels, components),
+        'color': dominant_color(pixels),
+        'thumb': tiny_thumbnail(image, thumb_size),
+    }
+
+
+class PlaceholderCache:
+    """按图片内容哈希缓存的占位图计算，可在多个线程间共享"""
+
+    def __init__(self, cache_path=None, components=(4, 3), thumb_size=16):
+        self.cache_path = cache_path
+        self.components = tuple(components)
+        self.thumb_size = thumb_size
+        self.computed = 0
+        self.reused = 0
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if cache_path:
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def _key(self, sha256):
+        return f"{sha256}:{self.components[0]}x{self.components[1]}:{self.thumb_size}"
+
+    def get(self, sha256, source):
+        """返回内容哈希为 sha256 的图片的占位信息，未缓存时从 source 计算"""
+        key = self._key(sha256)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self.reused += 1
+                return cached
+        placeholder = compute_placeholder(source, self.components, self.thumb_size)
+        with self._lock:
+            self._entries[key] = placeholder
+            self._dirty = True
+            self.computed += 1
+        return placeholder
+
+    def put(self, sha256, placeholder):
+        """存入在别处（编码进程）算好的占位图"""
+        with self._lock:
+            self._entries[self._key(sha256)] = placeholder
+            self._dirty = True
+            self.computed += 1
+
+    def save(self):
+        with self._lock:
+            if not self.cache_path or not self._dirty:
+                return
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(self._entries, sort_keys=True))
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
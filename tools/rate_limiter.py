@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步令牌桶限流器与内存预算
+用于并发生成模式下，让所有请求共享同一个速率上限，并限制在途图片占用的内存总量
+"""
+
+import asyncio
+import time
+
+
+def parse_rate(value):
+    """解析速率参数，支持 "5"、"5/s"、"30/m" 等格式，返回每秒请求数"""
+    text = str(value).strip().lower()
+    per = 1.0
+    if '/' in text:
+        text, unit = text.split('/', 1)
+        units = {'s': 1.0, 'sec': 1.0, 'm': 60.0, 'min': 60.0, 'h': 3600.0}
+        if unit not in units:
+            raise ValueError(f"未知的速率单位: {unit}")
+        per = units[unit]
+    rate = float(text) / per
+    if rate <= 0:
+        raise ValueError("速率必须大于0")
+    return rate
+
+
+class TokenBucket:
+    """令牌桶：以固定速率补充令牌，允许不超过 capacity 的突发"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self, tokens=1.0):
+        """获取令牌，不足时等待补充"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class MemoryBudget:
+    """全局内存预算：每张在途图片按估计的内存占用预留额度，额度不足时暂停接收新图片
+
+    单张图片超过整个预算时，只要当前没有其他预留就放行，避免死锁
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.used = 0
+        self.peak = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, amount):
+        """预留 amount 字节，超出预算时等待其他图片释放"""
+        async with self._condition:
+            if self.used and self.used + amount > self.max_bytes:
+                self.waits += 1
+                start = time.monotonic()
+                await self._condition.wait_for(
+                    lambda: not self.used or self.used + amount <= self.max_bytes)
+                self.wait_seconds += time.monotonic() - start
+            self._reserve(amount)
+
+    def _reserve(self, amount):
+        self.used += amount
+        self.peak = max(self.peak, self.used)
+
+    async def adjust(self, reserved, actual):
+        """下载完成后把预留额度修正为实际估计值，返回新的预留额度"""
+        async with self._condition:
+            self._reserve(actual - reserved)
+            if actual < reserved:
+                self._condition.notify_all()
+        return actual
+
+    async def release(self, amount):
+        async with self._condition:
+            self.used -= amount
+            self._condition.notify_all()
+
+    def to_dict(self):
+        return {
+            'max_bytes': self.max_bytes,
+            'peak_bytes': self.peak,
+            'waits': self.waits,
+            'wait_seconds': round(self.wait_seconds, 3),
+        }
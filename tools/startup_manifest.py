@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动清单编译
+把单词列表（words.json）和图片索引（images/words/index.json）合并为一个按类别分组、
+路径已解析好的紧凑清单，应用启动时只需解析一个文件、不再按单词查找图片。
+编译时检查每个单词的图片和音频是否存在，引用错误在构建时就会发现。
+索引条目带有占位图时一并写入主色和 BlurHash，首帧即可绘制占位
+
+清单格式（不含空白）:
+    {"version": 2, "count": 40,
+     "imageBase": "assets/images/words/", "audioBase": "assets/audios/",
+     "fields": ["id", "text", "image", "audio", "width", "height", "color", "blurhash"],
+     "categories": [{"name": "vehicles", "words": [["1", "car", "car.jpg", "car.mp3", 200, 200, "#fefefe", "L.QSuQ..."], ...]}, ...]}
+
+image / audio 为去掉公共前缀 imageBase / audioBase 后的路径，缺失的音频、没有占位图时的 color / blurhash 为 null
+
+用法:
+    python startup_manifest.py --words ../assets/data/words.json --project-root ..
+"""
+
+import argparse
+import json
+import os
+import posixpath
+import sys
+
+from image_index import read_index
+from word_sources import WordSourceError, iter_word_entries
+
+MANIFEST_VERSION = 2
+FIELDS = ('id', 'text', 'image', 'audio', 'width', 'height', 'color', 'blurhash')
+REFERENCE_KINDS = ('image', 'audio')
+
+
+def _asset_exists(project_root, path):
+    return bool(path) and os.path.isfile(os.path.join(project_root, *path.split('/')))
+
+
+def _common_base(paths):
+    """全部路径共同的目录前缀（以 / 结尾），没有时返回空字符串"""
+    paths = [path for path in paths if path]
+    if not paths:
+        return ''
+    base = posixpath.dirname(paths[0]) + '/'
+    while base != '/' and not all(path.startswith(base) for path in paths):
+        base = posixpath.dirname(base.rstrip('/')) + '/'
+    return '' if base == '/' else base
+
+
+def compile_manifest(entries, index, project_root, allow_missing=()):
+    """合并单词条目和图片索引
+
+    entries 为单词条目（需要 id、text、category，可带 imagePath、audioPath），
+    index 为 {单词: 索引条目}。图片优先使用索引中生成的图片，其次是条目的 imagePath；
+    音频使用条目的 audioPath。路径相对于 project_root 检查是否存在。
+    返回 (清单, 问题列表 [(类型, 单词, 说明), ...])；allow_missing 中的类型缺失时不计为问题
+    """
+    categories = {}
+    problems = []
+    seen_ids = set()
+    for entry in entries:
+        word = entry['text']
+        if entry['id'] in seen_ids:
+            problems.append(('duplicate_id', word, f"id {entry['id']} 重复"))
+            continue
+        seen_ids.add(entry['id'])
+
+        indexed = index.get(word) or {}
+        candidates = [indexed.get('path'), entry.get('imagePath')]
+        image = next((path for path in candidates if _asset_exists(project_root, path)), None)
+        if image is None and 'image' not in allow_missing:
+            tried = '、'.join(path for path in candidates if path) or '无'
+            problems.append(('image', word, f"找不到图片（{tried}）"))
+        audio = entry.get('audioPath')
+        if not _asset_exists(project_root, audio):
+            if 'audio' not in allow_missing:
+                problems.append(('audio', word, f"找不到音频（{audio or '无'}）"))
+            audio = None
+
+        # 尺寸和占位图只对索引中生成的图片有效
+        generated = image is not None and image == indexed.get('path')
+        placeholder = (indexed.get('placeholder') if generated else None) or {}
+        categories.setdefault(entry['category'], []).append(
+            [entry['id'], word, image, audio,
+             indexed.get('width') if generated else None, indexed.get('height') if generated else None,
+             placeholder.get('color'), placeholder.get('blurhash')])
+
+    rows = [row for words in categories.values() for row in words]
+    image_base = _common_base([row[2] for row in rows])
+    audio_base = _common_base([row[3] for row in rows])
+    for row in rows:
+        if row[2]:
+            row[2] = row[2][len(image_base):]
+        if row[3]:
+            row[3] = row[3][len(audio_base):]
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'count': len(rows),
+        'imageBase': image_base,
+        'audioBase': audio_base,
+        'fields': list(FIELDS),
+        'categories': [{'name': name, 'words': words} for name, words in categories.items()],
+    }
+    return manifest, problems
+
+
+def write_manifest(manifest, path):
+    """紧凑输出（无缩进和空白），原子写入"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(manifest, ensure_ascii=False, separators=(',', ':')))
+    os.replace(tmp_path, path)
+
+
+def print_problems(problems, limit=20):
+    counts = {}
+    for kind, _, _ in problems:
+        counts[kind] = counts.get(kind, 0) + 1
+    print("✗ 启动清单引用检查失败: " + "，".join(f"{kind} {count}" for kind, count in counts.items()))
+    for kind, word, detail in problems[:limit]:
+        print(f"  - [{kind}] {word}: {detail}")
+    if len(problems) > limit:
+        print(f"  ... 另有 {len(problems) - limit} 项")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='编译应用启动清单（单词列表 + 图片索引）')
+    parser.add_argument('--words', default='../assets/data/words.json', help='单词列表文件')
+    parser.add_argument('--index', default='../assets/images/words/index.json', help='图片索引文件')
+    parser.add_argument('--project-root', default='..', help='Flutter工程根目录，资源路径相对于此目录')
+    parser.add_argument('--output', default='../assets/data/words.compiled.json', help='清单输出路径')
+    parser.add_argument('--allow-missing', action='append', default=[], choices=REFERENCE_KINDS,
+                        help='允许缺失的资源类型（可重复指定），缺失时不报错')
+    args = parser.parse_args()
+
+    try:
+        entries = list(iter_word_entries(args.words))
+    except WordSourceError as e:
+        parser.exit(1, f"单词列表格式错误: {e}\n")
+    try:
+        index = read_index(args.index)
+    except (OSError, ValueError) as e:
+        print(f"读取图片索引失败: {e}")
+        index = {}
+
+    manifest, problems = compile_manifest(entries, index, args.project_root, args.allow_missing)
+    if problems:
+        print_problems(problems)
+        sys.exit(1)
+    write_manifest(manifest, args.output)
+    print(f"✓ 启动清单已保存: {args.output}（{manifest['count']} 个单词，{len(manifest['categories'])} 个类别）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地图片生成桩服务
+模拟 Pollinations 的 /prompt/<提示词> 接口和自建模型服务的批量接口 POST /batch，
+返回按提示词（和种子）确定生成的图片，用于在无网络的情况下测试并发生成、批量请求、重试和熔断等功能。
+latency 是每个请求（不论批量大小）的固定延迟
+
+批量接口:
+    请求 {"model": "flux", "width": 400, "height": 400, "enhance": true,
+          "prompts": [{"prompt": "...", "seed": null}, ...]}
+    响应 {"images": [{"contentType": "image/jpeg", "data": "<base64>"} | {"error": "..."}, ...]}，与 prompts 一一对应
+
+用法:
+    python stub_server.py --port 8765 --latency 0.5
+    python stub_server.py --port 8765 --fail-rate 0.3 --retry-after 1
+    python generate_word_images.py --api-base http://127.0.0.1:8765 --concurrency 8
+    python generate_word_images.py --backend batch-http --api-base http://127.0.0.1:8765 --batch-size 16
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from PIL import Image, ImageDraw
+
+
+def render_stub_image(prompt, size=(400, 400), seed=None):
+    """根据提示词（和种子）的哈希生成确定的图片（JPEG字节）"""
+    if seed is not None:
+        prompt = f"{prompt}#{seed}"
+    digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+    background = (digest[0], digest[1], digest[2])
+    image = Image.new('RGB', size, background)
+    draw = ImageDraw.Draw(image)
+    for i in range(4):
+        r, g, b, x, y, s = digest[4 + i * 6:10 + i * 6]
+        cx, cy = x * size[0] // 256, y * size[1] // 256
+        radius = 20 + s * min(size) // 1024
+        draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], fill=(r, g, b))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """处理 GET /prompt/<提示词>?width=..&height=.. 和 POST /batch 请求"""
+
+    def _simulate(self):
+        """模拟延迟和故障，返回True表示已发送失败响应"""
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            failing = (server.request_count <= server.fail_first
+                       or server.random.random() < server.fail_rate)
+
+        if server.latency > 0:
+            time.sleep(server.latency)
+
+        if failing:
+            # 模拟服务端的偶发故障
+            self.send_response(503)
+            if server.retry_after is not None:
+                self.send_header('Retry-After', str(server.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return True
+        return False
+
+    def _send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if not parsed.path.startswith('/prompt/'):
+            self.send_error(404)
+            return
+        if self._simulate():
+            return
+
+        prompt = unquote(parsed.path[len('/prompt/'):])
+        query = parse_qs(parsed.query)
+        width = int(query.get('width', ['400'])[0])
+        height = int(query.get('height', ['400'])[0])
+        seed = query['seed'][0] if 'seed' in query else None
+        self._send_body(render_stub_image(prompt, (width, height), seed), 'image/jpeg')
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/batch':
+            self.send_error(404)
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            size = (int(payload.get('width', 400)), int(payload.get('height', 400)))
+            prompts = payload['prompts']
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400, '请求格式错误')
+            return
+        if self._simulate():
+            return
+
+        images = []
+        for item in prompts:
+            prompt = item.get('prompt') if isinstance(item, dict) else None
+            if not prompt:
+                images.append({'error': '缺少 prompt'})
+                continue
+            data = render_stub_image(prompt, size, item.get('seed'))
+            images.append({'contentType': 'image/jpeg', 'data': base64.b64encode(data).decode('ascii')})
+        self._send_body(json.dumps({'images': images}).encode('utf-8'), 'application/json')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_stub_server(host='127.0.0.1', port=0, latency=0.0, verbose=False,
+                       fail_rate=0.0, fail_first=0, retry_after=None, seed=0):
+    """创建桩服务实例（尚未开始监听循环）
+
+    fail_rate: 随机返回503的比例；fail_first: 前N个请求固定返回503；
+    retry_after: 503响应附带的 Retry-After 秒数
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.verbose = verbose
+    server.fail_rate = fail_rate
+    server.fail_first = fail_first
+    server.retry_after = retry_after
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.request_count = 0
+    return server
+
+
+def start_stub_server(host='127.0.0.1', port=0, latency=0.0, verbose=False, **options):
+    """在后台线程启动桩服务，返回 (server, base_url)；用完调用 server.shutdown()
+
+    options 同 create_stub_server
+    """
+    server = create_stub_server(host, port, latency, verbose, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地图片生成桩服务')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='随机返回503的比例 (0-1)')
+    parser.add_argument('--fail-first', type=int, default=0, help='前N个请求固定返回503')
+    parser.add_argument('--retry-after', type=int, default=None, help='503响应附带的 Retry-After 秒数')
+    args = parser.parse_args()
+
+    server = create_stub_server(args.host, args.port, args.latency, verbose=True,
+                                fail_rate=args.fail_rate, fail_first=args.fail_first,
+                                retry_after=args.retry_after)
+    print(f"桩服务已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
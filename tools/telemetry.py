@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行遥测
+记录各阶段的耗时（span）、计数器和字节数，逐条写入JSONL事件日志，
+运行结束时输出带分布直方图的汇总，汇总同时追加到 summaries.jsonl 便于跨批次统计。
+另提供可选的 cProfile / tracemalloc 剖析，未开启时没有任何开销
+"""
+
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+# 直方图桶上界（毫秒），最后一个桶收集超出全部上界的样本
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+def percentile(samples, fraction):
+    """最近秩法百分位数，samples 需已排序"""
+    if not samples:
+        return 0.0
+    rank = min(len(samples) - 1, max(0, math.ceil(fraction * len(samples)) - 1))
+    return samples[rank]
+
+
+class SpanStats:
+    """单个阶段的耗时样本"""
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+        self.errors = 0
+
+    def record(self, seconds, ok=True):
+        self.samples.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def histogram(self):
+        """{桶名: 样本数}，只包含非空的桶"""
+        counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        for seconds in self.samples:
+            ms = seconds * 1000
+            bucket = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if ms <= bound),
+                          len(HISTOGRAM_BOUNDS_MS))
+            counts[bucket] += 1
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {label: count for label, count in zip(labels, counts) if count}
+
+    def to_dict(self):
+        samples = sorted(self.samples)
+        total = sum(samples)
+        return {
+            'count': len(samples),
+            'errors': self.errors,
+            'total_seconds': round(total, 4),
+            'mean_ms': round(total / len(samples) * 1000, 3) if samples else 0.0,
+            'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3) if samples else 0.0,
+            'histogram': self.histogram(),
+        }
+
+
+class Telemetry:
+    """一次运行的遥测，可在多个线程间共享
+
+    events_path 为None时不写事件日志，只在内存中汇总；quiet 为True时不打印逐个单词的进度
+    """
+
+    def __init__(self, events_path=None, quiet=False):
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.quiet = quiet
+        self.events_path = events_path
+        self.counters = {}
+        self.spans = {}
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._events = None
+        if events_path:
+            directory = os.path.dirname(events_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._events = open(events_path, 'a', encoding='utf-8')
+
+    def log(self, message):
+        """逐个单词的进度信息"""
+        if not self.quiet:
+            print(message)
+
+    def event(self, kind, **fields):
+        """写入一条JSONL事件"""
+        if self._events is None:
+            return
+        record = {'run': self.run_id, 'ts': round(time.time(), 3), 'type': kind}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._events.write(line + '\n')
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_span(self, name, seconds, ok=True, **fields):
+        """记录一次已计时的阶段（用于在其他进程中计时的情况）"""
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats(name)
+            stats.record(seconds, ok)
+        self.event('span', name=name, ms=round(seconds * 1000, 3), ok=ok, **fields)
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """为代码块计时；产出的字典可由调用方补充字段，设置 ok=False 表示失败"""
+        fields['ok'] = True
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException:
+            fields['ok'] = False
+            raise
+        finally:
+            ok = fields.pop('ok')
+            self.record_span(name, time.perf_counter() - start, ok, **fields)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'run': self.run_id,
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+                'elapsed_seconds': round(time.monotonic() - self._start, 3),
+                'counters': dict(sorted(self.counters.items())),
+                'spans': {name: stats.to_dict() for name, stats in sorted(self.spans.items())},
+            }
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"运行统计 ({summary['run']}，耗时 {summary['elapsed_seconds']:.1f} 秒):")
+        if summary['counters']:
+            print("  - 计数: " + "，".join(f"{name} {value}" for name, value in summary['counters'].items()))
+        for name, stats in summary['spans'].items():
+            print(f"  - {name}: {stats['count']} 次，失败 {stats['errors']}，"
+                  f"p50 {stats['p50_ms']:.1f}ms，p95 {stats['p95_ms']:.1f}ms，最大 {stats['max_ms']:.1f}ms")
+            print("      分布: " + " | ".join(f"{label} {count}" for label, count in stats['histogram'].items()))
+        return summary
+
+    def close(self, summary_path=None):
+        """写出运行汇总（追加一行到 summary_path）并关闭事件日志"""
+        summary = self.summary()
+        self.event('summary', **{key: value for key, value in summary.items() if key != 'run'})
+        if summary_path:
+            directory = os.path.dirname(summary_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(summary_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+        return summary
+
+
+@contextlib.contextmanager
+def _cprofile(output_path, top=25):
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        if output_path:
+            profile.dump_stats(output_path)
+            print(f"CPU剖析结果已保存: {output_path}（可用 python -m pstats 或 snakeviz 查看）")
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(top)
+
+
+@contextlib.contextmanager
+def _tracemalloc(output_path, top=15):
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = snapshot.statistics('lineno')
+        print(f"内存剖析: 当前 {current / 1024 / 1024:.1f} MB，峰值 {peak / 1024 / 1024:.1f} MB")
+        for stat in stats[:top]:
+            print(f"  {stat}")
+        if output_path:
+            snapshot.dump(output_path)
+            print(f"内存快照已保存: {output_path}")
+
+
+def profiler(mode=None, output_path=None):
+    """剖析上下文：mode 为 'cpu'（cProfile）或 'memory'（tracemalloc），None 时不做任何事"""
+    if mode is None:
+        return contextlib.nullcontext()
+    if mode == 'cpu':
+        return _cprofile(output_path)
+    if mode == 'memory':
+        return _tracemalloc(output_path)
+    raise ValueError(f"未知的剖析模式: {mode}")
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""工具脚本都是 tools/ 下的平铺模块，测试时把 tools/ 加入导入路径"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_server import start_stub_server  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """启动本地桩服务，返回工厂函数 make(**options) -> (server, base_url)，测试结束时关闭"""
+    servers = []
+
+    def make(**options):
+        server, base_url = start_stub_server(**options)
+        servers.append(server)
+        return server, base_url
+
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
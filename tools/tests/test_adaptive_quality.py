@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""自适应质量：按字节预算和感知质量下限逐张选择编码质量"""
+
+import random
+
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+from image_encoder import AdaptiveQuality, encode_image, luma_psnr
+
+
+def _image(seed, size=(200, 200)):
+    """带随机色块和轻微噪声的测试图片"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', size, tuple(rng.randint(150, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(30):
+        x, y = rng.randint(0, size[0] - 10), rng.randint(0, size[1] - 10)
+        draw.ellipse((x, y, x + rng.randint(10, 60), y + rng.randint(10, 60)),
+                     fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    noise = Image.frombytes('RGB', size, rng.randbytes(size[0] * size[1] * 3))
+    return Image.blend(image, noise, 0.15).filter(ImageFilter.GaussianBlur(0.5))
+
+
+def _chosen(adaptive):
+    (quality,) = adaptive.drain_learned().values()
+    return quality
+
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('budget', [5000, 8000, 12000])
+def test_output_stays_within_budget(seed, budget):
+    image = _image(seed)
+    adaptive = AdaptiveQuality(max_bytes=budget)
+    data = adaptive.encode(image, 'jpeg')
+    quality = _chosen(adaptive)
+    assert len(data) <= budget
+    assert data == encode_image(image, 'jpeg', quality)
+    # 取预算内的最高质量
+    assert quality == adaptive.max_quality or len(encode_image(image, 'jpeg', quality + 1)) > budget
+    assert adaptive.over_budget == 0
+
+
+def test_budget_scales_with_pixel_count():
+    adaptive = AdaptiveQuality(max_bytes=6000, reference_size=(200, 200))
+    large = _image(1, (400, 400))
+    assert adaptive.budget_for(large) == 24000
+    assert len(adaptive.encode(large, 'jpeg')) <= 24000
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_quality_stops_at_floor_when_budget_cannot_be_met(seed):
+    image = _image(seed)
+    adaptive = AdaptiveQuality(max_bytes=500, min_quality=40)
+    data = adaptive.encode(image, 'jpeg')
+    # 预算无法满足时停在质量下限，不再继续降低；记为超出预算
+    assert _chosen(adaptive) == 40
+    assert data == encode_image(image, 'jpeg', 40)
+    assert len(data) > 500
+    assert adaptive.over_budget == 1
+
+
+def test_min_psnr_picks_lowest_quality_meeting_the_floor():
+    image = _image(3)
+    reference = image.convert('L')
+    adaptive = AdaptiveQuality(min_psnr=36.0)
+    data = adaptive.encode(image, 'jpeg')
+    quality = _chosen(adaptive)
+    assert luma_psnr(reference, data) >= 36.0
+    assert quality == adaptive.min_quality or luma_psnr(reference, encode_image(image, 'jpeg', quality - 1)) < 36.0
+
+    # 同时设置时预算是硬上限
+    budget = len(encode_image(image, 'jpeg', quality)) - 1
+    both = AdaptiveQuality(max_bytes=budget, min_psnr=36.0)
+    assert len(both.encode(image, 'jpeg')) <= budget
+    assert _chosen(both) < quality
+
+
+def test_choices_are_cached_by_content(tmp_path):
+    cache_path = str(tmp_path / 'quality.json')
+    image = _image(5)
+    adaptive = AdaptiveQuality(max_bytes=7000, cache_path=cache_path)
+    first = adaptive.encode(image, 'jpeg')
+    assert adaptive.encode(image.copy(), 'jpeg') == first
+    assert (adaptive.searched, adaptive.reused) == (1, 1)
+    adaptive.save()
+
+    # 参数不同时不复用
+    other = AdaptiveQuality(max_bytes=9000, cache_path=cache_path)
+    other.encode(image, 'jpeg')
+    assert other.searched == 1
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""图集的货架式装箱"""
+
+import random
+
+import pytest
+
+from atlas_packer import pack_shelves
+
+
+def _random_items(rng, count, max_side):
+    return [(f'word{i}', rng.randint(1, max_side), rng.randint(1, max_side)) for i in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_pack_shelves_places_everything_without_overlap(seed):
+    rng = random.Random(seed)
+    max_size = rng.choice([64, 256, 1024])
+    padding = rng.choice([0, 1, 2, 5])
+    items = _random_items(rng, rng.randint(1, 150), max_size // 2 - 2 * padding)
+    bins = pack_shelves(items, max_size, padding)
+
+    placed = {}
+    for number, atlas in enumerate(bins):
+        assert atlas['rects']
+        assert 0 < atlas['width'] <= max_size and 0 < atlas['height'] <= max_size
+        cells = []
+        for name, x, y, width, height in atlas['rects']:
+            assert name not in placed
+            placed[name] = (width, height)
+            # 图片连同四周的间距都在图集内
+            assert x - padding >= 0 and y - padding >= 0
+            assert x + width + padding <= atlas['width'] and y + height + padding <= atlas['height']
+            cells.append((x - padding, y - padding, x + width + padding, y + height + padding))
+        for i, (left, top, right, bottom) in enumerate(cells):
+            for other_left, other_top, other_right, other_bottom in cells[i + 1:]:
+                assert (right <= other_left or other_right <= left
+                        or bottom <= other_top or other_bottom <= top)
+    assert placed == {name: (width, height) for name, width, height in items}
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_pack_shelves_is_deterministic(seed):
+    rng = random.Random(seed)
+    items = _random_items(rng, 80, 120)
+    # 尺寸相同的图片较多时也与输入顺序无关
+    items += [(f'same{i}', 50, 50) for i in range(20)]
+    expected = pack_shelves(items, 512, 2)
+    for _ in range(5):
+        rng.shuffle(items)
+        assert pack_shelves(list(items), 512, 2) == expected
+
+
+def test_pack_shelves_rejects_oversized_images():
+    assert pack_shelves([('fits', 60, 60)], 64, 2)[0]['rects'] == [('fits', 2, 2, 60, 60)]
+    with pytest.raises(ValueError):
+        pack_shelves([('big', 62, 10)], 64, 2)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""构建清单的增量判断与保存"""
+
+import os
+
+from build_manifest import BuildManifest, compute_fingerprint
+
+
+def test_stale_reason_and_save_only_when_changed(tmp_path):
+    output = tmp_path / 'cat.jpg'
+    output.write_bytes(b'jpeg')
+    path = str(tmp_path / 'manifest.json')
+    fingerprint = compute_fingerprint({'prompt': 'a cat'})
+
+    manifest = BuildManifest(path)
+    assert manifest.stale_reason('cat', [str(output)], fingerprint) == '无构建记录'
+    manifest.record('cat', [str(output)], fingerprint, {'prompt': 'a cat'}, 'ai')
+    manifest.save()
+    saved = os.stat(path).st_mtime_ns
+
+    # 没有变化的运行不重写清单
+    reloaded = BuildManifest(path)
+    assert reloaded.stale_reason('cat', [str(output)], fingerprint) is None
+    os.utime(path, ns=(saved - 10**9, saved - 10**9))
+    reloaded.save()
+    assert os.stat(path).st_mtime_ns == saved - 10**9
+
+    assert reloaded.stale_reason('cat', [str(output)], compute_fingerprint({'prompt': 'a dog'})) == '输入参数变化'
+    reloaded.remove('cat')
+    reloaded.save()
+    assert BuildManifest(path).get('cat') is None
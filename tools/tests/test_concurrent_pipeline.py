@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""并发模式：令牌桶限速，以及输出与串行模式一致（对本地桩服务）"""
+
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from generate_word_images import WordImageGenerator
+from http_client import BackendClient
+from image_cache import RawImageCache
+from rate_limiter import TokenBucket, parse_rate
+
+WORDS = ['cat', 'dog', 'apple', 'teddy bear', 'bus', 'cat', 'moon', 'tree']
+
+
+@pytest.mark.parametrize('text, expected', [('5', 5.0), ('5/s', 5.0), ('30/m', 0.5), ('7200/h', 2.0)])
+def test_parse_rate(text, expected):
+    assert parse_rate(text) == expected
+
+
+@pytest.mark.parametrize('text', ['0', '-1/s', '5/week'])
+def test_parse_rate_rejects_invalid(text):
+    with pytest.raises(ValueError):
+        parse_rate(text)
+
+
+def test_token_bucket_limits_request_rate(stub):
+    """8个并发请求者共享每秒20次的令牌桶，21个请求至少耗时1秒（首个令牌无需等待）"""
+    server, base_url = stub()
+    client = BackendClient(pool_size=8)
+    rate, total = 20.0, 21
+    sent = []
+
+    async def run():
+        bucket = TokenBucket(rate, capacity=1)
+        loop = asyncio.get_running_loop()
+        remaining = iter(range(total))
+
+        async def worker():
+            for i in remaining:
+                await bucket.acquire()
+                sent.append(time.monotonic())
+                await loop.run_in_executor(None, client.get, f"{base_url}/prompt/word{i}")
+
+        await asyncio.gather(*(worker() for _ in range(8)))
+
+    asyncio.run(run())
+    assert server.request_count == total
+    elapsed = sent[-1] - sent[0]
+    assert (total - 1) / rate * 0.95 <= elapsed < (total - 1) / rate + 0.5
+
+
+def _write_words(directory):
+    entries = [{'id': str(i), 'text': word, 'category': 'animals' if i % 2 else 'things'}
+               for i, word in enumerate(WORDS)]
+    (directory / 'words.json').write_text(json.dumps(entries), encoding='utf-8')
+
+
+def _generate(work_dir, base_url=None, setup=None, **options):
+    generator = WordImageGenerator()
+    generator.output_dir = str(work_dir)
+    generator.words_data_path = str(work_dir.parent / 'words.json')
+    if base_url:
+        generator.api_base = base_url
+    generator.backoff_base = 0.0
+    if setup:
+        setup(generator)
+    generator.generate_all_images(delay=0, **options)
+    return generator
+
+
+def _read_outputs(directory):
+    outputs = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                outputs[os.path.relpath(path, directory)] = f.read()
+    return outputs
+
+
+def test_concurrent_output_matches_serial(stub, tmp_path, monkeypatch):
+    # 生成器在当前目录的相对路径下创建默认输出目录
+    monkeypatch.chdir(tmp_path)
+    _write_words(tmp_path)
+    # 偶发的503经重试后恢复，不应改变输出
+    _, base_url = stub(latency=0.01, fail_rate=0.2, retry_after=0, seed=1)
+
+    serial_dir = tmp_path / 'serial'
+    concurrent_dir = tmp_path / 'concurrent'
+    for generator in (_generate(serial_dir, base_url),
+                      _generate(concurrent_dir, base_url, concurrency=4, rate=100, encoders=2)):
+        # 全部来自生成服务（没有退回备用图标），重复单词在读取单词列表时只保留一条
+        assert generator.telemetry.counters.get('generated') == len(set(WORDS))
+        assert 'duplicate' not in generator.telemetry.counters
+
+    serial = _read_outputs(serial_dir)
+    assert sorted(serial) == sorted(['index.json'] + [f"{word.replace(' ', '_')}.jpg" for word in set(WORDS)])
+    assert _read_outputs(concurrent_dir) == serial
+    index = json.loads(serial['index.json'])
+    assert index['teddy bear']['path'] == 'assets/images/words/teddy_bear.jpg'
+
+
+@pytest.mark.parametrize('options', [{}, {'concurrency': 2, 'encoders': 1}])
+def test_cache_write_errors_do_not_abort(tmp_path, monkeypatch, options):
+    """原图缓存写入失败（如磁盘已满）时照常使用下载到的原图"""
+    monkeypatch.chdir(tmp_path)
+    _write_words(tmp_path)
+
+    def put_file(self, key, source, sha256):
+        source.read()
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(RawImageCache, 'put_file', put_file)
+
+    def setup(generator):
+        generator.backend_name = 'procedural'
+        generator.cache = RawImageCache(str(tmp_path / 'cache'))
+
+    generator = _generate(tmp_path / 'out', setup=setup, **options)
+    assert generator.telemetry.counters.get('generated') == len(set(WORDS))
+    assert generator.telemetry.counters.get('cache_errors') == len(set(WORDS))
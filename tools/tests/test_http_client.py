@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""连接池客户端的重试、Retry-After 和熔断（对本地桩服务）"""
+
+import time
+
+import pytest
+import requests
+
+from http_client import BackendClient, CircuitBreaker, CircuitOpenError
+
+
+def make_client(**options):
+    options.setdefault('backoff_base', 0.0)  # 不设 Retry-After 时立即重试
+    return BackendClient(pool_size=4, **options)
+
+
+def test_retries_until_success(stub):
+    server, base_url = stub(fail_first=2)
+    client = make_client(max_retries=3)
+    response = client.get(f"{base_url}/prompt/cat")
+    assert response.headers['Content-Type'] == 'image/jpeg'
+    assert server.request_count == 3
+    assert client.stats()['retries'] == 2
+    assert client.breaker.state == 'closed'
+
+
+def test_honours_retry_after(stub):
+    server, base_url = stub(fail_first=1, retry_after=1)
+    client = make_client(max_retries=3)
+    start = time.monotonic()
+    client.get(f"{base_url}/prompt/cat")
+    assert time.monotonic() - start >= 1.0
+    assert server.request_count == 2
+
+
+def test_gives_up_after_max_retries(stub):
+    server, base_url = stub(fail_first=10)
+    client = make_client(max_retries=2, breaker=CircuitBreaker(failure_threshold=10))
+    with pytest.raises(requests.HTTPError):
+        client.get(f"{base_url}/prompt/cat")
+    assert server.request_count == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    server, base_url = stub()
+    client = make_client(max_retries=3)
+    with pytest.raises(requests.HTTPError):
+        client.get(f"{base_url}/missing")
+    assert client.stats()['requests'] == 1
+    assert client.breaker.failures == 0
+
+
+def test_breaker_opens_and_recovers(stub):
+    server, base_url = stub(fail_first=3)
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+    client = make_client(max_retries=0, breaker=breaker)
+    url = f"{base_url}/prompt/cat"
+
+    for _ in range(3):
+        assert breaker.state == 'closed'
+        with pytest.raises(requests.HTTPError):
+            client.get(url)
+    assert breaker.state == 'open'
+    assert breaker.opened_count == 1
+
+    # 熔断期间请求不会发出
+    with pytest.raises(CircuitOpenError):
+        client.get(url)
+    assert server.request_count == 3
+
+    # 超过 reset_timeout 后放行一个试探请求，成功则关闭
+    time.sleep(0.25)
+    client.get(url)
+    assert server.request_count == 4
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+
+
+def test_breaker_half_open_allows_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow_request()  # 试探请求返回前不放行其他请求
+
+    # 试探失败，重新打开
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.is_open
+    assert breaker.opened_count == 2
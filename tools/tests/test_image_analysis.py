@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""近似重复分簇与逐对暴力比较的结果一致"""
+
+import numpy as np
+import pytest
+
+from image_analysis import duplicate_clusters, popcount64
+
+
+def brute_force_clusters(hashes, mean_colors, max_distance, max_color_distance):
+    """按下标顺序取未分簇的图片为簇首，与簇首直接重复的未分簇图片并入该簇"""
+    colors = np.asarray(mean_colors, dtype=np.float64)
+    assigned = np.zeros(len(hashes), dtype=bool)
+    clusters = []
+    for head in range(len(hashes)):
+        if assigned[head]:
+            continue
+        assigned[head] = True
+        members = [j for j in range(head + 1, len(hashes)) if not assigned[j]
+                   and int(popcount64(hashes[head:head + 1] ^ hashes[j:j + 1])[0]) <= max_distance
+                   and np.linalg.norm(colors[head] - colors[j]) <= max_color_distance]
+        if members:
+            assigned[members] = True
+            clusters.append([head] + members)
+    return clusters
+
+
+def random_set(rng, n):
+    """少数几个基准哈希和颜色附近的图片，大量哈希相同、颜色相近或位于阈值附近"""
+    bases = rng.integers(0, 2**63, size=4, dtype=np.uint64)
+    hashes = bases[rng.integers(0, len(bases), size=n)]
+    flips = rng.integers(0, 9, size=n)
+    for i, count in enumerate(flips):
+        for bit in rng.choice(64, size=count, replace=False):
+            hashes[i] ^= np.uint64(1) << np.uint64(bit)
+    hashes[rng.random(n) < 0.3] = bases[0]
+    palette = rng.uniform(0, 255, size=(3, 3))
+    colors = palette[rng.integers(0, len(palette), size=n)] + rng.normal(0, 12, size=(n, 3))
+    return hashes, colors.astype(np.float32)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_clusters_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    hashes, colors = random_set(rng, int(rng.integers(2, 120)))
+    clusters = [group.tolist() for group in duplicate_clusters(hashes, colors, 6, 24.0)]
+    assert clusters == brute_force_clusters(hashes, colors, 6, 24.0)
+
+
+def test_colour_gradient_is_not_chained():
+    # 红-橙、橙-黄都在阈值内，红-黄相差约32，超过阈值
+    hashes = np.zeros(3, dtype=np.uint64)
+    colors = np.array([[230, 60, 60], [230, 76, 60], [230, 92, 60]], dtype=np.float32)
+    assert [group.tolist() for group in duplicate_clusters(hashes, colors, 6, 24.0)] == [[0, 1]]
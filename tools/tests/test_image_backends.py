@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""生成后端：批量请求的每张图片与提示词一一对应"""
+
+import json
+import sys
+
+import pytest
+
+import generate_word_images
+from generate_word_images import WordImageGenerator
+from http_client import BackendClient
+from image_backends import BatchHTTPBackend, GenerationRequest, create_backend
+from image_cache import RawImageCache
+from stub_server import render_stub_image
+
+SIZE = (64, 48)
+REQUESTS = [GenerationRequest('a red car', None), GenerationRequest('a red car', 7),
+            GenerationRequest('a cute cat', None), GenerationRequest('an apple', 3),
+            GenerationRequest('a yellow school bus', None)]
+
+
+def _check_results(results, requests):
+    images = set()
+    for request, (spool, size, sha256) in zip(requests, results):
+        data = spool.read()
+        assert data == render_stub_image(request.prompt, SIZE, request.seed)
+        assert size == len(data)
+        images.add(sha256)
+    assert len(images) == len(requests)
+
+
+def test_procedural_batch_round_trip():
+    backend = create_backend('procedural', size=SIZE, batch_size=8)
+    results = backend.generate(REQUESTS)
+    assert len(results) == len(REQUESTS)
+    _check_results(results, REQUESTS)
+    assert backend.stats() == {'backend': 'procedural', 'calls': 1, 'images': len(REQUESTS)}
+    with pytest.raises(ValueError):
+        backend.generate(REQUESTS * 2)
+
+
+def test_batch_http_round_trip(stub):
+    server, base_url = stub()
+    backend = BatchHTTPBackend(BackendClient(pool_size=2), base_url, size=SIZE, batch_size=8)
+    requests = REQUESTS[:2] + [GenerationRequest('', None)] + REQUESTS[2:]
+    results = backend.generate(requests)
+    assert server.request_count == 1
+    # 单张失败只影响对应位置，其余图片仍按顺序对应各自的提示词
+    assert isinstance(results[2], ValueError)
+    _check_results(results[:2] + results[3:], REQUESTS)
+
+
+def test_stub_backend_round_trip():
+    backend = create_backend('stub', client=BackendClient(pool_size=2), api_base='http://unused',
+                             size=SIZE, batch_size=8)
+    try:
+        _check_results(backend.generate(REQUESTS), REQUESTS)
+        assert backend.server.request_count == 1
+    finally:
+        backend.close()
+
+
+WORDS = ['car', 'cat', 'apple', 'teddy bear', 'bus', 'moon', 'tree', 'kite', 'dog', 'sun', 'book']
+
+
+@pytest.mark.parametrize('extra', [[], ['--concurrency', '2', '--encoders', '1']])
+def test_generator_batches_map_each_word_to_its_image(tmp_path, monkeypatch, extra):
+    work_dir = tmp_path / 'tools'
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    words_path = tmp_path / 'words.json'
+    words_path.write_text(json.dumps(WORDS), encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['generate_word_images.py', '--backend', 'procedural',
+                                      '--batch-size', '4', '--words', str(words_path), '--delay', '0',
+                                      '--no-journal', '--no-telemetry', '--quiet', *extra])
+    generate_word_images.main()
+
+    # 每个单词的原图是按它自己的提示词绘制的（批内顺序错位时会得到别的单词的图片）
+    generator = WordImageGenerator()
+    generator.backend_name = 'procedural'
+    cache = RawImageCache('.cache/raw_images')
+    for word in WORDS:
+        prompt = generator._build_image_prompt(word)
+        with cache.open(generator._cache_key(prompt)) as f:
+            assert f.read() == render_stub_image(prompt, generator.source_size)
+        assert (tmp_path / 'assets/images/words' / f"{word.replace(' ', '_')}.jpg").exists()
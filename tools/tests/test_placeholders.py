@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""占位图只取决于写出的图片内容：编码进程、补写索引和重建索引得到的结果相同"""
+
+import json
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+pytest.importorskip('numpy')
+
+import generate_word_images  # noqa: E402
+from image_encoder import save_variants  # noqa: E402
+from image_index import read_index  # noqa: E402
+from placeholders import PlaceholderCache, compute_placeholder  # noqa: E402
+
+WORDS = ['cat', 'dog', 'apple', 'teddy bear', 'bus', 'moon', 'tree', 'kite']
+
+
+def test_encoder_placeholder_matches_file(tmp_path):
+    image = Image.new('RGB', (640, 480), (250, 240, 220))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((120, 60, 520, 420), fill=(200, 40, 60))
+    draw.rectangle((0, 400, 640, 480), fill=(30, 120, 200))
+    path = str(tmp_path / 'ball.jpg')
+    variants = [(2.0, 'jpeg', str(tmp_path / '2.0x' / 'ball.jpg')), (1.0, 'jpeg', path)]
+    _, entry = save_variants(image, variants, (200, 200), 85, describe=(path, ((4, 3), 16)))
+
+    assert entry['placeholder'] == compute_placeholder(path, (4, 3), 16)
+    assert entry['placeholder'] == PlaceholderCache().get(entry['sha256'], path)
+
+
+def _run(monkeypatch, words_path, *extra):
+    monkeypatch.setattr(sys, 'argv', ['generate_word_images.py', '--backend', 'procedural',
+                                      '--words', str(words_path), '--delay', '0', '--no-journal',
+                                      '--no-telemetry', '--quiet', *extra])
+    generate_word_images.main()
+
+
+def _placeholders(index_path):
+    return {word: entry['placeholder'] for word, entry in read_index(index_path).items()}
+
+
+def test_placeholders_are_stable_across_paths(tmp_path, monkeypatch):
+    work_dir = tmp_path / 'tools'
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    words_path = tmp_path / 'words.json'
+    words_path.write_text(json.dumps(WORDS), encoding='utf-8')
+    index_path = str(tmp_path / 'assets/images/words/index.json')
+
+    # 编码进程里随输出计算
+    _run(monkeypatch, words_path, '--concurrency', '2', '--encoders', '2')
+    generated = _placeholders(index_path)
+    assert set(generated) == set(WORDS)
+
+    # 不带原索引和缓存重建索引：从文件计算
+    os.remove(index_path)
+    os.remove('.cache/placeholders.json')
+    _run(monkeypatch, words_path, '--reindex')
+    assert _placeholders(index_path) == generated
+
+    # 图片已是最新但索引丢失：补写条目时从文件计算
+    os.remove(index_path)
+    os.remove('.cache/placeholders.json')
+    _run(monkeypatch, words_path)
+    assert _placeholders(index_path) == generated
+
+    # 缓存中的占位图与各自的内容哈希对应
+    with open('.cache/placeholders.json', encoding='utf-8') as f:
+        cached = json.load(f)
+    for word, entry in read_index(index_path).items():
+        assert cached[f"{entry['sha256']}:4x3:16"] == generated[word]
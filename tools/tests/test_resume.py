@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""中断后保存进度，并用 --resume 继续"""
+
+import json
+import sys
+
+import pytest
+from PIL import Image
+
+import generate_word_images
+from build_manifest import BuildManifest
+from generate_word_images import WordImageGenerator
+from image_index import read_index
+from job_journal import JobJournal
+
+WORDS = ['cat', 'dog', 'apple', 'teddy bear', 'bus', 'moon', 'tree']
+
+
+def _run(monkeypatch, words_path, *extra):
+    monkeypatch.setattr(sys, 'argv', ['generate_word_images.py', '--backend', 'procedural',
+                                      '--words', str(words_path), '--delay', '0',
+                                      '--no-telemetry', '--quiet', *extra])
+    generate_word_images.main()
+
+
+def test_interrupt_saves_progress_and_resume_finishes(tmp_path, monkeypatch):
+    # 默认路径相对于当前目录：输出写入 tmp_path/assets/images/words，缓存和清单写入 tools/.cache
+    work_dir = tmp_path / 'tools'
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    words_path = tmp_path / 'words.json'
+    words_path.write_text(json.dumps([{'id': str(i), 'text': word, 'category': 'things'}
+                                      for i, word in enumerate(WORDS)]), encoding='utf-8')
+
+    record_status = WordImageGenerator._record_status
+    done = []
+
+    def interrupt_after_three(self, word, status):
+        record_status(self, word, status)
+        done.append(word)
+        if len(done) == 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(WordImageGenerator, '_record_status', interrupt_after_three)
+    with pytest.raises(KeyboardInterrupt):
+        _run(monkeypatch, words_path)
+
+    # 已完成的单词在清单、图片索引和原图缓存中都已落盘
+    manifest = BuildManifest('.cache/build_manifest.json')
+    assert all(manifest.get(word) is not None for word in done)
+    index = read_index(str(tmp_path / 'assets/images/words/index.json'))
+    assert set(done) <= set(index)
+    with open('.cache/raw_images/index.json', encoding='utf-8') as f:
+        assert len(json.load(f)) >= len(done)
+    journal = JobJournal('.cache/job_journal.sqlite')
+    assert journal.last_run()['status'] == 'interrupted'
+    journal.close()
+
+    monkeypatch.setattr(WordImageGenerator, '_record_status', record_status)
+    _run(monkeypatch, words_path, '--resume')
+    manifest = BuildManifest('.cache/build_manifest.json')
+    assert all(manifest.get(word) is not None for word in WORDS)
+    assert set(read_index(str(tmp_path / 'assets/images/words/index.json'))) == set(WORDS)
+
+
+def test_resume_continues_only_the_latest_unfinished_run(tmp_path):
+    journal = JobJournal(str(tmp_path / 'journal.sqlite'))
+    assert journal.start_run(WORDS, {}) == set()
+    for word in WORDS:
+        journal.update(word, 'encoded')
+    journal.close('finished')
+
+    # 上次运行已正常结束：从上一轮完成的单词都不算作本次已完成
+    journal = JobJournal(str(tmp_path / 'journal.sqlite'))
+    assert journal.start_run(WORDS, {}) == set()
+    journal.update('cat', 'encoded')
+    journal.update('dog', 'fallback')
+    journal.update('apple', 'failed')
+    journal.close('interrupted')
+
+    journal = JobJournal(str(tmp_path / 'journal.sqlite'))
+    last = journal.last_run()
+    assert journal.start_run(WORDS, {}, resume_from=last['id']) == {'cat', 'dog'}
+    journal.update('bus', 'encoded')
+    journal.close('interrupted')
+
+    # 连续中断时，之前各次继续中完成的单词都保留
+    journal = JobJournal(str(tmp_path / 'journal.sqlite'))
+    last = journal.last_run()
+    assert journal.start_run(WORDS, {}, resume_from=last['id']) == {'cat', 'dog', 'bus'}
+    assert journal.counts(WORDS) == {'encoded': 2, 'fallback': 1, 'pending': len(WORDS) - 3}
+    journal.close()
+
+
+def test_resume_rebuilds_stale_words_and_ignores_finished_runs(tmp_path, monkeypatch, capsys):
+    work_dir = tmp_path / 'tools'
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    words_path = tmp_path / 'words.json'
+    words_path.write_text(json.dumps(WORDS), encoding='utf-8')
+    output_dir = tmp_path / 'assets/images/words'
+
+    record_status = WordImageGenerator._record_status
+    done = []
+
+    def interrupt_after_three(self, word, status):
+        record_status(self, word, status)
+        done.append(word)
+        if len(done) == 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(WordImageGenerator, '_record_status', interrupt_after_three)
+    with pytest.raises(KeyboardInterrupt):
+        _run(monkeypatch, words_path)
+    monkeypatch.setattr(WordImageGenerator, '_record_status', record_status)
+
+    # 中断后修改了尺寸：已完成的单词也已过期，需要重新生成
+    capsys.readouterr()
+    _run(monkeypatch, words_path, '--resume', '--size', '120x120')
+    out = capsys.readouterr().out
+    assert '已完成 3 个单词（其中 3 个已过期，重新生成），剩余 7 个' in out
+    for word in WORDS:
+        with Image.open(output_dir / f"{word.replace(' ', '_')}.jpg") as image:
+            assert image.size == (120, 120)
+
+    # 上次运行已正常结束：--resume 按普通运行处理，过期的单词照常重建
+    _run(monkeypatch, words_path, '--resume', '--size', '100x100')
+    out = capsys.readouterr().out
+    assert '已正常结束' in out and '已完成' not in out
+    assert '任务日志: \n' not in out
+    for word in WORDS:
+        with Image.open(output_dir / f"{word.replace(' ', '_')}.jpg") as image:
+            assert image.size == (100, 100)
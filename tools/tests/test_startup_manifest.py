@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""启动清单编译：引用检查与输出格式"""
+
+import json
+import sys
+
+import pytest
+
+import startup_manifest
+from startup_manifest import FIELDS, compile_manifest, write_manifest
+
+ENTRIES = [
+    {'id': '1', 'text': 'car', 'category': 'vehicles', 'audioPath': 'assets/audios/car.mp3'},
+    {'id': '2', 'text': 'teddy bear', 'category': 'toys', 'audioPath': 'assets/audios/teddy_bear.mp3'},
+    {'id': '3', 'text': 'bus', 'category': 'vehicles', 'imagePath': 'assets/images/legacy/bus.png',
+     'audioPath': 'assets/audios/bus.mp3'},
+]
+INDEX = {
+    'car': {'path': 'assets/images/words/car.jpg', 'width': 200, 'height': 150, 'category': 'vehicles',
+            'placeholder': {'color': '#ff0000', 'blurhash': 'LEHV6nWB2yk8', 'thumb': 'data:'}},
+    'teddy bear': {'path': 'assets/images/words/teddy_bear.jpg', 'width': 200, 'height': 200},
+}
+
+
+@pytest.fixture
+def project(tmp_path):
+    for path in ('assets/images/words/car.jpg', 'assets/images/words/teddy_bear.jpg',
+                 'assets/images/legacy/bus.png', 'assets/audios/car.mp3',
+                 'assets/audios/teddy_bear.mp3', 'assets/audios/bus.mp3'):
+        target = tmp_path.joinpath(*path.split('/'))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(b'x')
+    return tmp_path
+
+
+def _rows(manifest):
+    """按 fields 还原每个单词的完整记录"""
+    rows = {}
+    for category in manifest['categories']:
+        for values in category['words']:
+            row = dict(zip(manifest['fields'], values))
+            if row['image']:
+                row['image'] = manifest['imageBase'] + row['image']
+            if row['audio']:
+                row['audio'] = manifest['audioBase'] + row['audio']
+            rows[row['text']] = dict(row, category=category['name'])
+    return rows
+
+
+def test_manifest_round_trip(project, tmp_path):
+    manifest, problems = compile_manifest(ENTRIES, INDEX, str(project))
+    assert problems == []
+    path = str(tmp_path / 'out' / 'words.compiled.json')
+    write_manifest(manifest, path)
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert json.loads(text) == manifest
+    assert '\n' not in text and ', ' not in text and '": ' not in text
+
+    loaded = json.loads(text)
+    assert loaded['version'] == startup_manifest.MANIFEST_VERSION
+    assert loaded['fields'] == list(FIELDS)
+    assert loaded['count'] == 3
+    assert loaded['imageBase'] == 'assets/images/'
+    assert loaded['audioBase'] == 'assets/audios/'
+    assert [category['name'] for category in loaded['categories']] == ['vehicles', 'toys']
+    assert _rows(loaded) == {
+        'car': {'id': '1', 'text': 'car', 'image': 'assets/images/words/car.jpg',
+                'audio': 'assets/audios/car.mp3', 'width': 200, 'height': 150,
+                'color': '#ff0000', 'blurhash': 'LEHV6nWB2yk8', 'category': 'vehicles'},
+        'teddy bear': {'id': '2', 'text': 'teddy bear', 'image': 'assets/images/words/teddy_bear.jpg',
+                       'audio': 'assets/audios/teddy_bear.mp3', 'width': 200, 'height': 200,
+                       'color': None, 'blurhash': None, 'category': 'toys'},
+        # 不在索引中的单词使用条目自带的图片，没有尺寸和占位图
+        'bus': {'id': '3', 'text': 'bus', 'image': 'assets/images/legacy/bus.png',
+                'audio': 'assets/audios/bus.mp3', 'width': None, 'height': None,
+                'color': None, 'blurhash': None, 'category': 'vehicles'},
+    }
+
+
+def test_missing_references_are_reported(project):
+    entries = ENTRIES + [
+        {'id': '4', 'text': 'ghost', 'category': 'toys'},
+        {'id': '5', 'text': 'kite', 'category': 'toys', 'imagePath': 'assets/images/words/kite.jpg',
+         'audioPath': 'assets/audios/kite.mp3'},
+        {'id': '1', 'text': 'car copy', 'category': 'vehicles'},
+    ]
+    index = dict(INDEX, kite={'path': 'assets/images/words/kite.jpg', 'width': 200, 'height': 200})
+    manifest, problems = compile_manifest(entries, index, str(project))
+    assert [(kind, word) for kind, word, _ in problems] == [
+        ('image', 'ghost'), ('audio', 'ghost'), ('image', 'kite'), ('audio', 'kite'), ('duplicate_id', 'car copy')]
+    assert 'assets/images/words/kite.jpg' in problems[2][2]
+
+    # 允许缺失的类型不计为问题，缺失的引用在清单中为 null
+    manifest, problems = compile_manifest(entries, index, str(project), allow_missing=('image', 'audio'))
+    assert [kind for kind, _, _ in problems] == ['duplicate_id']
+    rows = _rows(manifest)
+    assert rows['ghost']['image'] is None and rows['ghost']['audio'] is None
+    assert rows['kite']['width'] is None
+
+
+def test_cli_fails_without_writing_on_missing_reference(project, tmp_path, monkeypatch, capsys):
+    words_path = tmp_path / 'words.json'
+    words_path.write_text(json.dumps(ENTRIES + [{'id': '4', 'text': 'ghost', 'category': 'toys'}]),
+                          encoding='utf-8')
+    index_path = tmp_path / 'index.json'
+    index_path.write_text(json.dumps(INDEX), encoding='utf-8')
+    output = tmp_path / 'words.compiled.json'
+    argv = ['startup_manifest.py', '--words', str(words_path), '--index', str(index_path),
+            '--project-root', str(project), '--output', str(output)]
+
+    monkeypatch.setattr(sys, 'argv', argv)
+    with pytest.raises(SystemExit) as exit_info:
+        startup_manifest.main()
+    assert exit_info.value.code == 1
+    assert not output.exists()
+    out = capsys.readouterr().out
+    assert 'image 1' in out and '[image] ghost' in out
+
+    monkeypatch.setattr(sys, 'argv', argv + ['--allow-missing', 'image', '--allow-missing', 'audio'])
+    startup_manifest.main()
+    with open(output, encoding='utf-8') as f:
+        assert json.load(f)['count'] == 4
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""运行遥测的百分位数"""
+
+import pytest
+
+from telemetry import percentile
+
+
+@pytest.mark.parametrize('samples, fraction, expected', [
+    ([], 0.5, 0.0),
+    ([7], 0.5, 7),
+    ([7], 0.95, 7),
+    ([1, 2], 0.5, 1),
+    ([1, 2, 3, 4], 0.5, 2),
+    ([1, 2, 3, 4, 5], 0.5, 3),
+    (list(range(1, 11)), 0.5, 5),
+    (list(range(1, 11)), 0.95, 10),
+    (list(range(1, 11)), 0.9, 9),
+    (list(range(1, 21)), 0.95, 19),
+    (list(range(1, 101)), 0.95, 95),
+    (list(range(1, 101)), 0.0, 1),
+    (list(range(1, 101)), 1.0, 100),
+])
+def test_percentile_nearest_rank(samples, fraction, expected):
+    assert percentile(samples, fraction) == expected
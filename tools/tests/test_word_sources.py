@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""单词列表的流式解析、分片划分与分片索引合并"""
+
+import io
+import json
+import sys
+
+import pytest
+
+import generate_word_images
+import word_sources
+from image_index import read_index
+from word_sources import WordSourceError, in_shard, iter_word_entries, shard_of
+
+
+def _write(path, items):
+    path.write_text(json.dumps(items, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 1 << 16])
+def test_json_array_is_parsed_across_chunk_boundaries(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(word_sources, 'CHUNK_SIZE', chunk_size)
+    items = [{'id': 12345, 'text': 'apple', 'category': 'fruits', 'audioPath': 'a.mp3'},
+             'banana', {'word': ' 猫 '}, {'id': 7, 'text': ''}, {'text': 'x', 'id': 3.25}]
+    path = tmp_path / 'words.json'
+    path.write_text('﻿  [\n' + ',\n'.join(json.dumps(item, ensure_ascii=False) for item in items) + ' ]\n',
+                    encoding='utf-8')
+    assert list(iter_word_entries(str(path))) == [
+        {'id': '12345', 'text': 'apple', 'category': 'fruits', 'audioPath': 'a.mp3'},
+        {'id': 'banana', 'text': 'banana', 'category': 'uncategorized'},
+        {'id': '猫', 'text': '猫', 'category': 'uncategorized'},
+        {'id': '3.25', 'text': 'x', 'category': 'uncategorized'},
+    ]
+
+
+@pytest.mark.parametrize('content', ['', '{}', '[{"text": "a"}', '[{"text": "a"} {"text": "b"}]',
+                                     '[{"text": "a"},]', '[] []', '[{"text": "a}]'])
+def test_malformed_json_array_raises(tmp_path, monkeypatch, content):
+    monkeypatch.setattr(word_sources, 'CHUNK_SIZE', 4)
+    path = tmp_path / 'words.json'
+    path.write_text(content, encoding='utf-8')
+    with pytest.raises(WordSourceError):
+        list(iter_word_entries(str(path)))
+
+
+def test_json_array_is_read_incrementally():
+    f = io.StringIO('[' + ','.join(json.dumps({'text': f'w{i}'}) for i in range(10000)) + ']')
+    items = word_sources._iter_json_array(f, 'words.json')
+    assert next(items)[0] == {'text': 'w0'}
+    assert f.tell() <= 2 * word_sources.CHUNK_SIZE
+
+
+def test_jsonl_and_csv_sources(tmp_path):
+    jsonl = tmp_path / 'words.jsonl'
+    jsonl.write_text('{"text": "cat", "category": "animals"}\n\n"dog"\n', encoding='utf-8')
+    assert [entry['text'] for entry in iter_word_entries(str(jsonl))] == ['cat', 'dog']
+    tsv = tmp_path / 'words.tsv'
+    tsv.write_text('id\tword\tcategory\n1\tcat\tanimals\n', encoding='utf-8')
+    assert list(iter_word_entries(str(tsv))) == [{'id': '1', 'text': 'cat', 'category': 'animals'}]
+    bad = tmp_path / 'bad.csv'
+    bad.write_text('name,category\ncat,animals\n', encoding='utf-8')
+    with pytest.raises(WordSourceError):
+        list(iter_word_entries(str(bad)))
+
+
+def test_shards_partition_words_by_text():
+    entries = [{'id': str(i), 'text': f'word{i % 500}', 'category': 'c'} for i in range(1000)]
+    for count in (1, 3, 4):
+        owners = [[index for index in range(1, count + 1) if in_shard(entry, (index, count))]
+                  for entry in entries]
+        assert all(len(owner) == 1 for owner in owners)
+        # 同一文本（不同id）总在同一片，划分与顺序无关
+        by_text = {}
+        for entry, owner in zip(entries, owners):
+            assert by_text.setdefault(entry['text'], owner) == owner
+        assert all(in_shard(entry, None) for entry in entries)
+    assert shard_of('car', 4) == shard_of('car', 4)
+    assert len({shard_of(f'word{i}', 4) for i in range(100)}) == 4
+
+
+def _run(monkeypatch, words_path, *extra):
+    monkeypatch.setattr(sys, 'argv', ['generate_word_images.py', '--backend', 'procedural',
+                                      '--words', str(words_path), '--delay', '0', '--no-journal',
+                                      '--no-telemetry', '--quiet', *extra])
+    generate_word_images.main()
+
+
+def test_sharded_generation_merges_without_conflicts(tmp_path, monkeypatch, capsys):
+    work_dir = tmp_path / 'tools'
+    work_dir.mkdir()
+    monkeypatch.chdir(work_dir)
+    words = ['car', 'bus', 'apple', 'cat', 'dog', 'moon', 'kite', 'tree']
+    items = [{'id': str(i), 'text': word, 'category': 'vehicles' if word in ('car', 'bus') else 'things'}
+             for i, word in enumerate(words)]
+    items.append({'id': '38', 'text': 'car', 'category': 'toys'})
+    words_path = _write(tmp_path / 'words.json', items)
+
+    for index in (1, 2, 3):
+        _run(monkeypatch, words_path, '--shard', f'{index}/3')
+    output_dir = tmp_path / 'assets/images/words'
+    shards = [read_index(str(output_dir / f'index.shard-{index}-of-3.json')) for index in (1, 2, 3)]
+    assert sorted(word for shard in shards for word in shard) == sorted(words)
+
+    capsys.readouterr()
+    _run(monkeypatch, words_path, '--merge-index')
+    out = capsys.readouterr().out
+    assert '警告' not in out
+    merged = read_index(str(output_dir / 'index.json'))
+    assert set(merged) == set(words)
+    # 重复的文本保留第一条记录的类别
+    assert merged['car']['category'] == 'vehicles'
+
+
+def test_merge_reports_missing_shards_and_conflicts(tmp_path, capsys):
+    output_dir = tmp_path / 'words'
+    output_dir.mkdir()
+    _write(output_dir / 'index.shard-1-of-3.json', {'cat': {'path': 'a/cat.jpg', 'category': 'animals'}})
+    _write(output_dir / 'index.shard-2-of-3.json', {'cat': {'path': 'b/cat.jpg', 'category': 'animals'},
+                                                    'dog': 'a/dog.jpg'})
+    generator = generate_word_images.WordImageGenerator()
+    generator.output_dir = str(output_dir)
+    index = generator.merge_shard_indexes()
+    out = capsys.readouterr().out
+    assert '缺少第 3 片' in out
+    assert 'cat 在多个分片中的条目不一致' in out
+    merged = read_index(str(output_dir / 'index.json'))
+    assert merged == {'cat': {'path': 'a/cat.jpg', 'category': 'animals'}, 'dog': {'path': 'a/dog.jpg'}}
+    assert len(index) == 2
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单词列表读取与分片
+支持 JSON 数组（增量解析，不把整个文件读入内存）、JSONL 和 CSV/TSV，逐条产出单词条目。
+按单词文本（即输出文件名和索引键）的哈希确定性地分片，多台机器各自生成自己的一片，最后合并索引
+"""
+
+import csv
+import hashlib
+import json
+import os
+
+FORMATS = ('json', 'jsonl', 'csv', 'tsv')
+_EXTENSIONS = {
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+}
+CHUNK_SIZE = 1 << 16
+
+
+class WordSourceError(ValueError):
+    """单词列表格式错误"""
+
+
+def detect_format(path):
+    fmt = _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise WordSourceError(f"无法根据扩展名判断单词列表格式: {path}（可用 --words-format 指定）")
+    return fmt
+
+
+def normalize_entry(item, location):
+    """把一条原始记录转换为 {'id', 'text', 'category', ...}，其他非空字段（如 audioPath）原样保留；
+    没有文本的记录返回None"""
+    extra = {}
+    if isinstance(item, dict):
+        text = item.get('text') or item.get('word') or ''
+        category = item.get('category') or 'uncategorized'
+        word_id = item.get('id')
+        extra = {key: value for key, value in item.items()
+                 if key not in ('id', 'text', 'word', 'category') and value not in (None, '')}
+    elif isinstance(item, str):
+        text, category, word_id = item, 'uncategorized', None
+    else:
+        raise WordSourceError(f"{location}: 不支持的单词条目 {item!r}")
+    text = str(text).strip()
+    if not text:
+        return None
+    entry = {
+        'id': str(word_id) if word_id not in (None, '') else text,
+        'text': text,
+        'category': str(category),
+    }
+    entry.update(extra)
+    return entry
+
+
+def _iter_json_array(f, path):
+    """增量解析顶层为数组的JSON文件，逐个产出数组元素"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    offset = 0  # buffer[0] 在文件中的字符位置，用于错误信息
+    eof = False
+    state = 'start'  # start -> first -> (value -> separator)* -> end
+
+    def fill():
+        nonlocal buffer, pos, offset, eof
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            eof = True
+        offset += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                if state == 'end':
+                    return
+                raise WordSourceError(f"{path}: JSON数组在第 {offset + pos} 个字符处意外结束")
+            fill()
+            continue
+
+        char = buffer[pos]
+        if state == 'end':
+            raise WordSourceError(f"{path}: JSON数组结束后还有多余内容（第 {offset + pos} 个字符）")
+        if state == 'start':
+            if char != '[':
+                raise WordSourceError(f"{path}: 顶层必须是JSON数组")
+            pos += 1
+            state = 'first'
+        elif state == 'separator':
+            if char == ',':
+                pos += 1
+                state = 'value'
+            elif char == ']':
+                pos += 1
+                state = 'end'
+            else:
+                raise WordSourceError(f"{path}: 第 {offset + pos} 个字符处应为 ',' 或 ']'")
+        elif state == 'first' and char == ']':
+            pos += 1
+            state = 'end'
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise WordSourceError(f"{path}: 第 {offset + e.pos} 个字符处JSON格式错误: {e.msg}")
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # 值可能被分块截断（如数字），读入更多内容后重新解析
+                fill()
+                continue
+            yield item, offset + pos
+            pos = end
+            state = 'separator'
+
+
+def iter_word_entries(path, fmt=None):
+    """逐条读取单词条目 {'id', 'text', 'category'}，格式错误时抛出 WordSourceError"""
+    fmt = fmt or detect_format(path)
+    if fmt == 'json':
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for item, position in _iter_json_array(f, path):
+                entry = normalize_entry(item, f"{path} 第 {position} 个字符")
+                if entry:
+                    yield entry
+    elif fmt == 'jsonl':
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise WordSourceError(f"{path} 第 {line_number} 行JSON格式错误: {e.msg}")
+                entry = normalize_entry(item, f"{path} 第 {line_number} 行")
+                if entry:
+                    yield entry
+    elif fmt in ('csv', 'tsv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f, delimiter='\t' if fmt == 'tsv' else ',')
+            if not reader.fieldnames or not {'text', 'word'} & set(reader.fieldnames):
+                raise WordSourceError(f"{path}: 缺少 text（或 word）列")
+            for row in reader:
+                entry = normalize_entry(row, f"{path} 第 {reader.line_num} 行")
+                if entry:
+                    yield entry
+    else:
+        raise WordSourceError(f"不支持的单词列表格式: {fmt}")
+
+
+def parse_shard(text):
+    """解析 'i/N'（i 从1开始），返回 (i, N)"""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/N，如 1/4: {text}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"分片编号应在 1 到 {count} 之间: {text}")
+    return index, count
+
+
+def shard_of(text, count):
+    """单词所属的分片（1..count），只取决于单词文本，与机器、顺序和Python版本无关"""
+    digest = hashlib.sha1(text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def in_shard(entry, shard):
+    """按文本分片：输出文件、索引和清单都以文本为键，同一文本的多条记录必须落在同一片"""
+    return shard is None or shard_of(entry['text'], shard[1]) == shard[0]
+
+
+def shard_index_filename(shard):
+    """分片生成时写出的索引文件名"""
+    return f"index.shard-{shard[0]}-of-{shard[1]}.json"